@@ -169,8 +169,12 @@ def get_pointwise_model_errors(ml_repo, models, data, coord_name=None, data_vers
         result['x0_name'] = x_coord_name
         result['x1_name'] = 'model-target  [' + coord_name + ']'
 
+    columns = [coord_name]
+    if x_coord_name is not None:
+        columns.append(x_coord_name)
     for d in _data:
-        ref_data = ml_repo.get(d, version=data_version, full_object=True)
+        ref_data = ml_repo.get(d, version=data_version, full_object=True, columns=columns, lazy=True)
+        coord = ref_data.y_coord_names.index(coord_name)
 
         for m_name, m_versions in _models.items():
             tmp = m_name.split('/')[0]
@@ -179,11 +183,12 @@ def get_pointwise_model_errors(ml_repo, models, data, coord_name=None, data_vers
             logging.info('Retrieving eval data for model ' + tmp + ', versions ' +
                          str(m_versions) + ' and data ' + d + ', versions ' + str(data_version))
             eval_data = ml_repo.get(
-                eval_data_name, version=(FIRST_VERSION, LAST_VERSION), modifier_versions={m_name: m_versions, d: data_version}, full_object=True)
+                eval_data_name, version=(FIRST_VERSION, LAST_VERSION), modifier_versions={m_name: m_versions, d: data_version}, full_object=True,
+                columns=[coord_name])
             if not isinstance(eval_data, list):
                 eval_data = [eval_data]
             for eval_d in eval_data:
-                error = ref_data.y_data[:, coord] - eval_d.x_data[:, coord]
+                error = ref_data.y_data[:, coord] - eval_d.x_data[:, 0]
                 end = end_index
                 if end > 0:
                     end = min(end, error.shape[0])
@@ -223,7 +228,10 @@ def get_data(ml_repo, data, x0_coord_name, x1_coord_name=None, start_index = 0,
     x_coord = None
     y_coord = None
     for k, v in data_dict.items():
-        ref_data = ml_repo.get(k, version=v, full_object=True)
+        columns = [x0_coord_name]
+        if x1_coord_name is not None:
+            columns.append(x1_coord_name)
+        ref_data = ml_repo.get(k, version=v, full_object=True, columns=columns)
 
         if not isinstance(ref_data, list):
             ref_data = [ref_data]
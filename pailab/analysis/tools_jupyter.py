@@ -108,7 +108,7 @@ class ObjectView:
              RepoInfoKey.VERSION.value: [],
              RepoInfoKey.COMMIT_DATE.value: []}
         for k in self._names.value:
-            history = self._ml_repo.get_history(k)
+            history = self._ml_repo.get_history(k, repo_info_fields=list(result.keys()))
             for l in history:
                 for m in result.keys():
                     result[m].append(l['repo_info'][m])
@@ -1,4 +1,9 @@
 from contextlib import closing
+from collections import OrderedDict
+from copy import deepcopy
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+import multiprocessing
+import threading
 import traceback
 import datetime
 import os
@@ -9,7 +14,7 @@ import abc
 import uuid
 from enum import Enum
 from pailab.ml_repo.repo_objects import repo_object_init, RawData, RepoInfoKey  # pylint: disable=E0401
-from pailab.ml_repo.repo import MLObjectType  # pylint: disable=E0401
+from pailab.ml_repo.repo import MLObjectType, MLRepo  # pylint: disable=E0401
 
 import logging
 logger = logging.getLogger(__name__)
@@ -129,11 +134,12 @@ class SQLiteJobRunner(JobRunnerBase):
         logger.info('Creating new database for job runner.')
         self._conn = sqlite3.connect(self._sqlite_db_name)
         with closing(self._conn.cursor()) as cursor:
-            cursor.execute('''CREATE TABLE predecessors (job_name TEXT NOT NULL, job_version TEXT NOT NULL, predecessor_name TEXT NOT NULL, predecessor_version TEXT NOT NULL, PRIMARY KEY(job_name, job_version))''')
+            cursor.execute('''CREATE TABLE predecessors (job_name TEXT NOT NULL, job_version TEXT NOT NULL, predecessor_name TEXT NOT NULL, predecessor_version TEXT NOT NULL, PRIMARY KEY(job_name, job_version, predecessor_name, predecessor_version))''')
             cursor.execute(
                 '''CREATE TABLE jobs (job_name TEXT NOT NULL, job_version TEXT NOT NULL, job_state TEXT NOT NULL, start_time TIMESTAMP,
                                             end_time TIMESTAMP, error_message TEXT, stack_trace TEXT, insert_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
-                                            unfinished_pred_jobs INTEGER, user TEXT NOT NULL, PRIMARY KEY(job_name, job_version))''')
+                                            unfinished_pred_jobs INTEGER, user TEXT NOT NULL, worker_id TEXT, lease_expiry REAL, 
+                                            PRIMARY KEY(job_name, job_version))''')
             self._conn.commit()
         
     def _setup_new(self):
@@ -141,6 +147,18 @@ class SQLiteJobRunner(JobRunnerBase):
             self._create_new_db()
         else:
             self._conn = sqlite3.connect(self._sqlite_db_name)
+            self._migrate_db()
+
+    def _migrate_db(self):
+        '''Add the columns worker_id and lease_expiry to job databases created by older versions
+        '''
+        with closing(self._conn.cursor()) as cursor:
+            columns = [row[1] for row in cursor.execute('PRAGMA table_info(jobs)')]
+            if 'worker_id' not in columns:
+                logger.info('Adding columns worker_id and lease_expiry to table jobs.')
+                cursor.execute('ALTER TABLE jobs ADD COLUMN worker_id TEXT')
+                cursor.execute('ALTER TABLE jobs ADD COLUMN lease_expiry REAL')
+                self._conn.commit()
 
     @staticmethod
     def sqlite_name(name):
@@ -161,28 +179,27 @@ class SQLiteJobRunner(JobRunnerBase):
             successfull = False
         # first update jobs waiting for the job to be finished
         with closing(self._conn.cursor()) as cursor:
+            cursor.execute('BEGIN IMMEDIATE')
+            row = cursor.execute("select worker_id from jobs where job_name = ? and job_version = ?", (job_name, str(job_version))).fetchone()
+            if row is None or row[0] != self._id:
+                # the lease expired and the job has been requeued, the result is left to the worker running it now
+                logger.warning('Job ' + job_name + ', version ' + str(job_version) + ' is no longer leased by this worker, result is discarded.')
+                self._conn.rollback()
+                return
             if successfull:
-                candidates = []
-                for row in cursor.execute("select job_name, job_version from predecessors where predecessor_name = '"
-                                        + job_name + "'" + " and predecessor_version = '" + job_version + "'"):
-                    candidates.append((row[0], row[1]))
-                cursor.execute( "delete from predecessors where predecessor_name = '"
-                            + job_name + "'" + " and predecessor_version = '" + job_version + "'")
-                self._conn.commit()
-                for c in candidates:
-                    cursor.execute("update jobs SET unfinished_pred_jobs=unfinished_pred_jobs-1  where job_name='" +
-                                c[0] + "' and job_version='" + c[1] + "'")
-                    self._conn.commit()
-                    cursor.execute("update jobs SET job_state='" + JobState.WAITING.value + "' where job_name='" +
-                                c[0] + "' and job_version='" + c[1] + "' and unfinished_pred_jobs <= 0")
-                    self._conn.commit()
-                cursor.execute("update jobs SET job_state='" + JobState.SUCCESSFULLY_FINISHED.value + "', end_time='" + str(datetime.datetime.now())
-                            + "' where job_name = '" + job_name + "' and job_version = '" + job_version + "'")
+                candidates = cursor.execute("select job_name, job_version from predecessors where predecessor_name = ? and predecessor_version = ?",
+                                            (job_name, job_version)).fetchall()
+                cursor.execute("delete from predecessors where predecessor_name = ? and predecessor_version = ?", (job_name, job_version))
+                cursor.executemany("update jobs SET unfinished_pred_jobs=unfinished_pred_jobs-1 where job_name = ? and job_version = ?", 
+                                   candidates)
+                cursor.executemany("update jobs SET job_state = ? where job_name = ? and job_version = ? and unfinished_pred_jobs <= 0",
+                                   [(JobState.WAITING.value, c[0], c[1]) for c in candidates])
+                cursor.execute("update jobs SET job_state = ?, end_time = ?, lease_expiry = NULL where job_name = ? and job_version = ?",
+                               (JobState.SUCCESSFULLY_FINISHED.value, str(datetime.datetime.now()), job_name, job_version))
                 self._conn.commit()
             else:
-                cursor.execute("update jobs SET job_state='" + JobState.FAILED.value + "', error_message='" + error_message.replace("'", "") + "', stack_trace='" + stack_trace.replace("'", "") + "', end_time='"
-                            + str(datetime.datetime.now()) + "' where job_name = '" +
-                            job_name + "' and job_version = '" + str(job_version) + "'")
+                cursor.execute("update jobs SET job_state = ?, error_message = ?, stack_trace = ?, end_time = ?, lease_expiry = NULL where job_name = ? and job_version = ?",
+                               (JobState.FAILED.value, error_message, stack_trace, str(datetime.datetime.now()), job_name, str(job_version)))
                 self._conn.commit()
         
 
@@ -195,18 +212,139 @@ class SQLiteJobRunner(JobRunnerBase):
             return str(e), traceback.format_exc()
         return '', ''
 
+    def _requeue_expired(self, cursor):
+        '''Set all running jobs whose lease expired (e.g. since their worker died) back to waiting
+
+        Args:
+            cursor (sqlite3.Cursor): cursor of the transaction claiming the next job
+        '''
+        cursor.execute("update jobs SET job_state = ?, start_time = NULL, worker_id = NULL, lease_expiry = NULL where job_state = ? and lease_expiry < ?",
+                       (JobState.WAITING.value, JobState.RUNNING.value, time.time()))
+        if cursor.rowcount > 0:
+            logger.warning('Requeued ' + str(cursor.rowcount) + ' jobs with expired lease.')
+
+    def _claim_job(self):
+        '''Claim the next waiting job
+
+        Selecting and updating the job happens in one immediate transaction so that the job cannot be claimed by
+        another worker using the same database. The job is leased to this worker for lease_time seconds.
+
+        Returns:
+            tuple: name and version of the claimed job or None if no job is waiting
+        '''
+        with closing(self._conn.cursor()) as cursor:
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                self._requeue_expired(cursor)
+                row = cursor.execute("select job_name, job_version from jobs where job_state = ? order by insert_time desc",
+                                     (JobState.WAITING.value,)).fetchone()
+                if row is not None:
+                    cursor.execute("update jobs SET start_time = ?, job_state = ?, worker_id = ?, lease_expiry = ? where job_name = ? and job_version = ? and job_state = ?",
+                                   (str(datetime.datetime.now()), JobState.RUNNING.value, self._id, time.time() + self._lease_time,
+                                    row[0], row[1], JobState.WAITING.value))
+                    if cursor.rowcount == 0:
+                        row = None
+            except Exception:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+        return row
+
+    def _renew_lease(self, job_name, job_version, stop):
+        '''Renew the lease of a running job until stop is set (runs in a separate thread with its own connection)
+
+        Args:
+            job_name (str): name of job
+            job_version (str): version of job
+            stop (threading.Event): event set when the job has been finished
+        '''
+        conn = sqlite3.connect(self._sqlite_db_name, timeout=self._lease_time / 3.0)
+        try:
+            while not stop.wait(self._lease_time / 3.0):
+                try:
+                    self._update_lease(conn, job_name, job_version)
+                except sqlite3.OperationalError as e:
+                    # e.g. if the database is locked by another worker, the lease is renewed at the next tick
+                    logger.warning('Cannot renew lease of job ' + job_name + ':' + str(job_version) + ': ' + str(e))
+        finally:
+            conn.close()
+
+    def _update_lease(self, conn, job_name, job_version):
+        '''Set the lease expiry of a running job leased to this runner
+
+        Args:
+            conn (sqlite3.Connection): connection used to update the job
+            job_name (str): name of job
+            job_version (str): version of job
+        '''
+        with conn:
+            conn.execute("update jobs SET lease_expiry = ? where job_name = ? and job_version = ? and worker_id = ? and job_state = ?",
+                         (time.time() + self._lease_time, job_name, job_version, self._id, JobState.RUNNING.value))
+
+    def _wait_for_change(self, timeout):
+        '''Wait until another connection changed the database (e.g. a job has been added or finished) or until timeout
+
+            The data version of the database is checked every poll_interval seconds which only reads the change counter
+            of the database, the jobs table is queried again only if something changed or the timeout expired.
+
+        Args:
+            timeout (float): maximal time to wait in seconds
+
+        Returns:
+            bool: True if the database has been changed, False if the timeout expired
+        '''
+        end = time.time() + timeout
+        with closing(self._conn.cursor()) as cursor:
+            data_version = cursor.execute('PRAGMA data_version').fetchone()[0]
+            while True:
+                remaining = end - time.time()
+                if remaining <= 0:
+                    return False
+                time.sleep(min(self._poll_interval, remaining))
+                if cursor.execute('PRAGMA data_version').fetchone()[0] != data_version:
+                    return True
+
+    def _run_leased_job(self, job_name, job_version):
+        '''Run a claimed job while renewing its lease
+
+        Args:
+            job_name (str): name of job
+            job_version (str): version of job
+
+        Returns:
+            tuple: error message and stack trace (both empty if the job finished successfully)
+        '''
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._renew_lease, args=(job_name, job_version, stop), daemon=True)
+        heartbeat.start()
+        try:
+            return self._run_job(job_name, job_version)
+        finally:
+            stop.set()
+            heartbeat.join()
+
     # endregion
 
-    def __init__(self, sqlite_db_name, repo, sleep = 1, steps_to_heartbeat = 30):
+    def __init__(self, sqlite_db_name, repo, sleep = 1, steps_to_heartbeat = 30, lease_time = 60, poll_interval = 0.05):
         '''Contructor
 
+            Several job runners (e.g. in different processes or on different machines) may run the jobs of the same database.
+            A job is leased to the runner which claimed it, the lease is renewed while the job is running. Jobs whose lease 
+            expired (since their runner died) are set back to waiting and run by the next runner claiming a job.
+
         Args:
             sqlite_db_name (str): filename of sqlite database used
+            sleep (float, optional): Defaults to 1. Maximal time in seconds an idle runner waits before it queries the jobs again.
+            lease_time (float, optional): Defaults to 60. Time in seconds a job is leased to the runner, the lease is renewed every lease_time/3 seconds.
+            poll_interval (float, optional): Defaults to 0.05. Interval in seconds in which an idle runner checks if the database has been changed,
+                a runner is woken up by adding or finishing jobs after at most poll_interval seconds.
         '''
         self._sqlite_db_name = sqlite_db_name
         self._setup_new()
         self._sleep = sleep  # time to wait in sec before new request for open jobs to db
         self._steps_to_heartbeat = steps_to_heartbeat
+        self._lease_time = lease_time
+        self._poll_interval = poll_interval
         self._repo = repo
         self._id = str(uuid.uuid1())
         self._conn.set_trace_callback(logger_sql.info)
@@ -218,76 +356,48 @@ class SQLiteJobRunner(JobRunnerBase):
         with closing(self._conn.cursor()) as cursor:
             job = self._repo.get(job_name, version=job_version)
             predecessors = job.get_predecessor_jobs()
-            for predecessor in predecessors:
-                cursor.execute("insert into predecessors (job_name, job_version, predecessor_name, predecessor_version) VALUES ("
-                            + SQLiteJobRunner.sqlite_name(job_name) +
-                            ", "
-                            + SQLiteJobRunner.sqlite_name(str(job_version)) +
-                            ","
-                            + SQLiteJobRunner.sqlite_name(predecessor[0]) +
-                            ","
-                            + SQLiteJobRunner.sqlite_name(str(predecessor[1])) +
-                            ")")
-                self._conn.commit()
+            cursor.executemany("insert into predecessors (job_name, job_version, predecessor_name, predecessor_version) VALUES (?, ?, ?, ?)",
+                               [(job_name, str(job_version), predecessor[0], str(predecessor[1])) for predecessor in predecessors])
             job_state = JobState.WAITING.value
             if len(predecessors) > 0:
                 job_state = JobState.WAITING_PRED.value
-            cursor.execute("insert into jobs ( job_name, job_version, job_state,  unfinished_pred_jobs, user ) VALUES ("
-                        + SQLiteJobRunner.sqlite_name(job.repo_info[RepoInfoKey.NAME]) +
-                        ", "
-                        + SQLiteJobRunner.sqlite_name(str(job.repo_info[RepoInfoKey.VERSION])) +
-                        ",'"
-                        + job_state +
-                        "',"
-                        + str(len(predecessors)) +
-                        ", '" + user + "')")
+            cursor.execute("insert into jobs ( job_name, job_version, job_state,  unfinished_pred_jobs, user ) VALUES (?, ?, ?, ?, ?)",
+                           (job.repo_info[RepoInfoKey.NAME], str(job.repo_info[RepoInfoKey.VERSION]), job_state, len(predecessors), user))
             self._conn.commit()
 
     def run(self, max_steps=None):
         wait = self._sleep
         step = 0
-        with closing(self._conn.cursor()) as cursor: 
-            while True:
-                if max_steps is not None:
-                    step += 1
-                    if step > max_steps:
-                        return
-                if wait > self._steps_to_heartbeat:
-                    logger.info('heartbeat')
-                    wait = 0
-                row = None
-                with self._conn:
-                    cursor.execute("select job_name, job_version from jobs where job_state = '"
-                                        + JobState.WAITING.value + "' order by insert_time desc")
-                    row = cursor.fetchone()
-                    if row is not None:
-                        cursor.execute("update jobs SET start_time = '" + str(
-                            datetime.datetime.now()) + "', job_state='" + JobState.RUNNING.value + "' where job_name = '"
-                            + row[0] + "' and job_version='" + row[1] + "'")
-                        self._conn.commit()
-                    
-                #logger.error('len(rows): ' + str(len(rows)))
-                if row is not None:
-                    logger.info('Start running job ' +
-                                row[0] + ', version ' + row[1])
-                    error, stack_trace = self._run_job(row[0], row[1])
-                    self._set_finished(row[0], row[1], error, stack_trace)
-                    if error == '' and stack_trace == '':
-                        logger.info('Finished running job ' +
-                                    row[0] + ', version ' + row[1] + ' successfully.')
-                    else:
-                        logger.error('Finished running job ' + row[0] + ', version ' +
-                                    row[1] + ' with errors: ' + error + '   stacktrace: ' + stack_trace)
-                    wait = 0
+        while True:
+            if max_steps is not None:
+                step += 1
+                if step > max_steps:
+                    return
+            if wait > self._steps_to_heartbeat:
+                logger.info('heartbeat')
+                wait = 0
+            row = self._claim_job()
+            if row is not None:
+                logger.info('Start running job ' +
+                            row[0] + ', version ' + row[1])
+                error, stack_trace = self._run_leased_job(row[0], row[1])
+                self._set_finished(row[0], row[1], error, stack_trace)
+                if error == '' and stack_trace == '':
+                    logger.info('Finished running job ' +
+                                row[0] + ', version ' + row[1] + ' successfully.')
                 else:
-                    time.sleep(self._sleep)
-                    wait += self._sleep
-        
+                    logger.error('Finished running job ' + row[0] + ', version ' +
+                                row[1] + ' with errors: ' + error + '   stacktrace: ' + stack_trace)
+                wait = 0
+            else:
+                start = time.time()
+                self._wait_for_change(self._sleep)
+                wait += time.time() - start
+    
     def get_info(self, job_name, job_version):
         result = {}
         with closing(self._conn.cursor()) as cursor:
-            rows = cursor.execute("select * from jobs where job_name='" +
-                                job_name + "' and job_version = '" + str(job_version) + "'")
+            rows = cursor.execute("select * from jobs where job_name = ? and job_version = ?", (job_name, str(job_version)))
             column_names = [x[0] for x in rows.description]
             for row in rows:
                 for i in range(len(row)):
@@ -304,8 +414,8 @@ class SQLiteJobRunner(JobRunnerBase):
         """
         open_jobs = []
         with closing(self._conn.cursor()) as cursor:
-            for row in cursor.execute( "select job_name, job_version from jobs where job_state in ('"
-                                    + JobState.WAITING.value + "','" + JobState.WAITING_PRED.value + "','" + JobState.RUNNING.value +"')"):
+            for row in cursor.execute("select job_name, job_version from jobs where job_state in (?, ?, ?)",
+                                      (JobState.WAITING.value, JobState.WAITING_PRED.value, JobState.RUNNING.value)):
                 open_jobs.append((row[0], row[1]))
         return open_jobs
 
@@ -313,3 +423,315 @@ class SQLiteJobRunner(JobRunnerBase):
         """Closes the database connection
         """
         self._conn.close()
+
+
+# the repo of a worker process of the ProcessPoolJobRunner
+_worker_repo = None
+
+
+def _init_worker(config, lock, cache_size):
+    """Initialize a worker process of the ProcessPoolJobRunner
+
+    The worker creates its own MLRepo (and thereby its own connections to the storages) from the configuration of the repo.
+    The repo is kept for all jobs run by the worker, so that objects and numpy data cached by the repo are reused by later jobs.
+
+    Args:
+        config (dict): configuration of the repo
+        lock (multiprocessing.Lock): lock shared by all processes adding objects to the repo
+        cache_size (int): number of objects and of numpy data of objects cached by the repo of the worker, None to use the sizes of the configuration
+    """
+    global _worker_repo
+    config = deepcopy(config)
+    config['workspace'] = None
+    config['job_runner'] = {'type': 'simple', 'config': {}}
+    if cache_size is not None:
+        config['repo_store']['cache_size'] = cache_size
+        config['numpy_store']['cache_size'] = cache_size
+    _worker_repo = MLRepo(config=config)
+    _worker_repo._set_process_lock(lock)
+
+
+def _run_worker_job(job_name, job_version):
+    """Run a job in a worker process of the ProcessPoolJobRunner
+
+    Args:
+        job_name (str): name of job
+        job_version (str): version of job
+
+    Returns:
+        tuple: error message and stack trace (both empty if the job finished successfully), start and end time of the job
+    """
+    start_time = datetime.datetime.now()
+    job = _worker_repo.get(job_name, version=job_version)
+    try:
+        job.run(_worker_repo, job_name + ':' + str(job_version))
+    except Exception as e:
+        logger.error(str(e) + ': ' + str(traceback.format_exc()))
+        return str(e), traceback.format_exc(), start_time, datetime.datetime.now()
+    return '', '', start_time, datetime.datetime.now()
+
+
+class ProcessPoolJobRunner(JobRunnerBase):
+    """Job runner executing the jobs in a pool of worker processes on the local machine
+
+    Jobs are started as soon as all their predecessors have finished successfully, so that independent jobs run in parallel.
+    Each worker process uses its own MLRepo created from the configuration of the repo, therefore the repo must use storages 
+    which can be shared between processes (e.g. disk_handler and hdf_handler, not the memory_handler). The worker processes
+    are started with the 'spawn' method, so the functions used by the jobs must be importable.
+    The workers keep their repo (and its caches) for all jobs. A job is preferably run by a worker which already ran jobs 
+    reading the same data (see Job.get_input_names), provided that this worker has at most one more job to run than the least busy worker.
+    Jobs are added asynchronously, use wait to block until all jobs have been finished.
+    """
+
+    # number of input names remembered per worker to route jobs
+    _MAX_INPUT_NAMES = 32
+
+    def __init__(self, repo, n_workers=None, throw_job_error=False, cache_size=None):
+        """Constructor
+
+        Args:
+            repo (MLRepo): repository
+            n_workers (int, optional): Defaults to None. Number of worker processes, if None the number of processors of the machine is used.
+            throw_job_error (bool, optional): Defaults to False. If True, wait raises an exception if a job failed. Otherwise,
+                error and traceback are stored in the job info only.
+            cache_size (int, optional): Defaults to None. Number of objects and of numpy data of objects cached by each worker, 
+                if None the cache sizes of the repo's configuration are used. Note that numpy data returned from the cache is read-only.
+
+        Raises:
+            Exception: If the repo uses a storage which cannot be shared between processes.
+        """
+        config = repo.get_config()
+        for store in ['repo_store', 'numpy_store']:
+            if config[store]['type'] == 'memory_handler':
+                raise Exception('Cannot use the process_pool job runner with the memory_handler as ' + store +
+                                ' since the storage cannot be shared between processes.')
+        self._context = multiprocessing.get_context('spawn')
+        self._process_lock = self._context.Lock()
+        self._config = config
+        self._cache_size = cache_size
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+        # one executor per worker process so that jobs can be routed to a specific worker
+        self._executors = [self._create_executor() for _ in range(n_workers)]
+        # number of submitted but unfinished jobs per worker
+        self._worker_load = [0] * n_workers
+        # names of the inputs of the jobs recently run by each worker
+        self._worker_inputs = [OrderedDict() for _ in range(n_workers)]
+        self._throw_job_error = throw_job_error
+        self._job_info = {}
+        # job id -> name and version of job
+        self._jobs = {}
+        # job id -> future of job submitted to the pool
+        self._futures = {}
+        # job id -> names of the inputs of the job
+        self._inputs = {}
+        # job id -> ids of the unfinished predecessors of a job waiting for its predecessors
+        self._predecessors = {}
+        # job id -> ids of the jobs waiting for the job
+        self._successors = {}
+        # ids of failed jobs not yet reported by wait
+        self._errors = []
+        # the callbacks of the futures run in another thread
+        self._lock = threading.Condition(threading.RLock())
+        self.set_repo(repo)
+
+    def set_repo(self, repo):
+        self._repo = repo
+        repo._set_process_lock(self._process_lock)
+
+    def _create_executor(self):
+        """Create the executor of a worker process
+
+        Returns:
+            ProcessPoolExecutor: executor with one worker process
+        """
+        return ProcessPoolExecutor(max_workers=1, mp_context=self._context, initializer=_init_worker,
+                                   initargs=(self._config, self._process_lock, self._cache_size))
+
+    def _replace_executor(self, worker, executor):
+        """Replace the executor of a worker if its process died (the executor is broken)
+
+        Args:
+            worker (int): index of the worker
+            executor (ProcessPoolExecutor): the broken executor, nothing is done if it has already been replaced
+        """
+        if self._executors[worker] is not executor:
+            return
+        logger.error('Worker process ' + str(worker) + ' died, starting a new worker process.')
+        executor.shutdown(wait=False)
+        self._executors[worker] = self._create_executor()
+        self._worker_inputs[worker].clear()
+
+    def _select_worker(self, inputs):
+        """Select the worker to run a job
+
+        Among the workers with at most one more unfinished job than the least busy worker, the worker which recently ran 
+        most of the job's inputs is selected (the least busy of these if there are several).
+
+        Args:
+            inputs (list of str): names of the inputs of the job
+
+        Returns:
+            int: index of the worker
+        """
+        min_load = min(self._worker_load)
+        candidates = [i for i in range(len(self._executors)) if self._worker_load[i] <= min_load + 1]
+        return max(candidates, key=lambda i: (sum(1 for x in inputs if x in self._worker_inputs[i]), -self._worker_load[i]))
+
+    def _submit(self, job_id):
+        """Submit a job whose predecessors are finished to a worker
+        """
+        job_name, job_version = self._jobs[job_id]
+        self._job_info[job_id].set_state(JobState.WAITING)
+        inputs = self._inputs.pop(job_id, [])
+        worker = self._select_worker(inputs)
+        self._worker_load[worker] += 1
+        worker_inputs = self._worker_inputs[worker]
+        for name in inputs:
+            worker_inputs[name] = True
+            worker_inputs.move_to_end(name)
+        while len(worker_inputs) > ProcessPoolJobRunner._MAX_INPUT_NAMES:
+            worker_inputs.popitem(last=False)
+        executor = self._executors[worker]
+        try:
+            future = executor.submit(_run_worker_job, job_name, job_version)
+        except Exception as e:  # the executor is broken if its worker process died
+            logger.error('Cannot submit job ' + job_id + ': ' + str(e))
+            self._worker_load[worker] -= 1
+            if isinstance(e, BrokenExecutor):
+                self._replace_executor(worker, executor)
+            self._set_failed(job_id, 'Cannot submit job: ' + str(e), traceback.format_exc())
+            self._lock.notify_all()
+            return
+        self._futures[job_id] = future
+        future.add_done_callback(lambda f: self._set_finished(job_id, worker, executor, f))
+
+    def _set_failed(self, job_id, error_message, stack_trace=None):
+        """Set a job and all jobs waiting for it to failed
+        """
+        job_info = self._job_info[job_id]
+        job_info.set_state(JobState.FAILED)
+        job_info.error_message = error_message
+        job_info.trace_back = stack_trace
+        if job_info.end_time is None:
+            job_info.set_end_time()
+        self._predecessors.pop(job_id, None)
+        self._inputs.pop(job_id, None)
+        self._errors.append(job_id)
+        for successor in self._successors.pop(job_id, []):
+            if successor in self._predecessors:
+                self._set_failed(successor, 'Predecessor job ' + job_id + ' failed.')
+
+    def _set_finished(self, job_id, worker, executor, future):
+        """Update the job info of a job run by a worker and submit the jobs waiting for it
+
+        Args:
+            job_id (str): id of the job
+            worker (int): index of the worker which ran the job
+            executor (ProcessPoolExecutor): executor the job was submitted to
+            future (Future): future of the job
+        """
+        broken = False
+        try:
+            error, stack_trace, start_time, end_time = future.result()
+        except Exception as e:  # e.g. if a worker process died
+            error, stack_trace, start_time, end_time = str(e), traceback.format_exc(), None, datetime.datetime.now()
+            broken = isinstance(e, BrokenExecutor)
+        with self._lock:
+            if broken:
+                self._replace_executor(worker, executor)
+            del self._futures[job_id]
+            self._worker_load[worker] -= 1
+            job_info = self._job_info[job_id]
+            job_info.start_time = start_time
+            job_info.end_time = end_time
+            if error == '' and stack_trace == '':
+                job_info.set_state(JobState.SUCCESSFULLY_FINISHED)
+                for successor in self._successors.pop(job_id, []):
+                    predecessors = self._predecessors.get(successor)
+                    if predecessors is None:
+                        continue
+                    predecessors.discard(job_id)
+                    if len(predecessors) == 0:
+                        del self._predecessors[successor]
+                        self._submit(successor)
+            else:
+                logger.error('Job ' + job_id + ' failed with error: ' + error)
+                self._set_failed(job_id, error, stack_trace)
+            self._lock.notify_all()
+
+    def add(self, job_name, job_version, user):
+        job_id = job_name + ':' + str(job_version)
+        job = self._repo.get(job_name, version=job_version)
+        job_info = JobInfo(user)
+        job_info.submission_time = datetime.datetime.now()
+        with self._lock:
+            self._job_info[job_id] = job_info
+            self._jobs[job_id] = (job_name, str(job_version))
+            self._inputs[job_id] = job.get_input_names()
+            unfinished = set()
+            failed = None
+            for predecessor in job.get_predecessor_jobs():
+                predecessor_id = predecessor[0] + ':' + str(predecessor[1])
+                predecessor_info = self._job_info.get(predecessor_id)
+                # predecessors unknown to this job runner are assumed to be finished
+                if predecessor_info is None or predecessor_info.state == JobState.SUCCESSFULLY_FINISHED.value:
+                    continue
+                if predecessor_info.state == JobState.FAILED.value:
+                    failed = predecessor_id
+                    break
+                unfinished.add(predecessor_id)
+            if failed is not None:
+                self._set_failed(job_id, 'Predecessor job ' + failed + ' failed.')
+            elif len(unfinished) > 0:
+                job_info.set_state(JobState.WAITING_PRED)
+                self._predecessors[job_id] = unfinished
+                for predecessor_id in unfinished:
+                    self._successors.setdefault(predecessor_id, []).append(job_id)
+            else:
+                self._submit(job_id)
+        return job_id
+
+    def get_info(self, job_name, job_version):
+        job_id = job_name + ':' + str(job_version)
+        with self._lock:
+            job_info = self._job_info[job_id]
+            future = self._futures.get(job_id)
+            if future is not None and future.running():
+                job_info.set_state(JobState.RUNNING)
+            return job_info
+
+    def get_waiting_jobs(self):
+        """Return list of open jobs
+
+        Returns:
+            list of tuples: list containing tuples of job names and versions of the jobs not yet finished
+        """
+        with self._lock:
+            return [self._jobs[job_id] for job_id, job_info in self._job_info.items()
+                    if job_info.state not in (JobState.SUCCESSFULLY_FINISHED.value, JobState.FAILED.value)]
+
+    def wait(self, timeout=None):
+        """Wait until all jobs have been finished
+
+        Args:
+            timeout (float, optional): Defaults to None. Maximal time to wait in seconds, None to wait without limit.
+
+        Raises:
+            Exception: If throw_job_error is True and a job failed since the last call of wait.
+
+        Returns:
+            bool: True if all jobs have been finished successfully, False if the timeout expired before or a job failed since the last call of wait
+        """
+        with self._lock:
+            finished = self._lock.wait_for(lambda: len(self._futures) == 0 and len(self._predecessors) == 0, timeout)
+            errors, self._errors = self._errors, []
+        if self._throw_job_error and len(errors) > 0:
+            raise Exception('Job ' + errors[0] + ' failed: ' + str(self._job_info[errors[0]].error_message))
+        return finished and len(errors) == 0
+
+    def close(self):
+        """Wait for all submitted jobs and shut down the worker processes
+        """
+        for executor in self._executors:
+            executor.shutdown(wait=True)
@@ -1,21 +1,86 @@
 
 
 import os
-from contextlib import closing
+import uuid
+import json
+from copy import deepcopy
+from contextlib import closing, contextmanager
 import sqlite3
 from datetime import datetime, timedelta
 
 import pathlib
 import pailab.ml_repo.repo_objects as repo_objects
-from pailab.ml_repo.repo_store import RepoInfoKey, _time_from_version
+from pailab.ml_repo.repo_store import RepoInfoKey
 import pailab.ml_repo.repo as repo
-from pailab.ml_repo.repo_store import RepoStore
+from pailab.ml_repo.repo_store import RepoStore, _select_fields
 from shutil import copy
 import logging
 logger = logging.getLogger(__name__)
 logger_sql = logging.getLogger(__name__ + '_SQLITE')
 
 
+def _uuid_time(version):
+    """ Return the time of the version uuid as integer (100ns intervals since 1582-10-15) as it is stored in the database
+
+    Arguments:
+        version {str} -- the version
+
+    Returns:
+        int -- the time
+    """
+
+    return uuid.UUID(version).time
+
+
+class _RepoJSONEncoder(json.JSONEncoder):
+    """ json encoder handling the enums, datetimes and tuples used within repo objects
+    """
+
+    @staticmethod
+    def _mark_tuples(obj):
+        """ Replace all tuples (which json would encode as lists) by dictionaries marking them as tuples
+        """
+
+        if isinstance(obj, tuple):
+            return {"__tuple__": [_RepoJSONEncoder._mark_tuples(x) for x in obj]}
+        if isinstance(obj, list):
+            return [_RepoJSONEncoder._mark_tuples(x) for x in obj]
+        if isinstance(obj, dict):
+            return {k: _RepoJSONEncoder._mark_tuples(v) for k, v in obj.items()}
+        return obj
+
+    def iterencode(self, obj, _one_shot=False):
+        return json.JSONEncoder.iterencode(self, _RepoJSONEncoder._mark_tuples(obj), _one_shot)
+
+    def default(self, obj):
+        if type(obj) in RepoObjectDiskStorage.PUBLIC_ENUMS.values():
+            return {"__enum__": str(obj)}
+        else:
+            if isinstance(obj, datetime):
+                return {"__datetime__": str(obj)}
+        return json.JSONEncoder.default(self, obj)
+
+
+class _RepoJSONDecoder(json.JSONDecoder):
+    """ json decoder restoring the enums and datetimes encoded by _RepoJSONEncoder
+    """
+
+    def __init__(self, *args, **kwargs):
+        json.JSONDecoder.__init__(
+            self, object_hook=self.object_hook, *args, **kwargs)
+
+    def object_hook(self, obj):
+        if "__tuple__" in obj:
+            return tuple(obj["__tuple__"])
+        if "__enum__" in obj:
+            name, member = obj["__enum__"].split(".")
+            return getattr(RepoObjectDiskStorage.PUBLIC_ENUMS[name], member)
+        if "__datetime__" in obj:
+            if '.' in obj["__datetime__"]:
+                return datetime.strptime(obj["__datetime__"], '%Y-%m-%d %H:%M:%S.%f')
+            return datetime.strptime(obj["__datetime__"], '%Y-%m-%d %H:%M:%S')
+        return obj
+
 
 class RepoObjectDiskStorage(RepoStore):
     """ The RepoObjectDiskStorage class
@@ -40,6 +105,9 @@ class RepoObjectDiskStorage(RepoStore):
 
         return self._main_dir + '/.version.sqlite'
 
+    # version of the database schema, stored as user_version in the sqlite db
+    _DB_VERSION = 2
+
     def _create_new_db(self):
         """ Creates a new sqlite db
         """
@@ -54,18 +122,52 @@ class RepoObjectDiskStorage(RepoStore):
                         '''CREATE TABLE mapping (name text PRIMARY KEY, category text)''')
                 # versions
                 cursor.execute(
-                        '''CREATE TABLE versions (name TEXT NOT NULL, version TEXT NOT NULL, path TEXT NOT NULL, file TEXT NOT NULL, uuid_time TIMESTAMP,
-                                            insert_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL, PRIMARY KEY(name, version) ) ''')
+                        '''CREATE TABLE versions (name TEXT NOT NULL, version TEXT NOT NULL, path TEXT NOT NULL, file TEXT NOT NULL, uuid_time INTEGER,
+                                            insert_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL, repo_info TEXT, PRIMARY KEY(name, version) ) ''')
 
                 # modification_info
                 cursor.execute(
-                        '''CREATE TABLE modification_info (name TEXT NOT NULL, version TEXT NOT NULL, modifier TEXT NOT NULL, modifier_version TEXT NOT NULL, modifier_uuid_time TIMESTAMP, PRIMARY KEY(name, version, modifier) ) ''')
+                        '''CREATE TABLE modification_info (name TEXT NOT NULL, version TEXT NOT NULL, modifier TEXT NOT NULL, modifier_version TEXT NOT NULL, modifier_uuid_time INTEGER, PRIMARY KEY(name, version, modifier) ) ''')
+                RepoObjectDiskStorage._create_indexes(cursor)
                 self._conn.commit()
+                cursor.execute('PRAGMA user_version = ' + str(RepoObjectDiskStorage._DB_VERSION))
             except:
                 logger.error(
                     'An error occured during creation of new db, rolling back.')
                 self._conn.rollback()
+
+    @staticmethod
+    def _create_indexes(cursor):
+        """ Creates the indexes used by the latest version lookups, version ranges and modifier queries
+        
+        Arguments:
+            cursor {sqlite3.Cursor} -- cursor of the db
+        """
+
+        cursor.execute('CREATE INDEX IF NOT EXISTS versions_name_time ON versions(name, uuid_time)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS modification_info_modifier ON modification_info(modifier, modifier_version)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS modification_info_name_modifier ON modification_info(name, modifier)')
+        
+    _INSERT_MODIFICATION_INFO = "insert into modification_info (name, version, modifier, modifier_version, modifier_uuid_time) VALUES (?, ?, ?, ?, ?)"
+
+    @staticmethod
+    def _modification_info_rows(repo_info):
+        """ Returns the rows of the modification_info table for the given repo_info
+        
+        Arguments:
+            repo_info {dict} -- the repo_info dictionary of an object
         
+        Returns:
+            list of tuples -- the rows, one for each modifier
+        """
+
+        if repo_objects.RepoInfoKey.MODIFICATION_INFO.value not in repo_info:
+            return []
+        name = repo_info[RepoInfoKey.NAME.value]
+        version = str(repo_info[RepoInfoKey.VERSION.value])
+        return [(name, version, k, str(v), _uuid_time(v)) 
+                for k, v in repo_info[repo_objects.RepoInfoKey.MODIFICATION_INFO.value].items()]
+
     def _setup_new(self):
         """ Setup of the handler
         """
@@ -76,7 +178,134 @@ class RepoObjectDiskStorage(RepoStore):
             self._create_new_db()
         else:
             self._conn = sqlite3.connect(self._sqlite_db_name())
+            self._migrate_db()
         self._conn.set_trace_callback(logger_sql.info)
+
+    def _migrate_db(self):
+        """ Migrates databases created by older versions in place
+
+        The repo_info column of the versions table is added if it does not exist. Databases with a schema version (user_version) 
+        older than 1 store the uuid times as text, these are converted to integers and the indexes are created. For databases
+        older than 2, the repo_info column is filled from the object files (rows whose repo_info cannot be stored as json remain 
+        empty and the object files are read instead), so that reads never need to write to the database.
+        """
+
+        with closing(self._conn.cursor()) as cursor:
+            columns = [row[1] for row in cursor.execute('PRAGMA table_info(versions)')]
+            if 'repo_info' not in columns:
+                logger.info('Adding column repo_info to table versions.')
+                cursor.execute('ALTER TABLE versions ADD COLUMN repo_info TEXT')
+                self._conn.commit()
+            db_version = cursor.execute('PRAGMA user_version').fetchone()[0]
+            if db_version < 1:
+                logger.info('Migrating database to integer uuid times and creating indexes.')
+                try:
+                    rows = [(_uuid_time(version), name, version) 
+                            for name, version in cursor.execute('select name, version from versions').fetchall()]
+                    cursor.executemany('update versions set uuid_time = ? where name = ? and version = ?', rows)
+                    rows = [(_uuid_time(modifier_version), modifier_version) 
+                            for (modifier_version,) in cursor.execute('select distinct modifier_version from modification_info').fetchall()]
+                    cursor.executemany('update modification_info set modifier_uuid_time = ? where modifier_version = ?', rows)
+                    RepoObjectDiskStorage._create_indexes(cursor)
+                    self._conn.commit()
+                except:
+                    logger.error('An error occured during migration of db, rolling back.')
+                    self._conn.rollback()
+                    raise
+            if db_version < 2:
+                logger.info('Migrating database, filling repo_info from object files.')
+                try:
+                    rows = []
+                    for path, filename, name, version in cursor.execute('select path, file, name, version from versions where repo_info is NULL').fetchall():
+                        obj = self._load(self._main_dir + '/' + path + '/' + filename)
+                        rows.append((RepoObjectDiskStorage._repo_info_to_json(obj['repo_info']), name, version))
+                    cursor.executemany('update versions set repo_info = ? where name = ? and version = ?', rows)
+                    self._conn.commit()
+                except:
+                    logger.error('An error occured during migration of db, rolling back.')
+                    self._conn.rollback()
+                    raise
+            if db_version < RepoObjectDiskStorage._DB_VERSION:
+                cursor.execute('PRAGMA user_version = ' + str(RepoObjectDiskStorage._DB_VERSION))
+
+    @staticmethod
+    def _repo_info_to_json(repo_info):
+        """ Returns the repo_info as json string stored in the versions table
+
+        Arguments:
+            repo_info {dict} -- the repo_info dictionary of an object
+
+        Returns:
+            str or None -- json string, None if the repo_info cannot be serialized
+        """
+
+        try:
+            return json.dumps(repo_info, cls=_RepoJSONEncoder)
+        except (TypeError, ValueError) as e:
+            logger.warning('Cannot serialize repo_info of ' + str(repo_info.get(RepoInfoKey.NAME.value)) 
+                            + ', object file will be used to read repo_info: ' + str(e))
+            return None
+
+    def _save(self, file_prefix, obj):
+        """ Saves the object to file or defers the write until the running transaction is committed
+
+        Arguments:
+            file_prefix {str} -- path and name of the file (without extension)
+            obj {dict} -- the object dictionary
+        """
+
+        if self._transaction_depth > 0:
+            self._pending_files[file_prefix] = obj
+        else:
+            self._save_function(file_prefix, obj)
+
+    def _load(self, file_prefix):
+        """ Loads the object from file, objects not yet written by the running transaction are taken from memory
+
+        Arguments:
+            file_prefix {str} -- path and name of the file (without extension)
+
+        Returns:
+            dict -- the object dictionary
+        """
+
+        if file_prefix in self._pending_files:
+            return deepcopy(self._pending_files[file_prefix])
+        return self._load_function(file_prefix)
+
+    def _commit_pending(self):
+        """ Writes all files of the transaction and commits the database changes
+        """
+
+        try:
+            for file_prefix, obj in self._pending_files.items():
+                self._save_function(file_prefix, obj)
+        except:
+            self._conn.rollback()
+            raise
+        finally:
+            self._pending_files = {}
+        self._conn.commit()
+
+    def _discard_pending(self):
+        """ Rolls back the database changes of the transaction and drops the files not yet written
+        """
+
+        self._pending_files = {}
+        self._conn.rollback()
+        # objects and versions read or added within the transaction may have been cached
+        if self._object_cache is not None:
+            self._object_cache.clear()
+        self._clear_version_index()
+
+    def _check_version_index(self):
+        """ Clears the version index if the database has been changed by another connection
+        """
+
+        data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version != self._data_version:
+            self._clear_version_index()
+            self._data_version = data_version
     # endregion
 
     def __init__(self, folder, file_format='pickle'):
@@ -96,7 +325,9 @@ class RepoObjectDiskStorage(RepoStore):
         """
 
         self._main_dir = folder
-        self._setup_new()
+        self._transaction_depth = 0
+        self._pending_files = {}
+        self._data_version = None
         self._file_format = file_format
         self._extension = '.pck'
         if self._file_format == 'pickle':
@@ -113,37 +344,14 @@ class RepoObjectDiskStorage(RepoStore):
             self._save_function = __pickle_save
             self._load_function = __pickle_load
         elif self._file_format == 'json':
-            import json
-
-            class CustomEncoder(json.JSONEncoder):
-                def default(self, obj):
-                    if type(obj) in RepoObjectDiskStorage.PUBLIC_ENUMS.values():
-                        return {"__enum__": str(obj)}
-                    else:
-                        if isinstance(obj, datetime):
-                            return {"__datetime__": str(obj)}
-                    return json.JSONEncoder.default(self, obj)
-
-            class CustomDecoder(json.JSONDecoder):
-                def __init__(self, *args, **kwargs):
-                    json.JSONDecoder.__init__(
-                        self, object_hook=self.object_hook, *args, **kwargs)
-
-                def object_hook(self, obj):
-                    if "__enum__" in obj:
-                        name, member = obj["__enum__"].split(".")
-                        return getattr(RepoObjectDiskStorage.PUBLIC_ENUMS[name], member)
-                    if "__datetime__" in obj:
-                        return datetime.strptime(obj["__datetime__"], 'YYYY-MM-DD HH:MM:SS.mmmmmm ')
-                    return obj
 
             def __json_load(file_prefix):
                 with open(file_prefix+'.json', 'r') as f:
-                    return json.load(f, cls=CustomDecoder)
+                    return json.load(f, cls=_RepoJSONDecoder)
 
             def __json_save(file_prefix, obj):
                 with open(file_prefix + '.json', 'w') as f:
-                    json.dump(obj, f, cls=CustomEncoder,
+                    json.dump(obj, f, cls=_RepoJSONEncoder,
                               indent=4, separators=(',', ': '))
 
             self._save_function = __json_save
@@ -151,6 +359,7 @@ class RepoObjectDiskStorage(RepoStore):
             self._extension = '.json'
         else:
             raise Exception("Unknown file format " + file_format)
+        self._setup_new()
 
     def _delete(self, name, version):
         """ Deletes a object 
@@ -163,26 +372,45 @@ class RepoObjectDiskStorage(RepoStore):
             Exception -- an exception is raised if the object does not exists
         """
 
-        condition = " where name='"+  name + "' and version='" + version + "'"
-        delete_statement = "delete from modification_info " + condition
+        self._invalidate_cache(name, version)
+        self._clear_version_index(name)
+        condition = " where name = ? and version = ?"
         with closing(self._conn.cursor()) as cursor:
-            cursor.execute(delete_statement)
-            select_statement = "select path, file from versions " + condition
+            cursor.execute("delete from modification_info" + condition, (name, version))
             files = [row[0] + '/' + row[1]
-                    for row in cursor.execute(select_statement)]
+                    for row in cursor.execute("select path, file from versions" + condition, (name, version))]
             if len(files) == 0:
                 raise Exception('Deletion failed: Object ' + name + " with version " + version +' does not exist.')
             for filename in files:
-                os.remove(self._main_dir + '/' + filename + self._extension)
-            delete_statement = "delete from versions " + condition
-            cursor.execute(delete_statement)
+                if self._pending_files.pop(self._main_dir + '/' + filename, None) is None:
+                    os.remove(self._main_dir + '/' + filename + self._extension)
+            cursor.execute("delete from versions" + condition, (name, version))
             #if there is no object with this name anymore, we have to remove it from mapping
-            select_statement = "select path, file from versions where name='"+  name + "'"
-            depp = [0 for r in cursor.execute(select_statement)]
-            if len(depp) == 0:
-                delete_statement = "delete from mapping where name='" + name + "'"
-                cursor.execute(delete_statement)        
-            self._conn.commit()
+            if cursor.execute("select 1 from versions where name = ? LIMIT 1", (name,)).fetchone() is None:
+                cursor.execute("delete from mapping where name = ?", (name,))
+            if self._transaction_depth == 0:
+                self._conn.commit()
+
+    @contextmanager
+    def transaction(self):
+        """ Context manager bundling all changes made within the context into one transaction
+
+        All rows of the objects added or replaced within the context are written in one sqlite transaction which is committed
+        when the outermost context is left. The object files are written in one batch just before the commit. If an exception 
+        is raised within the context, the database changes are rolled back and no object file is written.
+        """
+
+        self._transaction_depth += 1
+        try:
+            yield
+        except:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self._discard_pending()
+            raise
+        self._transaction_depth -= 1
+        if self._transaction_depth == 0:
+            self._commit_pending()
         
     def get_config(self):
         """ return the configuration
@@ -204,7 +432,7 @@ class RepoObjectDiskStorage(RepoStore):
         """
         with closing(self._conn.cursor()) as cursor: 
             result = []
-            for row in cursor.execute("select name, category from  mapping where category = '" + ml_obj_type + "'"):
+            for row in cursor.execute("select name, category from mapping where category = ?", (ml_obj_type,)):
                 result.append(row[0])
             return result
 
@@ -217,51 +445,46 @@ class RepoObjectDiskStorage(RepoStore):
         Raises:
             Exception if an object with same name already exists.
         """
-        with self._conn:
-            with closing(self._conn.cursor()) as cursor:    
-                try:
-                    uid_time = _time_from_version(
-                        obj['repo_info'][repo_objects.RepoInfoKey.VERSION.value])
-                    name = obj['repo_info'][repo_objects.RepoInfoKey.NAME.value]
-                    if isinstance(obj['repo_info'][repo_objects.RepoInfoKey.CATEGORY.value], repo.MLObjectType):
-                        category = obj['repo_info'][repo_objects.RepoInfoKey.CATEGORY.value].name
-                    else:
-                        category = obj['repo_info'][repo_objects.RepoInfoKey.CATEGORY.value]
-                    exists = False
-                    # region write mapping
-                    for row in cursor.execute('select * from mapping where name = ' + "'" + name + "'"):
-                        exists = True
-                        break
-                    if not exists:
-                        cursor.execute(
-                                "insert into mapping (name, category) VALUES ('" + name + "', '" + category + "')")
-                    # endregion
-                    # region write file info
-                    version = obj['repo_info'][repo_objects.RepoInfoKey.VERSION.value]
-                    file_sub_dir = category + '/' + name + '/'
-                    os.makedirs(self._main_dir + '/' + file_sub_dir, exist_ok=True)
-                    filename = version
-                    cursor.execute("insert into versions (name, version, path, file, uuid_time) VALUES('" +
-                            name + "', '" + version + "','" + file_sub_dir + "','" + filename + "','" + str(uid_time) + "')")
-                    # endregion
-                    # region write modification info
-                    if repo_objects.RepoInfoKey.MODIFICATION_INFO.value in obj['repo_info']:
-                        for k, v in obj['repo_info'][repo_objects.RepoInfoKey.MODIFICATION_INFO.value].items():
-                            tmp = _time_from_version(v)
-                            cursor.execute("insert into modification_info (name, version, modifier, modifier_version, modifier_uuid_time) VALUES ('"
-                                    + name + "','" + version + "','" + k + "','" + str(v) + "','" + str(tmp) + "')")
-                    # endregion
+        with closing(self._conn.cursor()) as cursor:    
+            try:
+                uid_time = _uuid_time(
+                    obj['repo_info'][repo_objects.RepoInfoKey.VERSION.value])
+                name = obj['repo_info'][repo_objects.RepoInfoKey.NAME.value]
+                if isinstance(obj['repo_info'][repo_objects.RepoInfoKey.CATEGORY.value], repo.MLObjectType):
+                    category = obj['repo_info'][repo_objects.RepoInfoKey.CATEGORY.value].name
+                else:
+                    category = obj['repo_info'][repo_objects.RepoInfoKey.CATEGORY.value]
+                # region write mapping
+                cursor.execute("insert or ignore into mapping (name, category) VALUES (?, ?)", (name, category))
+                # endregion
+                # region write file info
+                version = obj['repo_info'][repo_objects.RepoInfoKey.VERSION.value]
+                file_sub_dir = category + '/' + name + '/'
+                os.makedirs(self._main_dir + '/' + file_sub_dir, exist_ok=True)
+                filename = version
+                cursor.execute("insert into versions (name, version, path, file, uuid_time, repo_info) VALUES (?, ?, ?, ?, ?, ?)",
+                        (name, version, file_sub_dir, filename, uid_time, RepoObjectDiskStorage._repo_info_to_json(obj['repo_info'])))
+                # endregion
+                # region write modification info
+                cursor.executemany(RepoObjectDiskStorage._INSERT_MODIFICATION_INFO, 
+                    RepoObjectDiskStorage._modification_info_rows(obj['repo_info']))
+                # endregion
+                if self._transaction_depth == 0:
                     self._conn.commit()
-                    # region write file
-                    logger.debug(
-                        'Write object as json file with filename ' + filename)
-
-                    self._save_function(self._main_dir + '/' +
-                                        file_sub_dir + '/' + filename, obj)
-                    # endregion
-                except Exception as e:
-                    logger.error('Error: ' + str(e) + ', rolling back changes.')
-                    self._conn.rollback()
+                # region write file
+                logger.debug(
+                    'Write object as json file with filename ' + filename)
+
+                self._save(self._main_dir + '/' +
+                           file_sub_dir + '/' + filename, obj)
+                # endregion
+            except Exception as e:
+                if self._transaction_depth > 0:
+                    # the caller rolls back the complete transaction
+                    raise
+                logger.error('Error: ' + str(e) + ', rolling back changes.')
+                self._conn.rollback()
+                self._clear_version_index()
 
     def get_version_condition(self, name, versions, version_column, time_column):
         """ returns the condition part of the versions for the sql statement
@@ -273,27 +496,25 @@ class RepoObjectDiskStorage(RepoStore):
             time_column {str} -- time column name
         
         Returns:
-            str -- the condition for the versions
+            tuple of str and list -- the condition for the versions and the parameters bound to its placeholders
         """
 
         version_condition = ''
+        parameters = []
         if versions is not None:
             version_condition = ' and '
         if isinstance(versions, str):
-            version_condition += version_column + " = '" + versions + "'"
+            version_condition += version_column + " = ?"
+            parameters.append(versions)
         else:
             if isinstance(versions, tuple):
-                start_time = _time_from_version(versions[0])
-                end_time = _time_from_version(versions[1])
-                version_condition += "'" + str(
-                    start_time) + "' <= " + time_column + " and " + time_column + "<= '" + str(end_time) + "'"
+                version_condition += "? <= " + time_column + " and " + time_column + " <= ?"
+                parameters.extend([_uuid_time(versions[0]), _uuid_time(versions[1])])
             else:
                 if isinstance(versions, list):
-                    version_condition += version_column + ' in ('
-                    tmp = "','"
-                    tmp = tmp.join([v for v in versions])
-                    version_condition += "'" + tmp + "')"
-        return version_condition
+                    version_condition += version_column + ' in (' + ', '.join(['?'] * len(versions)) + ')'
+                    parameters.extend(versions)
+        return version_condition, parameters
 
     def _get(self, name, versions=None, modifier_versions=None, obj_fields=None,  repo_info_fields=None,
              throw_error_not_exist=True, throw_error_not_unique=True):
@@ -315,11 +536,14 @@ class RepoObjectDiskStorage(RepoStore):
                                                         if None, no fields are returned, if set to 'all', all fields will be returned  (default: {None})
             repo_info_fields {list of strings or string} -- list of strings identifying the fields of the repo_info dict which will be returned in the dictionary,
                                                         if None, no fields are returned, if set to 'all', all fields will be returned (default: {None})
+
+        If obj_fields and repo_info_fields are both None, the complete objects are returned. If only repo_info_fields are specified,
+        the result is read from the database and the object files are not opened.
         """
 
         category = None
         with closing(self._conn.cursor()) as cursor:
-            for row in cursor.execute('select category from mapping where name = ' + "'" + name + "'"):
+            for row in cursor.execute('select category from mapping where name = ?', (name,)):
                 category = repo.MLObjectType(row[0])
             if category is None:
                 if throw_error_not_exist:
@@ -328,27 +552,61 @@ class RepoObjectDiskStorage(RepoStore):
                 else:
                     return []
 
-            version_condition = self.get_version_condition(
+            version_condition, parameters = self.get_version_condition(
                 name, versions, 'version', 'uuid_time')
 
-            select_statement = "select path, file from versions where name = '" + \
-                name + "'" + version_condition
+            select_statement = "select path, file, version, repo_info from versions where name = ?" + version_condition
+            parameters = [name] + parameters
             if modifier_versions is not None:
                 for k, v in modifier_versions.items():
-                    tmp = self.get_version_condition(
+                    tmp, tmp_parameters = self.get_version_condition(
                         k, v, 'modifier_version', 'modifier_uuid_time')
                     if tmp != '':
-                        select_statement += " and version in ( select version from modification_info where name ='" + \
-                            name + "' and modifier = '" + k + "'" + tmp + ")"
-            files = [row[0] + '/' + row[1]
-                    for row in cursor.execute(select_statement)]
+                        select_statement += " and version in ( select version from modification_info where name = ? and modifier = ?" + tmp + ")"
+                        parameters.extend([name, k] + tmp_parameters)
+            rows = [row for row in cursor.execute(select_statement, parameters)]
+            # if only repo_info fields are requested, the object files need not to be read
+            metadata_only = obj_fields is None and repo_info_fields is not None
             objects = []
-            for filename in files:
-                objects.append(self._load_function(
-                    self._main_dir + '/' + filename))
-            self._conn.commit()
+            for path, filename, version, repo_info in rows:
+                if metadata_only and repo_info is not None:
+                    obj = {'repo_info': json.loads(repo_info, cls=_RepoJSONDecoder)}
+                else:
+                    obj = self._load(
+                        self._main_dir + '/' + path + '/' + filename)
+                if obj_fields is not None or repo_info_fields is not None:
+                    obj = _select_fields(obj, obj_fields, repo_info_fields)
+                objects.append(obj)
         return objects
 
+    def _get_by_modification_info(self, modifier_name, modifier_version, object_types=[], load_objects=True):
+        """ Return list of all objects which were modified by a given object.
+
+        The objects are determined by one query on the modification_info table, the object files are only read if load_objects is True.
+
+        Arguments:
+            modifier_name {str} -- name of object which modified th searched objects
+            modifier_version {str} -- version of object which modified th searched objects
+
+        Keyword Arguments:
+            object_types {list of str} -- list of strings defining the object types (default: {[]})
+            load_objects {bool} -- if True, the objects are returned, otherwise only tuples of their names and versions (default: {True})
+
+        Returns:
+            list -- list of objects (or tuples of name and version), empty if no such objects exist
+        """
+
+        if len(object_types) == 0:
+            return []
+        with closing(self._conn.cursor()) as cursor:
+            rows = cursor.execute("select m.name, m.version from modification_info m join mapping p on m.name = p.name "
+                                  + "where m.modifier = ? and m.modifier_version = ? and p.category in (" 
+                                  + ', '.join(['?'] * len(object_types)) + ") order by m.name, m.version",
+                                  [modifier_name, modifier_version] + list(object_types)).fetchall()
+        if not load_objects:
+            return rows
+        return [self.get(name, versions=version)[0] for name, version in rows]
+
     def get_latest_version(self, name, throw_error_not_exist=True):
         """ Determine the latest version of the object
         
@@ -366,7 +624,7 @@ class RepoObjectDiskStorage(RepoStore):
         """
 
         with closing(self._conn.cursor()) as cursor:
-            for row in cursor.execute("select version from versions where name = '" + name + "' order by uuid_time DESC LIMIT 1"):
+            for row in cursor.execute("select version from versions where name = ? order by uuid_time DESC LIMIT 1", (name,)):
                 result = row[0]
                 return result
         if throw_error_not_exist:
@@ -391,7 +649,7 @@ class RepoObjectDiskStorage(RepoStore):
             str -- the first version string of the object
         """
         with closing(self._conn.cursor()) as cursor:
-            for row in cursor.execute("select version from versions where name = '" + name + "' order by uuid_time ASC LIMIT 1"):
+            for row in cursor.execute("select version from versions where name = ? order by uuid_time ASC LIMIT 1", (name,)):
                 result = row[0]
                 return result
         if throw_error_not_exist:
@@ -418,17 +676,13 @@ class RepoObjectDiskStorage(RepoStore):
         """
         with closing(self._conn.cursor()) as cursor:
             if offset > 0:
-                inner_select = "(select version, uuid_time from versions where name = '" + \
-                    name + "' order by uuid_time ASC LIMIT " + str(offset) + ")"
-                stmt = "select version from " + inner_select + " order by uuid_time DESC LIMIT 1"
-                for row in cursor.execute(stmt):
+                stmt = "select version from (select version, uuid_time from versions where name = ? order by uuid_time ASC LIMIT ?) order by uuid_time DESC LIMIT 1"
+                for row in cursor.execute(stmt, (name, offset)):
                     result = row[0]
                     return result
             elif offset < 0:
-                inner_select = "(select version, uuid_time from versions where name = '" + \
-                    name + "' order by uuid_time DESC LIMIT " + str(-offset) + ")"
-                stmt = "select version from " + inner_select + " order by uuid_time ASC LIMIT 1"
-                for row in cursor.execute(stmt):
+                stmt = "select version from (select version, uuid_time from versions where name = ? order by uuid_time DESC LIMIT ?) order by uuid_time ASC LIMIT 1"
+                for row in cursor.execute(stmt, (name, -offset)):
                     result = row[0]
                     return result
             if offset == 0:
@@ -448,22 +702,21 @@ class RepoObjectDiskStorage(RepoStore):
 
         logger.info('Replacing ' + obj["repo_info"][RepoInfoKey.NAME.value] +
                     ', version ' + str(obj["repo_info"][RepoInfoKey.VERSION.value]))
-        select_statement = "select path, file from versions where name = '" +\
-            obj["repo_info"][RepoInfoKey.NAME.value] + "' and version = '" +\
-            str(obj["repo_info"][RepoInfoKey.VERSION.value]) + "'"
+        name = obj["repo_info"][RepoInfoKey.NAME.value]
+        version = str(obj["repo_info"][RepoInfoKey.VERSION.value])
+        self._invalidate_cache(name, version)
         with closing(self._conn.cursor()) as cursor:
-            for row in cursor.execute(select_statement):
-                self._save_function(self._main_dir + '/' +
-                                    str(row[0]) + '/' + str(row[1]), obj)
+            for row in cursor.execute("select path, file from versions where name = ? and version = ?", (name, version)).fetchall():
+                self._save(self._main_dir + '/' +
+                           str(row[0]) + '/' + str(row[1]), obj)
+            cursor.execute("update versions set repo_info = ? where name = ? and version = ?", 
+                    (RepoObjectDiskStorage._repo_info_to_json(obj['repo_info']), name, version))
             # delete all modification infos
-            cursor.execute("delete from modification_info where name='" + obj["repo_info"][RepoInfoKey.NAME.value] + "' and version = '" +
-                    str(obj["repo_info"][RepoInfoKey.VERSION.value]) + "'")
-            if repo_objects.RepoInfoKey.MODIFICATION_INFO.value in obj['repo_info']:
-                for k, v in obj['repo_info'][repo_objects.RepoInfoKey.MODIFICATION_INFO.value].items():
-                    tmp = _time_from_version(v)
-                    cursor.execute("insert into modification_info (name, version, modifier, modifier_version, modifier_uuid_time) VALUES ('"
-                            + obj["repo_info"][RepoInfoKey.NAME.value] + "','" + str(obj["repo_info"][RepoInfoKey.VERSION.value]) + "','" + k + "','" + str(v) + "','" + str(tmp) + "')")
-            self._conn.commit()
+            cursor.execute("delete from modification_info where name = ? and version = ?", (name, version))
+            cursor.executemany(RepoObjectDiskStorage._INSERT_MODIFICATION_INFO, 
+                RepoObjectDiskStorage._modification_info_rows(obj['repo_info']))
+            if self._transaction_depth == 0:
+                self._conn.commit()
           
     def close_connection(self):
         """ Closes the database connection
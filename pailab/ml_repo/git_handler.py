@@ -36,6 +36,7 @@ class RepoObjectGitStorage(RepoObjectDiskStorage):
             load_function {} -- function used to load the objects from disk. (default: {pickle_load})
         """
 
+        self._transaction_messages = []
         super(RepoObjectGitStorage, self).__init__(**kwargs)
         # initialize git repo if it does not exist
         if not RepoObjectGitStorage._is_git_repo(self._main_dir):
@@ -52,7 +53,7 @@ class RepoObjectGitStorage(RepoObjectDiskStorage):
         message = 'adding ' + obj['repo_info']['name']
         if (obj['repo_info']['commit_message'] is not None) and (obj['repo_info']['commit_message'] != ""):
             message = obj['repo_info']['commit_message']
-        self.commit(message)
+        self._commit_or_defer(message)
 
     def _delete(self, name, version):
         """ Delete an object from the repo
@@ -63,7 +64,7 @@ class RepoObjectGitStorage(RepoObjectDiskStorage):
         """
 
         super(RepoObjectGitStorage, self)._delete(name, version)
-        self.commit('deleting ' + name + ', version ' + version)
+        self._commit_or_defer('deleting ' + name + ', version ' + version)
 
     def replace(self, obj):
         """ Overwrite existing object without incrementing version
@@ -73,8 +74,38 @@ class RepoObjectGitStorage(RepoObjectDiskStorage):
         """
 
         super(RepoObjectGitStorage, self).replace(obj)
-        self.commit('Replace object ' + obj['repo_info']['name'] +
-                    ', version ' + obj['repo_info']['version'] + '.')
+        self._commit_or_defer('Replace object ' + obj['repo_info']['name'] +
+                              ', version ' + obj['repo_info']['version'] + '.')
+
+    def _commit_or_defer(self, message):
+        """ Commits the changes or, within a transaction, defers the commit until the transaction is committed
+
+        Arguments:
+            message {str} -- commit message
+        """
+
+        if self._transaction_depth > 0:
+            if message not in self._transaction_messages:
+                self._transaction_messages.append(message)
+        else:
+            self.commit(message)
+
+    def _commit_pending(self):
+        """ Writes all files of the transaction, commits the database changes and creates one git commit
+        """
+
+        messages = self._transaction_messages
+        self._transaction_messages = []
+        super(RepoObjectGitStorage, self)._commit_pending()
+        if len(messages) > 0:
+            self.commit('\n'.join(messages))
+
+    def _discard_pending(self):
+        """ Rolls back the database changes of the transaction and drops the pending commit messages
+        """
+
+        self._transaction_messages = []
+        super(RepoObjectGitStorage, self)._discard_pending()
 
     def commit(self, message):
         """ Commits the changes
@@ -123,11 +154,11 @@ class RepoObjectGitStorage(RepoObjectDiskStorage):
 
         c = self._conn.cursor()
         c.execute('ATTACH DATABASE "' + sqlite_db_2 + '" AS db_2')
-        statement = 'INSERT OR IGNORE INTO versions(name, version, file, uuid_time) SELECT name, version, file, uuid_time FROM db_2.versions;'
+        statement = 'INSERT OR IGNORE INTO versions(name, version, path, file, uuid_time, repo_info) SELECT name, version, path, file, uuid_time, repo_info FROM db_2.versions;'
         c.execute(statement)
         statement = 'INSERT OR IGNORE INTO mapping(name, category) SELECT name, category FROM db_2.mapping;'
         c.execute(statement)
-        statement = 'INSERT OR IGNORE INTO modification_info(name, version, modifier, modifier_version) SELECT name, version, modifier, modifier_version FROM db_2.modification_info;'
+        statement = 'INSERT OR IGNORE INTO modification_info(name, version, modifier, modifier_version, modifier_uuid_time) SELECT name, version, modifier, modifier_version, modifier_uuid_time FROM db_2.modification_info;'
         c.execute(statement)
         self._conn.commit()
         c.execute("DETACH DATABASE 'db_2';")
@@ -160,5 +191,8 @@ class RepoObjectGitStorage(RepoObjectDiskStorage):
             os.rename(self._sqlite_db_name() + '_old', self._sqlite_db_name())
             raise Exception('An error occured during pull: ' + (str(e)))
         self._conn = sqlite3.connect(self._sqlite_db_name())
+        self._migrate_db()
         self._merge_from_db(self._sqlite_db_name() + '_old')
         os.remove(self._sqlite_db_name() + '_old')
+        self._clear_version_index()
+        self._data_version = None
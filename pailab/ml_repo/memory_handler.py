@@ -1,9 +1,11 @@
 import datetime
+import uuid
+from bisect import bisect_left, bisect_right
 from copy import deepcopy
-from numpy import concatenate
+from numpy import concatenate, ndarray
 import pailab.ml_repo.repo_objects as repo_objects
 import pailab.ml_repo.repo as repo
-from pailab.ml_repo.repo_store import RepoStore, NumpyStore, _time_from_version
+from pailab.ml_repo.repo_store import RepoStore, NumpyStore, _time_from_version, _select_fields, _column_index, _freeze
 import logging
 logger = logging.getLogger(__name__)
 
@@ -12,6 +14,12 @@ class RepoObjectMemoryStorage(RepoStore):
     """ The repo object memory storage. 
     This class is used to store repo object (excluding large objects) in the memory.
     The importance of the handler is mostly for testing purposes.
+
+    By default each object is deep copied when it is read. If the storage is constructed with frozen_objects=True, a copy 
+    of each object is frozen when it is added, i.e. all dictionaries and lists of the object are replaced by read-only 
+    versions and all numpy arrays are set to not writeable. Reads then return the stored values without copying them 
+    (only the repo_info is copied) and any attempt to modify them raises an exception. A deepcopy of a returned value is 
+    a private modifiable copy. Other mutable objects (e.g. fitted estimators) are shared between all reads and must not be modified.
     """
 
     # region private
@@ -108,15 +116,163 @@ class RepoObjectMemoryStorage(RepoStore):
             else:
                 return []
         return self._store[category][name]
+
+    def _update_modifier_index(self, obj, remove=False):
+        """ Adds (or removes) the object to the index of objects modified by a (modifier, modifier version)
+
+        Arguments:
+            obj {dict} -- object dictionary
+
+        Keyword Arguments:
+            remove {bool} -- if True, the object is removed from the index (default: {False})
+        """
+
+        repo_info = obj['repo_info']
+        key = (repo_info[repo_objects.RepoInfoKey.NAME.value], repo_info[repo_objects.RepoInfoKey.VERSION.value])
+        for modifier in repo_info.get(repo_objects.RepoInfoKey.MODIFICATION_INFO.value, {}).items():
+            if remove:
+                objs = self._modifier_index.get(modifier, {})
+                objs.pop(key, None)
+                if len(objs) == 0:
+                    self._modifier_index.pop(modifier, None)
+            else:
+                self._modifier_index.setdefault(modifier, {})[key] = None
+
+    def _position(self, name, version):
+        """ Return the position of the version in the time ordered list of versions of the object
+
+        Arguments:
+            name {str} -- name of the object
+            version {str} -- version of the object
+
+        Returns:
+            int -- position of the version, -1 if the version does not exist
+        """
+
+        if version not in self._versions.get(name, {}):
+            return -1
+        times = self._times[name]
+        objs = self._store[self._name_to_category[name]][name]
+        i = bisect_left(times, uuid.UUID(version).time)
+        while i < len(times) and objs[i]['repo_info'][repo_objects.RepoInfoKey.VERSION.value] != version:
+            i += 1
+        return i
+
+    def _select_versions(self, name, objs, versions):
+        """ Return the objects matching the version specification
+
+        Arguments:
+            name {str} -- name of the object
+            objs {list} -- time ordered list of all versions of the object
+            versions {list, version_number, tuple} -- version specification as described in _get
+
+        Returns:
+            list -- list of the matching objects in time order
+        """
+
+        if versions is None:
+            return objs
+        if isinstance(versions, str):
+            obj = self._versions[name].get(versions)
+            if obj is None:
+                return []
+            return [obj]
+        if isinstance(versions, list):
+            positions = sorted(set([self._position(name, v) for v in versions]) - set([-1]))
+            return [objs[i] for i in positions]
+        if isinstance(versions, tuple):
+            times = self._times[name]
+            start = 0
+            if versions[0] is not None:
+                start = bisect_left(times, uuid.UUID(versions[0]).time)
+            end = len(times)
+            if versions[1] is not None:
+                end = bisect_right(times, uuid.UUID(versions[1]).time)
+            return objs[start:end]
+        return [x for x in objs if self._is_in_versions(x['repo_info'][repo_objects.RepoInfoKey.VERSION.value], versions)]
+
+    def _select_modifications(self, name, objs, modifications):
+        """ Return the objects matching the modifier version specification
+
+        Single versions and lists of versions of the modifiers are looked up in the modifier index.
+
+        Arguments:
+            name {str} -- name of the object
+            objs {list} -- list of objects
+            modifications {dict} -- modifier names together with version specs
+
+        Returns:
+            list -- list of the matching objects
+        """
+
+        if modifications is None:
+            return objs
+        for k, v in modifications.items():
+            if isinstance(v, str):
+                v = [v]
+            if isinstance(v, list):
+                allowed = set()
+                for modifier_version in v:
+                    allowed.update(self._modifier_index.get((k, modifier_version), {}).keys())
+                objs = [x for x in objs if (name, x['repo_info'][repo_objects.RepoInfoKey.VERSION.value]) in allowed]
+            else:
+                objs = [x for x in objs if self._is_in_modifications(x, {k: v})]
+        return objs
+
+
+    def _freeze_object(self, obj):
+        """ Return the object dictionary as it is stored
+
+        If the storage uses frozen objects, a frozen copy of the object is returned, otherwise the object itself.
+
+        Arguments:
+            obj {dict} -- object dictionary
+
+        Returns:
+            dict -- the object dictionary to store
+        """
+
+        if not self._frozen_objects:
+            return obj
+        result = {k: _freeze(deepcopy(v)) for k, v in obj.items() if k != 'repo_info'}
+        result['repo_info'] = deepcopy(obj['repo_info'])
+        return result
+
+    def _read_object(self, obj):
+        """ Return the object dictionary as it is returned by a read
+
+        Arguments:
+            obj {dict} -- stored object dictionary
+
+        Returns:
+            dict -- deep copy of the object or (for frozen objects) a shallow copy with a copy of the repo_info
+        """
+
+        if not self._frozen_objects:
+            return deepcopy(obj)
+        result = dict(obj)
+        if 'repo_info' in obj.keys():
+            result['repo_info'] = deepcopy(obj['repo_info'])
+        return result
 # endregion
 
-    def __init__(self):
+    def __init__(self, frozen_objects=False):
         """ Initializes the handler
+
+        Keyword Arguments:
+            frozen_objects {bool} -- if True, objects are frozen when they are added and returned without copying them (default: {False})
         """
 
+        self._frozen_objects = frozen_objects
         self._store={}
         self._name_to_category={}
         self._categories={}
+        # (modifier, modifier version) -> objects (name, version) modified by the modifier, used as ordered set
+        self._modifier_index = {}
+        # name -> time ordered list of uuid times of the versions (same order as the list of objects in _store)
+        self._times = {}
+        # name -> dictionary of version -> object
+        self._versions = {}
 
     def _delete(self, name, version):
         """ Delete an object from the repo
@@ -126,18 +282,21 @@ class RepoObjectMemoryStorage(RepoStore):
             version {str} -- the version of the object to delete
         """
 
+        self._invalidate_cache(name, version)
+        self._clear_version_index(name)
         category = self._name_to_category[name]
         objs = self._store[category][name]
-        counter = -1
-        for i in range(len(objs)):
-            if objs[i]['repo_info'][repo_objects.RepoInfoKey.VERSION.value] == version:
-                counter = i
-                break
+        counter = self._position(name, version)
         if counter >-1:
+            self._update_modifier_index(objs[counter], remove=True)
             del objs[counter]
+            del self._times[name][counter]
+            del self._versions[name][version]
             if len(objs) == 0:
                 del self._store[category][name]
                 del self._name_to_category[name]
+                del self._times[name]
+                del self._versions[name]
         
     def _add(self, obj):
         """ Adds an object to the storage
@@ -148,6 +307,7 @@ class RepoObjectMemoryStorage(RepoStore):
             obj {RepoObject} -- the repo object to add to git
         """
 
+        obj=self._freeze_object(obj)
         category=obj['repo_info'][repo_objects.RepoInfoKey.CATEGORY.value]
         if not isinstance(category, str):
             category=category.value
@@ -157,10 +317,23 @@ class RepoObjectMemoryStorage(RepoStore):
             self._store[category]={}
         tmp=self._store[category]
         if not name in tmp.keys():
-            tmp[name]=[obj]
-        else:
+            tmp[name]=[]
+            self._times[name]=[]
+            self._versions[name]={}
+        # keep the versions ordered by time, new versions are usually appended
+        version=obj['repo_info'][repo_objects.RepoInfoKey.VERSION.value]
+        time=uuid.UUID(version).time
+        times=self._times[name]
+        if len(times) == 0 or time >= times[-1]:
             tmp[name].append(obj)
+            times.append(time)
+        else:
+            i=bisect_right(times, time)
+            tmp[name].insert(i, obj)
+            times.insert(i, time)
+        self._versions[name][version]=obj
         self._name_to_category[name]=category
+        self._update_modifier_index(obj)
         if not category in self._categories.keys():
             self._categories[category]=set()
         self._categories[category].add(name)
@@ -195,13 +368,41 @@ class RepoObjectMemoryStorage(RepoStore):
         """
 
         tmp=self._get_object_list(name, throw_error_not_exist, throw_error_not_unique)
+        if len(tmp) == 0:
+            return []
+        tmp=self._select_versions(name, tmp, versions)
+        tmp=self._select_modifications(name, tmp, modifier_versions)
         result=[]
         for x in tmp:
-            if self._is_in_versions(x['repo_info'][repo_objects.RepoInfoKey.VERSION.value], versions):
-                if self._is_in_modifications(x, modifier_versions):
-                    result.append(deepcopy(x))
+            if obj_fields is None and repo_info_fields is None:
+                result.append(self._read_object(x))
+            else:
+                result.append(self._read_object(_select_fields(x, obj_fields, repo_info_fields)))
         return result
 
+    def _get_by_modification_info(self, modifier_name, modifier_version, object_types=[], load_objects=True):
+        """ Return list of all objects which were modified by a given object.
+
+        The objects are looked up in the index of modified objects which is maintained by add, replace and delete.
+
+        Arguments:
+            modifier_name {str} -- name of object which modified th searched objects
+            modifier_version {str} -- version of object which modified th searched objects
+
+        Keyword Arguments:
+            object_types {list of str} -- list of strings defining the object types (default: {[]})
+            load_objects {bool} -- if True, the objects are returned, otherwise only tuples of their names and versions (default: {True})
+
+        Returns:
+            list -- list of objects (or tuples of name and version), empty if no such objects exist
+        """
+
+        result = [(name, version) for name, version in self._modifier_index.get((modifier_name, modifier_version), {}).keys()
+                  if self._name_to_category[name] in object_types]
+        if not load_objects:
+            return result
+        return [self._get(name, versions=version)[0] for name, version in result]
+
     def get_version(self, name, offset, throw_error_not_exist=True):
         """ Return the newest version up to offset versions
         
@@ -320,19 +521,107 @@ class RepoObjectMemoryStorage(RepoStore):
                             name + ' and category ' + category + ' exists.')
         all_obj = tmp[name]
         version = obj['repo_info'][repo_objects.RepoInfoKey.VERSION.value]
-        for i, x in enumerate(all_obj):
-            if version == x['repo_info'][repo_objects.RepoInfoKey.VERSION.value]:
-                all_obj[i] = obj
-                return
-
+        self._invalidate_cache(name, version)
+        i = self._position(name, version)
+        if i > -1:
+            obj = self._freeze_object(obj)
+            self._update_modifier_index(all_obj[i], remove=True)
+            all_obj[i] = obj
+            self._versions[name][version] = obj
+            self._update_modifier_index(obj)
+            return
         logger.error('Cannot replace object: The version ' + str(obj['repo_info'][repo_objects.RepoInfoKey.VERSION.value])
                      + ' does not exist in storage.')
         raise Exception('Cannot replace object: The version ' + str(obj['repo_info'][repo_objects.RepoInfoKey.VERSION.value])
                         + ' does not exist in storage.')
 
 
+class _Chunks:
+    """ The rows of an array of one version of a numpy object, given as list of chunks
+
+    The chunks are the arrays given in add and append. The lists of chunks and of their (cumulative) end rows may be 
+    shared between the versions of an append chain, a version uses the first n_chunks chunks of the lists.
+    """
+
+    def __init__(self, chunks, ends, n_chunks):
+        """ Constructor
+
+        Arguments:
+            chunks {list of numpy arrays} -- list of chunks (possibly shared with other versions)
+            ends {list of int} -- list of the end rows of the chunks (possibly shared with other versions)
+            n_chunks {int} -- number of chunks belonging to the version
+        """
+
+        self._chunks = chunks
+        self._ends = ends
+        self._n_chunks = n_chunks
+
+    def append(self, data):
+        """ Return the chunks of a new version containing the rows of this version followed by the given rows
+
+        The lists of chunks are extended in place if this version is the last one using them, otherwise the 
+        chunks of this version are copied into new lists.
+
+        Arguments:
+            data {numpy array} -- the rows to append
+
+        Returns:
+            _Chunks -- the chunks of the new version
+        """
+
+        chunks, ends = self._chunks, self._ends
+        if len(chunks) != self._n_chunks:
+            chunks, ends = chunks[:self._n_chunks], ends[:self._n_chunks]
+        chunks.append(data)
+        ends.append(ends[-1] + data.shape[0])
+        return _Chunks(chunks, ends, self._n_chunks + 1)
+
+    def get(self, from_index=0, to_index=None, columns=None):
+        """ Return the rows from from_index to to_index
+
+        Only the chunks overlapping the rows are used. If all rows are requested, the chunks are concatenated once
+        and the result replaces the chunks of this version.
+
+        Keyword Arguments:
+            from_index {int} -- the index from which the data should be taken (default: {0})
+            to_index {int or None} -- the index to which the data is returned (None means till the end) (default: {None})
+            columns {list of int or None} -- the columns to return, None for all columns (default: {None})
+
+        Returns:
+            numpy array -- the rows (a view if the rows are contained in one chunk and the columns are contiguous)
+        """
+
+        n_rows = self._ends[self._n_chunks - 1]
+        start, end, _ = slice(from_index, to_index).indices(n_rows)
+        if start == 0 and end == n_rows and self._n_chunks > 1:
+            data = concatenate(self._chunks[:self._n_chunks], axis=0)
+            self._chunks, self._ends, self._n_chunks = [data], [n_rows], 1
+        end = max(start, end)
+        first = bisect_right(self._ends, start, 0, self._n_chunks - 1)
+        last = max(first, bisect_left(self._ends, end, 0, self._n_chunks - 1))
+        result = []
+        for i in range(first, last + 1):
+            offset = 0 if i == 0 else self._ends[i - 1]
+            rows = slice(max(start - offset, 0), end - offset)
+            if columns is None:
+                result.append(self._chunks[i][rows])
+            else:
+                result.append(self._chunks[i][rows, _column_index(columns)])
+        if len(result) == 1:
+            return result[0]
+        return concatenate(result, axis=0)
+
+
 class NumpyMemoryStorage(NumpyStore):
+    """ The numpy memory storage
+
+    Each version of an object is stored as a list of chunks (the arrays given in add and append) so that append does not
+    copy the data of the previous version. Reads only use the chunks overlapping the requested rows and the concatenation 
+    of the chunks of a version is kept after the version has been read completely.
+    """
+
     def __init__(self):
+        # name -> version -> key -> _Chunks (or None)
         self._store = {}
 
     def _delete(self, name, version):
@@ -359,10 +648,39 @@ class NumpyMemoryStorage(NumpyStore):
         """
 
         logger.debug('Adding data for ' + name + ' an version ' + str(version))
+        data = {}
+        for k, v in numpy_dict.items():
+            data[k] = None if v is None else _Chunks([v], [v.shape[0]], 1)
         if not name in self._store.keys():
-            self._store[name] = {version: numpy_dict}
+            self._store[name] = {version: data}
         else:
-            self._store[name][version] = numpy_dict
+            self._store[name][version] = data
+
+    def add_chunked(self, name, version, numpy_chunks):
+        """ Add numpy data of an object which is given in blocks of rows to the storage.
+
+        The blocks are kept as chunks of the version without copying them.
+
+        Arguments:
+            name {str} -- identifier (as string) of object
+            version {str} -- object version
+            numpy_chunks {iterable of numpy dict} -- the blocks of the numpy data, each containing the same keys
+        """
+
+        logger.debug('Adding data in blocks for ' + name + ' and version ' + str(version))
+        blocks = {}
+        for numpy_dict in numpy_chunks:
+            for k, v in numpy_dict.items():
+                blocks.setdefault(k, [])
+                if v is not None:
+                    blocks[k].append(v)
+        data = {}
+        for k, v in blocks.items():
+            ends = []
+            for x in v:
+                ends.append(x.shape[0] + (ends[-1] if len(ends) > 0 else 0))
+            data[k] = None if len(v) == 0 else _Chunks(v, ends, len(v))
+        self._store.setdefault(name, {})[version] = data
 
     def append(self, name, version_old, version_new, numpy_dict):
         """ appends an numpy dictionary to an existing object
@@ -382,10 +700,19 @@ class NumpyMemoryStorage(NumpyStore):
                          name + " does not exist.")
             raise Exception("Cannot append data because " +
                             name + " does not exist.")
-        self._store[name][version_new] = {
-            'previous': version_old,  'numpy_dict': numpy_dict}
-
-    def get(self, name, version, from_index=0, to_index=None):
+        if not version_old in self._store[name].keys():
+            logger.error("Cannot append data because version " + str(version_old) + " of " + name + " does not exist.")
+            raise Exception("Cannot append data because version " + str(version_old) + " of " + name + " does not exist.")
+        previous = self._store[name][version_old]
+        data = {}
+        for k, v in numpy_dict.items():
+            if previous.get(k) is None:
+                logger.error("Cannot append data because " + name + " has no data " + k + " in version " + str(version_old) + ".")
+                raise Exception("Cannot append data because " + name + " has no data " + k + " in version " + str(version_old) + ".")
+            data[k] = previous[k].append(v)
+        self._store[name][version_new] = data
+
+    def get(self, name, version, from_index=0, to_index=None, columns=None):
         """ get the numpy object for a name and a version, rows can be used
         
         Arguments:
@@ -395,6 +722,8 @@ class NumpyMemoryStorage(NumpyStore):
         Keyword Arguments:
             from_index {int} -- the index from which the data should be taken (default: {0})
             to_index {int or None} -- the index to which the data is returned (None means till the end) (default: {None})
+            columns {dict or None} -- if not None, only the arrays contained as keys are returned, restricted to the columns given 
+                                        by the list of column indices (None for all columns) belonging to the key (default: {None})
         
         Raises:
             Exception -- raises an exception if no object with the name exists
@@ -411,29 +740,12 @@ class NumpyMemoryStorage(NumpyStore):
         if not version in self._store[name].keys():
             raise Exception('No numpy data for object ' +
                             name + ' with version ' + str(version))
-        result = self._store[name][version]
-        new_result = result
-        if 'previous' in result.keys():
-            new_result = {}
-            prev = self.get(name, result['previous'])
-            for k, v in result['numpy_dict'].items():
-                new_result[k] = concatenate((prev[k], v), axis=0)
-
-        # adjust for given start and end indices
         if from_index != 0 or (to_index is not None):
-            tmp = {}
             logger.debug('Slice data from_index: ' +
                          str(from_index) + ', to_index: ' + str(to_index))
-            if from_index != 0 and (to_index is not None):
-                for k, v in new_result.items():
-                    tmp[k] = v[from_index:to_index, :]
-                    logger.debug(k + ' added with new shape ' + str(v.shape))
-            else:
-                if from_index != 0:
-                    for k, v in new_result.items():
-                        tmp[k] = v[from_index:-1, :]
-                if to_index is not None:
-                    for k, v in new_result.items():
-                        tmp[k] = v[0:to_index, :]
-            return tmp
-        return new_result
+        result = {}
+        for k, v in self._store[name][version].items():
+            if columns is not None and k not in columns.keys():
+                continue
+            result[k] = None if v is None else v.get(from_index, to_index, None if columns is None else columns[k])
+        return result
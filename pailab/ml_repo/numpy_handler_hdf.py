@@ -1,8 +1,11 @@
 import h5py
 import os
+import json
 import pathlib
+import contextlib
+from collections import OrderedDict
 import logging
-from pailab.ml_repo.repo_store import NumpyStore
+from pailab.ml_repo.repo_store import NumpyStore, _column_index
 logger = logging.getLogger(__name__)
 
 
@@ -28,9 +31,16 @@ class NumpyHDFStorage(NumpyStore):
 
     This handler is used to save and read data from hdf5.
 
+    If max_open_files is positive, the files opened for reading are kept open in a pool of at most max_open_files files 
+    (the least recently used file is closed if the pool is full) so that repeated reads need not open and parse the same file again.
+    Files are removed from the pool before they are written by this storage and all files are closed by close(). 
+    The files of the pool are opened without hdf5 file locking, otherwise other processes (e.g. the workers of a job runner) 
+    could not write to a file as long as it is kept open. Note that changes of the files by other processes may not be seen 
+    through files kept open.
     """
 
-    def __init__(self, folder, version_files=False):
+    def __init__(self, folder, version_files=False, compression=None, compression_level=None, shuffle=False, chunks=None,
+                 object_config=None, max_open_files=0, max_chain_depth=None):
         """ the class constructor
 
         Constructs the NumpyHDFStorage which stores numpy dictionaries in hdf5 files using h5py.
@@ -41,13 +51,128 @@ class NumpyHDFStorage(NumpyStore):
         Keyword Arguments:
             version_files {bool} -- If True, each version is contained in a separate file, otherwise all versions are in one file.
                 If you like to work in a distributed environmnt (e.g. multiple users working in parallel) you should set this parameter to True so that no file merge is necessary. (default: {False})
+            compression {str or None} -- compression filter of the datasets, either 'gzip', 'lzf' or None for no compression (default: {None})
+            compression_level {int or None} -- compression level (0-9) if gzip is used, None for the default level of h5py (default: {None})
+            shuffle {bool} -- if True, the shuffle filter is applied before compression which often improves the compression of numerical data (default: {False})
+            chunks {int or None} -- number of rows of a chunk of the datasets (the chunks contain all columns), None to let h5py choose the chunks (default: {None})
+            object_config {dict or None} -- dictionary of object names to dictionaries with the keys compression, compression_level, shuffle and chunks
+                overwriting the settings above for the respective objects (default: {None})
+            max_open_files {int} -- maximal number of files kept open for reading, 0 to close each file after reading (default: {0})
+            max_chain_depth {int or None} -- if version_files is True and an append results in a version whose virtual datasets refer to 
+                more than max_chain_depth previous versions, the new version is compacted (see compact), None for no automatic compaction (default: {None})
         """
 
         self.main_dir = folder
+        self._max_open_files = max_open_files
+        self._max_chain_depth = max_chain_depth
+        # file name -> h5py.File opened for reading, in the order of their last use
+        self._open_files = OrderedDict()
         self._version_files = version_files
+        self._dataset_config = {'compression': compression, 'compression_level': compression_level,
+                                'shuffle': shuffle, 'chunks': chunks}
+        self._object_config = {}
+        if object_config is not None:
+            self._object_config = object_config
+        self._get_dataset_options(None)
+        for k in self._object_config.keys():
+            self._get_dataset_options(k)
         if not os.path.exists(self.main_dir):
             os.makedirs(self.main_dir)
 
+    @contextlib.contextmanager
+    def _open_for_read(self, filename):
+        """ Context manager returning the file opened for reading
+
+        If the pool of open files is enabled, the file is taken from (or put into) the pool and kept open after the context is left.
+
+        Arguments:
+            filename {str} -- the file name (including the main directory)
+        """
+
+        if self._max_open_files <= 0:
+            with h5py.File(filename, 'r') as f:
+                yield f
+            return
+        f = self._open_files.pop(filename, None)
+        if f is None or not f.id.valid:
+            # a locked file could not be opened for writing by other processes while it is in the pool
+            f = h5py.File(filename, 'r', locking=False)
+        self._open_files[filename] = f
+        while len(self._open_files) > self._max_open_files:
+            _, f_old = self._open_files.popitem(last=False)
+            f_old.close()
+        yield f
+
+    def _close_files(self, *filenames):
+        """ Close the files of the pool of open files before they are written
+
+        Arguments:
+            filenames {str} -- the file names (including the main directory)
+        """
+
+        for filename in filenames:
+            f = self._open_files.pop(filename, None)
+            if f is not None:
+                f.close()
+
+    def close(self):
+        """ Close all files kept open for reading
+
+        The storage can still be used afterwards, the files are opened again when needed.
+        """
+
+        for f in self._open_files.values():
+            f.close()
+        self._open_files.clear()
+
+    def _get_dataset_options(self, name):
+        """ Return the settings of the datasets of an object
+
+        Arguments:
+            name {str or None} -- the identifier of the object, None for the settings of the storage
+
+        Raises:
+            Exception -- raises an exception if an unknown compression or setting is given
+
+        Returns:
+            dict -- dictionary of the settings with the keys compression, compression_level, shuffle and chunks
+        """
+
+        result = dict(self._dataset_config)
+        if name is not None and name in self._object_config.keys():
+            for k, v in self._object_config[name].items():
+                if k not in result.keys():
+                    logger.error('Unknown dataset setting ' + str(k) + ' for object ' + name + '.')
+                    raise Exception('Unknown dataset setting ' + str(k) + ' for object ' + name + '.')
+                result[k] = v
+        if result['compression'] not in [None, 'gzip', 'lzf']:
+            logger.error('Unknown compression ' + str(result['compression']) + ', use gzip, lzf or None.')
+            raise Exception('Unknown compression ' + str(result['compression']) + ', use gzip, lzf or None.')
+        return result
+
+    @staticmethod
+    def _create_dataset_kwargs(options, shape):
+        """ Return the keyword arguments for h5py create_dataset
+
+        Arguments:
+            options {dict} -- dictionary of the settings as returned by _get_dataset_options
+            shape {tuple} -- shape of the data
+
+        Returns:
+            dict -- keyword arguments for create_dataset
+        """
+
+        result = {}
+        if options['compression'] is not None:
+            result['compression'] = options['compression']
+            if options['compression'] == 'gzip' and options['compression_level'] is not None:
+                result['compression_opts'] = options['compression_level']
+        if options['shuffle']:
+            result['shuffle'] = True
+        if options['chunks'] is not None and all([x > 0 for x in shape[1:]]):
+            result['chunks'] = (options['chunks'], ) + tuple(shape[1:])
+        return result
+
     def _create_file_name(self, name, version, change_if_not_exist=False):
         """ Function to create the file name for an object 
 
@@ -75,22 +200,197 @@ class NumpyHDFStorage(NumpyStore):
     def _delete(self, name, version):
         """ Delete an object with a predefined version
 
+        In one file, the datasets shared by appended versions (via soft links) are moved to a remaining version if the version 
+        owning them is deleted and rows which are only used by the deleted version are removed. With version files, the versions 
+        whose virtual datasets refer to the deleted version are compacted before the file is removed. Note that hdf5 does not 
+        shrink files, use repack to reclaim the space in files containing more than one version.
+
         Arguments:
             name {str} -- identifier of the object
             version {str} -- the version id
         """
 
-        pass
+        if self._version_files and os.path.exists(self.main_dir + '/' + self._create_file_name(name, version)):
+            self._delete_version_file(name, version)
+            return
+        filename = self.main_dir + '/' + name + '.hdf5'
+        if not os.path.exists(filename):
+            return
+        self._close_files(filename)
+        with h5py.File(filename, 'a') as f:
+            if not 'data' in f or not str(version) in f['data']:
+                return
+            versions = [v for v in f['data'].keys() if v != str(version)]
+            grp = f['/data/' + str(version) + '/']
+            for k in list(grp.keys()):
+                data = grp[k]
+                dependents = [v for v in versions if k in f['/data/' + v] and f['/data/' + v][k] == data]
+                if len(dependents) == 0:
+                    continue
+                # determine the version owning the dataset (the hard link), the other versions refer to it by soft links
+                owner = [v for v in [str(version)] + dependents if isinstance(f['/data/' + v].get(k, getlink=True), h5py.HardLink)]
+                if owner[0] == str(version):
+                    owner_path = '/data/' + dependents[0] + '/' + k
+                    del f[owner_path]
+                    f.move('/data/' + str(version) + '/' + k, owner_path)
+                else:
+                    owner_path = '/data/' + owner[0] + '/' + k
+                for v in dependents:
+                    if '/data/' + v + '/' + k != owner_path:
+                        del f['/data/' + v + '/' + k]
+                        f['/data/' + v + '/' + k] = h5py.SoftLink(owner_path)
+                # remove the rows only used by the deleted version
+                data = f[owner_path]
+                n_rows = max([data.regionref.selection(f['/ref/' + v + '/' + k][()])[0] for v in dependents])
+                if n_rows < data.shape[0]:
+                    data.resize((n_rows, ) + data.shape[1:])
+            del f['/data/' + str(version)]
+            if '/ref/' + str(version) in f:
+                del f['/ref/' + str(version)]
+            remove_file = len(versions) == 0
+        if remove_file:
+            os.remove(filename)
+
+    def _get_dependents(self, name, version):
+        """ Return the versions whose virtual datasets refer to the file of a version (if version_files is True)
+
+        The versions are stored in the attribute dependents of the file when the virtual datasets are created.
+
+        Arguments:
+            name {str} -- identifier of the object
+            version {str} -- the version id
+
+        Returns:
+            list of str or None -- the versions, None if the file has been written before the dependents were recorded
+        """
+
+        self._close_files(self.main_dir + '/' + self._create_file_name(name, version))
+        with h5py.File(self.main_dir + '/' + self._create_file_name(name, version), 'r') as f:
+            if 'dependents' not in f.attrs:
+                return None
+            return json.loads(f.attrs['dependents'])
+
+    def _set_dependents(self, f, dependents):
+        """ Set the versions whose virtual datasets refer to a file
+
+        Arguments:
+            f {h5py.File} -- the file opened for writing
+            dependents {list of str} -- the versions
+        """
+
+        f.attrs['dependents'] = json.dumps(dependents)
+
+    def _add_dependent(self, name, version, dependent):
+        """ Record that the virtual datasets of a version refer to the file of another version
+
+        Arguments:
+            name {str} -- identifier of the object
+            version {str} -- the version whose file is referred to
+            dependent {str} -- the version referring to the file
+        """
+
+        dependents = self._get_dependents(name, version)
+        if dependents is None:
+            # the file has been written before the dependents were recorded, the dependents are determined when it is deleted
+            return
+        with h5py.File(self.main_dir + '/' + self._create_file_name(name, version), 'a') as f:
+            self._set_dependents(f, dependents + [str(dependent)])
+
+    def _delete_version_file(self, name, version):
+        """ Delete the file of a version (if version_files is True)
+
+        The versions whose virtual datasets refer to the data of the version (as recorded in the file) are compacted 
+        before the file is removed. For files written before the dependents were recorded, all files of the object are checked.
+
+        Arguments:
+            name {str} -- identifier of the object
+            version {str} -- the version id
+        """
+
+        filename = self._create_file_name(name, version)
+        folder = os.path.dirname(self.main_dir + '/' + filename)
+        prefix = os.path.basename(self.main_dir + '/' + name) + '_'
+        dependents = self._get_dependents(name, version)
+        if dependents is None:
+            dependents = [x[len(prefix):-len('.hdf5')] for x in os.listdir(folder) 
+                          if x.startswith(prefix) and x.endswith('.hdf5') and x != os.path.basename(filename)]
+        for other_version in dependents:
+            other_file = prefix + other_version + '.hdf5'
+            if not os.path.exists(os.path.join(folder, other_file)):  # removed by a compaction or deleted
+                continue
+            depends = False
+            self._close_files(os.path.join(folder, other_file))
+            with h5py.File(os.path.join(folder, other_file), 'r') as f:
+                if not '/data/' + other_version in f:
+                    continue
+                grp = f['/data/' + other_version]
+                for k in grp.keys():
+                    if grp[k].is_virtual:
+                        for source in grp[k].virtual_sources():
+                            depends = depends or os.path.basename(source.file_name) == os.path.basename(filename)
+            if depends:
+                self.compact(name, other_version)
+        self.close()
+        os.remove(self.main_dir + '/' + filename)
+        append_filename = self.main_dir + '/' + self._create_file_name(name + '_append', version)
+        if os.path.exists(append_filename):
+            os.remove(append_filename)
+
+    @trace
+    def repack(self, name=None):
+        """ Rewrite the files containing more than one version to reclaim the space of deleted data
+
+        hdf5 does not shrink files if data is deleted. This method copies all data of a file into a new file which replaces 
+        the old one. If version_files is True, each file contains only one version and nothing needs to be done.
+
+        Keyword Arguments:
+            name {str or None} -- identifier of the object whose file is repacked, None to repack all files (default: {None})
+
+        Returns:
+            int -- the number of bytes reclaimed
+        """
+
+        if self._version_files:
+            return 0
+        if name is not None:
+            filenames = [self.main_dir + '/' + name + '.hdf5']
+        else:
+            filenames = [os.path.join(root, x) for root, _, files in os.walk(self.main_dir) for x in files if x.endswith('.hdf5')]
+        self.close()
+        result = 0
+        for filename in filenames:
+            if not os.path.exists(filename):
+                continue
+            size = os.path.getsize(filename)
+            with h5py.File(filename, 'r') as f:
+                with h5py.File(filename + '.tmp', 'w') as f_new:
+                    if 'data' in f:
+                        # soft links of appended versions are copied as soft links
+                        f.copy(f['data'], f_new, 'data')
+                    if 'ref' in f:
+                        # the region references are created again since they refer to the datasets of the old file
+                        for v in f['ref'].keys():
+                            ref_grp = f_new.create_group('/ref/' + v + '/')
+                            for k in f['ref'][v].keys():
+                                data = f['/data/' + v][k]
+                                n_rows = data.regionref.selection(f['/ref/' + v][k][()])[0]
+                                data_new = f_new['/data/' + v][k]
+                                ref_grp.create_dataset(k, data=data_new.regionref[(slice(0, n_rows), ) + (slice(None), ) * (len(data_new.shape) - 1)])
+            os.replace(filename + '.tmp', filename)
+            result += size - os.path.getsize(filename)
+            logger.debug('Repacked ' + filename + ', reclaimed ' + str(size - os.path.getsize(filename)) + ' bytes.')
+        return result
 
     @staticmethod
     @trace
-    def _save(data_grp, ref_grp, numpy_dict):
+    def _save(data_grp, ref_grp, numpy_dict, options):
         """ saving the data 
 
         Arguments:
             data_grp {[type]} -- the data group
             ref_grp {[type]} -- the reference group 
             numpy_dict {numpy dict} -- the numpy dictionary to save
+            options {dict} -- the settings (compression, chunks) of the datasets as returned by _get_dataset_options
 
         Raises:
             NotImplementedException -- [description]
@@ -98,20 +398,21 @@ class NumpyHDFStorage(NumpyStore):
 
         for k, v in numpy_dict.items():
             if v is not None:
+                kwargs = NumpyHDFStorage._create_dataset_kwargs(options, v.shape)
                 if len(v.shape) == 1:
                     tmp = data_grp.create_dataset(
-                        k, data=v, maxshape=(None, ))
+                        k, data=v, maxshape=(None, ), **kwargs)
                     ref_grp.create_dataset(k, data=tmp.regionref[0:v.shape[0]])
                 else:
                     if len(v.shape) == 2:
                         tmp = data_grp.create_dataset(
-                            k, data=v, maxshape=(None, v.shape[1]))
+                            k, data=v, maxshape=(None, v.shape[1]), **kwargs)
                         ref_grp.create_dataset(
                             k, data=tmp.regionref[0:v.shape[0], 0:v.shape[1]])
                     else:
                         if len(v.shape) == 3:
                             tmp = data_grp.create_dataset(
-                                k, data=v, maxshape=(None, v.shape[1], v.shape[2]))
+                                k, data=v, maxshape=(None, v.shape[1], v.shape[2]), **kwargs)
                             ref_grp.create_dataset(
                                 k, data=tmp.regionref[0:v.shape[0], 0:v.shape[1], 0:v.shape[1]])
                         else:
@@ -119,26 +420,79 @@ class NumpyHDFStorage(NumpyStore):
                                 'Not implemenet for dim>3.')
 
     @trace
-    def add(self, name, version, numpy_dict):
+    def add(self, name, version, numpy_dict, options=None):
         """ Add numpy data from an object to the storage.
 
         Arguments:
             name {str} -- the identifier of the object to add
             version {str} -- the object version 
             numpy_dict {numpy dict} -- the numpy dictionary to add
+
+        Keyword Arguments:
+            options {dict or None} -- the settings (compression, chunks) of the datasets, None to use the settings for the object (default: {None})
         """
 
+        if options is None:
+            options = self._get_dataset_options(name)
+
         tmp = pathlib.Path(self.main_dir + '/' + name + 'hdf')
         save_dir = tmp.parent
         if not os.path.exists(save_dir):
             os.makedirs(save_dir)
-        with h5py.File(self.main_dir + '/' + self._create_file_name(name, version), 'a') as f:
+        filename = self.main_dir + '/' + self._create_file_name(name, version)
+        self._close_files(filename)
+        with h5py.File(filename, 'a') as f:
             grp_name = '/data/' + version + '/'
             logger.debug('Saving data ' + name +
                           ' in hdf5 to group ' + grp_name)
             grp = f.create_group(grp_name)
             ref_grp = f.create_group('/ref/' + str(version) + '/')
-            NumpyHDFStorage._save(grp, ref_grp, numpy_dict)
+            NumpyHDFStorage._save(grp, ref_grp, numpy_dict, options)
+            if self._version_files:
+                self._set_dependents(f, [])
+
+    @trace
+    def add_chunked(self, name, version, numpy_chunks):
+        """ Add numpy data of an object which is given in blocks of rows to the storage.
+
+        The datasets of the version are created from the first block and resized for each following block, so all blocks are 
+        contained in the datasets of the version (in the same file as data added by add) and only the current block is kept in memory.
+
+        Arguments:
+            name {str} -- the identifier of the object to add
+            version {str} -- the object version 
+            numpy_chunks {iterable of numpy dict} -- the blocks of the numpy data, each containing the same keys
+        """
+
+        options = self._get_dataset_options(name)
+        tmp = pathlib.Path(self.main_dir + '/' + name + 'hdf')
+        save_dir = tmp.parent
+        if not os.path.exists(save_dir):
+            os.makedirs(save_dir)
+        filename = self.main_dir + '/' + self._create_file_name(name, version)
+        self._close_files(filename)
+        with h5py.File(filename, 'a') as f:
+            grp_name = '/data/' + str(version) + '/'
+            logger.debug('Saving data ' + name + ' in blocks in hdf5 to group ' + grp_name)
+            grp = f.create_group(grp_name)
+            ref_grp = f.create_group('/ref/' + str(version) + '/')
+            if self._version_files:
+                self._set_dependents(f, [])
+            for numpy_dict in numpy_chunks:
+                for k, v in numpy_dict.items():
+                    if v is None:
+                        continue
+                    if k not in grp:
+                        kwargs = NumpyHDFStorage._create_dataset_kwargs(options, v.shape)
+                        grp.create_dataset(k, data=v, maxshape=(None, ) + v.shape[1:], **kwargs)
+                        continue
+                    data = grp[k]
+                    old_size = data.shape[0]
+                    data.resize((old_size + v.shape[0], ) + data.shape[1:])
+                    data[old_size:] = v
+            for k in grp.keys():
+                data = grp[k]
+                ref_grp.create_dataset(k, data=data.regionref[(slice(0, data.shape[0]), ) + (slice(None), ) * (len(data.shape) - 1)])
 
     @trace
     def _append_same_file(self, name, version_old, version_new, numpy_dict):
@@ -151,7 +505,9 @@ class NumpyHDFStorage(NumpyStore):
             numpy_dict {numpy dict} -- the data to add as a numpy dictionary
         """
 
-        with h5py.File(self.main_dir + '/' + self._create_file_name(name, version_new), 'a') as f:
+        filename = self.main_dir + '/' + self._create_file_name(name, version_new)
+        self._close_files(filename)
+        with h5py.File(filename, 'a') as f:
             logger.debug('Appending data ' + name +
                           ' in hdf5 with version ' + str(version_new))
 
@@ -196,15 +552,16 @@ class NumpyHDFStorage(NumpyStore):
             numpy_dict {numpy dict} -- the data to add as a numpy dictionary
         """
 
-        # save data to append in separate file
-        self.add(name + '_append', version_new, numpy_dict)
+        # save data to append in separate file (using the settings of the object)
+        self.add(name + '_append', version_new, numpy_dict, self._get_dataset_options(name))
         # get shape
         grp_name_old = '/data/' + str(version_old) + '/'
         grp_name_new = '/data/' + str(version_new) + '/'
         old_filename = self._create_file_name(name, version_old)
         new_filename = self._create_file_name(name, version_new)
         tmp_filename = self._create_file_name(name + '_append', version_new)
-        with h5py.File(self.main_dir + '/' + old_filename, 'r') as f_old:
+        self._close_files(self.main_dir + '/' + new_filename)
+        with self._open_for_read(self.main_dir + '/' + old_filename) as f_old:
             with h5py.File(self.main_dir + '/' + tmp_filename, 'r') as f_tmp:
                 with h5py.File(self.main_dir + '/' + new_filename, 'w') as f_new:
                     ref_grp = f_new.create_group(
@@ -216,7 +573,7 @@ class NumpyHDFStorage(NumpyStore):
                         grp_new_k = f_tmp[grp_name_new][k]
                         shape = (
                             grp_old_k.shape[0]+grp_new_k.shape[0], ) + grp_old_k.shape[1:]
-                        layout = h5py.VirtualLayout(shape=shape)
+                        layout = h5py.VirtualLayout(shape=shape, dtype=grp_old_k.dtype)
                         layout[0:grp_old_k.shape[0]
                                ] = h5py.VirtualSource(grp_old_k)
                         layout[grp_old_k.shape[0]
@@ -224,6 +581,115 @@ class NumpyHDFStorage(NumpyStore):
                         tmp = grp.create_virtual_dataset(k, layout)
                         ref_grp.create_dataset(k, data=tmp.regionref[:])
                         #ref_grp.create_virtual_dataset(k, layout)
+                    self._set_dependents(f_new, [])
+        self._add_dependent(name, version_old, version_new)
+        if self._max_chain_depth is not None and self.get_chain_depth(name, version_new) > self._max_chain_depth:
+            self.compact(name, version_new)
+
+    @staticmethod
+    def _get_dataset_chain_depth(dataset):
+        """ Return the number of nested virtual datasets needed to read a dataset
+
+        Arguments:
+            dataset {h5py.Dataset} -- the dataset
+
+        Returns:
+            int -- 0 for a dataset containing its data, otherwise 1 + the maximal depth of the sources of the virtual dataset
+        """
+
+        if not dataset.is_virtual:
+            return 0
+        depth = 0
+        for source in dataset.virtual_sources():
+            if source.file_name == '.':
+                depth = max(depth, NumpyHDFStorage._get_dataset_chain_depth(dataset.file[source.dset_name]))
+                continue
+            filename = source.file_name
+            if not os.path.exists(filename):
+                # relative paths are resolved relative to the file of the virtual dataset
+                filename = os.path.join(os.path.dirname(dataset.file.filename), os.path.basename(filename))
+            with h5py.File(filename, 'r') as f:
+                depth = max(depth, NumpyHDFStorage._get_dataset_chain_depth(f[source.dset_name]))
+        return depth + 1
+
+    def get_chain_depth(self, name, version):
+        """ Return the chain depth of a version, i.e. the maximal number of previous versions (files) the data of the version is read from
+
+        Arguments:
+            name {str} -- the object identifier
+            version {str} -- the object version
+
+        Returns:
+            int -- the chain depth (0 if the data is contained in the file of the version)
+        """
+
+        with self._open_for_read(self.main_dir + '/' + self._create_file_name(name, version, change_if_not_exist=True)) as f:
+            grp = f['/data/' + str(version) + '/']
+            return max([0] + [NumpyHDFStorage._get_dataset_chain_depth(grp[k]) for k in grp.keys()])
+
+    def get_chain_depths(self):
+        """ Return the chain depths of all versions of all objects in the storage
+
+        Returns:
+            dict -- dictionary of object names to dictionaries of versions and their chain depth (see get_chain_depth)
+        """
+
+        result = {}
+        for root, _, files in os.walk(self.main_dir):
+            for filename in files:
+                if not filename.endswith('.hdf5'):
+                    continue
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.main_dir).replace(os.sep, '/')[:-len('.hdf5')]
+                with h5py.File(path, 'r') as f:
+                    if not 'data' in f:
+                        continue
+                    versions = list(f['data'].keys())
+                for version in versions:
+                    obj_name = name
+                    if self._version_files:
+                        obj_name = name[:-len('_' + version)]
+                        # skip the files containing only the appended data
+                        if obj_name.endswith('_append') and os.path.exists(self.main_dir + '/' + obj_name[:-len('_append')] + '_' + version + '.hdf5'):
+                            continue
+                    result.setdefault(obj_name, {})[version] = self.get_chain_depth(obj_name, version)
+        return result
+
+    @trace
+    def compact(self, name, version):
+        """ Rewrite a version whose datasets are virtual datasets (chains of appended versions) so that it contains its data
+
+        This is only needed if version_files is True. The file of the version is replaced by a file containing the data 
+        (using the current settings of the storage), all other versions remain readable (later versions refer to the 
+        data of the rewritten version). The file with the data appended in this version is removed.
+
+        Arguments:
+            name {str} -- the object identifier
+            version {str} -- the object version
+        """
+
+        if not self._version_files:
+            logger.debug('Compaction of ' + name + ' not needed, all versions are contained in one file.')
+            return
+        filename = self.main_dir + '/' + self._create_file_name(name, version)
+        if not os.path.exists(filename):
+            logger.error('Cannot compact ' + name + ': No file for version ' + str(version) + '.')
+            raise Exception('Cannot compact ' + name + ': No file for version ' + str(version) + '.')
+        logger.debug('Compacting ' + name + ' with version ' + str(version))
+        numpy_dict = self.get(name, version)
+        dependents = self._get_dependents(name, version)
+        with h5py.File(filename + '.tmp', 'w') as f:
+            grp = f.create_group('/data/' + str(version) + '/')
+            ref_grp = f.create_group('/ref/' + str(version) + '/')
+            NumpyHDFStorage._save(grp, ref_grp, numpy_dict, self._get_dataset_options(name))
+            if dependents is not None:
+                self._set_dependents(f, dependents)
+        # files kept open may refer to the replaced file via virtual datasets
+        self.close()
+        os.replace(filename + '.tmp', filename)
+        append_filename = self.main_dir + '/' + self._create_file_name(name + '_append', version)
+        if os.path.exists(append_filename):
+            os.remove(append_filename)
 
     @trace
     def append(self, name, version_old, version_new, numpy_dict):
@@ -243,7 +709,7 @@ class NumpyHDFStorage(NumpyStore):
                 name, version_old, version_new, numpy_dict)
 
     @trace
-    def get(self, name, version, from_index=0, to_index=None):
+    def get(self, name, version, from_index=0, to_index=None, columns=None):
         """ get the numpy object for a name and a version, rows can be used
 
         Arguments:
@@ -253,6 +719,8 @@ class NumpyHDFStorage(NumpyStore):
         Keyword Arguments:
             from_index {int} -- the index from which the data should be taken (default: {0})
             to_index {int or None} -- the index to which the data is returned (None means till the end) (default: {None})
+            columns {dict or None} -- if not None, only the arrays contained as keys are returned, restricted to the columns given 
+                                        by the list of column indices (None for all columns) belonging to the key (default: {None})
 
         Raises:
             Exception -- raises an exception if no object with the name exists
@@ -262,33 +730,52 @@ class NumpyHDFStorage(NumpyStore):
             numpy array -- the numpy object to return
         """
 
-        # \todo auch hier muss die referenz einschl. Namen verwendet werden
-        with h5py.File(self.main_dir + '/' + self._create_file_name(name, version, change_if_not_exist=True), 'r') as f:
+        # the rows of the version are given by the region reference (appended versions in the same file share a resized dataset
+        # with their predecessors), only the requested rows are read from the dataset (or from the sources of a virtual dataset)
+        with self._open_for_read(self.main_dir + '/' + self._create_file_name(name, version, change_if_not_exist=True)) as f:
             grp_name = '/data/' + str(version) + '/'
             ref_grp = '/ref/' + str(version) + '/'
             logger.debug('Reading object ' + name +
-                          ' from hdf5, group ' + grp_name)
+                          ' from hdf5, group ' + grp_name + ', from_index: ' + str(from_index) + ', to_index: ' + str(to_index))
             grp = f[grp_name]
             ref_g = f[ref_grp]
             result = {}
             for k, v in ref_g.items():
-                result[k] = grp[k][v[()]]
-        # todo needs improvement, handle indices in reading
-        if from_index != 0 or (to_index is not None):
-            tmp = {}
-            if from_index != 0 and (to_index is not None):
-                for k, v in result.items():
-                    tmp[k] = v[from_index:to_index, :]
-            else:
-                if from_index != 0:
-                    for k, v in result.items():
-                        tmp[k] = v[from_index:-1, :]
-                if to_index is not None:
-                    for k, v in result.items():
-                        tmp[k] = v[0:to_index, :]
-            return tmp
+                if columns is not None and k not in columns.keys():
+                    continue
+                data = grp[k]
+                n_rows = data.regionref.selection(v[()])[0]
+                start, end, _ = slice(from_index, to_index).indices(n_rows)
+                rows = slice(start, max(start, end))
+                if columns is None or columns[k] is None:
+                    result[k] = data[rows]
+                else:
+                    result[k] = NumpyHDFStorage._read_columns(data, rows, columns[k])
         return result
 
+    @staticmethod
+    def _read_columns(data, rows, columns):
+        """ Read the given rows and columns of a dataset
+
+        Contiguous columns are read as one hyperslab, otherwise the (sorted and unique) columns are read as point selection
+        and brought into the given order afterwards.
+
+        Arguments:
+            data {h5py.Dataset} -- the dataset
+            rows {slice} -- the rows to read
+            columns {list of int} -- the indices of the columns to read
+
+        Returns:
+            numpy array -- the selected data
+        """
+
+        index = _column_index(columns)
+        if isinstance(index, slice):
+            return data[rows, index]
+        unique = sorted(set([c % data.shape[1] for c in index]))
+        positions = {c: i for i, c in enumerate(unique)}
+        return data[rows, unique][:, [positions[c % data.shape[1]] for c in index]]
+
     def object_exists(self, name, version):
         """ checks whether the object exists
 
@@ -302,7 +789,7 @@ class NumpyHDFStorage(NumpyStore):
 
         result = False
         try:
-            with h5py.File(self.main_dir + '/' + self._create_file_name(name, version, change_if_not_exist=True), 'a') as f:
+            with self._open_for_read(self.main_dir + '/' + self._create_file_name(name, version, change_if_not_exist=True)) as f:
                 grp_name = '/data/' + str(version) + '/'
                 result = grp_name in f
         except:
@@ -0,0 +1,456 @@
+import os
+import json
+import struct
+import logging
+from collections import OrderedDict
+from bisect import bisect_left, bisect_right
+import numpy as np
+from pailab.ml_repo.repo_store import NumpyStore, _column_index
+logger = logging.getLogger(__name__)
+
+
+class NumpyNpyStorage(NumpyStore):
+    """ The numpy npy handler
+
+    This handler stores each array of a version as (one or more) segments in .npy files. The segments of a version are listed
+    in a small manifest (a json file per version) together with their end rows. Appending data only writes a new segment
+    and the manifest of the new version which refers to the segments of the previous version.
+
+    The segments are read as memory mapped arrays (np.load with mmap_mode='r'), so that reading rows contained in one segment
+    does not copy any data and processes on the same host share the pages of the files. The returned arrays are read-only
+    if they are not copied (reads spanning more than one segment or selecting non-contiguous columns return copies).
+    Each memory map holds a file descriptor, so at most max_open_segments maps are kept (the least recently used map is 
+    released if more segments are read). If an append would result in more than max_segments segments, the newest segments 
+    are merged with the appended data into one segment of the new version, so that the number of segments (and the size 
+    of the manifests) stays bounded and each row is only copied a few times.
+    """
+
+    def __init__(self, folder, max_open_segments=128, max_segments=32):
+        """ the class constructor
+
+        Arguments:
+            folder {str} -- main directory where the files will be stored
+
+        Keyword Arguments:
+            max_open_segments {int} -- maximal number of memory mapped segments kept open, 0 to map the segments for each read (default: {128})
+            max_segments {int} -- maximal number of segments of an array of a version, appends merge segments if exceeded (default: {32})
+        """
+
+        self.main_dir = folder
+        self._max_open_segments = max_open_segments
+        self._max_segments = max(max_segments, 1)
+        # (name, version) -> (modification time and size of the manifest file, manifest of the version), the cached manifest 
+        # is only used as long as the file is unchanged since other processes may delete or rewrite it
+        self._manifests = {}
+        # path -> memory mapped segment, in the order of their last use
+        self._segments = OrderedDict()
+        if not os.path.exists(self.main_dir):
+            os.makedirs(self.main_dir)
+
+    def _get_dir(self, name):
+        """ Return the directory containing the manifests and segments of an object
+
+        Arguments:
+            name {str} -- the identifier of the object
+
+        Returns:
+            str -- the directory
+        """
+
+        return self.main_dir + '/' + name
+
+    def _get_manifest_file(self, name, version):
+        """ Return the file name of the manifest of a version
+
+        Arguments:
+            name {str} -- the identifier of the object
+            version {str} -- the version
+
+        Returns:
+            str -- the file name
+        """
+
+        return self._get_dir(name) + '/' + str(version) + '.json'
+
+    def _get_manifest(self, name, version, throw_error_not_exist=True):
+        """ Return the manifest of a version
+
+        The manifest is a dictionary of the array names to None (for arrays which are None) or a dictionary containing
+        the list of segment files (relative to the directory of the object) and the list of their end rows. A cached manifest
+        is only returned if the modification time and size of the manifest file did not change since it has been read.
+
+        Arguments:
+            name {str} -- the identifier of the object
+            version {str} -- the version
+
+        Keyword Arguments:
+            throw_error_not_exist {bool} -- true - throw error if the version does not exist, else return None (default: {True})
+
+        Raises:
+            Exception -- raises an exception if the version does not exist
+
+        Returns:
+            dict -- the manifest
+        """
+
+        key = (name, str(version))
+        filename = self._get_manifest_file(name, version)
+        try:
+            file_stat = NumpyNpyStorage._get_file_stat(filename)
+        except FileNotFoundError:
+            self._manifests.pop(key, None)
+            if not throw_error_not_exist:
+                return None
+            logger.error('No numpy data for object ' + name + ' with version ' + str(version))
+            raise Exception('No numpy data for object ' + name + ' with version ' + str(version))
+        if key not in self._manifests or self._manifests[key][0] != file_stat:
+            with open(filename, 'r') as f:
+                self._manifests[key] = (file_stat, json.load(f))
+        return self._manifests[key][1]
+
+    @staticmethod
+    def _get_file_stat(filename):
+        """ Return the modification time and the size of a file
+
+        Arguments:
+            filename {str} -- the file name
+
+        Returns:
+            tuple -- the modification time (in nanoseconds) and the size of the file
+        """
+
+        file_stat = os.stat(filename)
+        return file_stat.st_mtime_ns, file_stat.st_size
+
+    def _write_manifest(self, name, version, manifest):
+        """ Write the manifest of a version
+
+        The manifest is written to a temporary file which is then renamed so that readers never see incomplete manifests.
+
+        Arguments:
+            name {str} -- the identifier of the object
+            version {str} -- the version
+            manifest {dict} -- the manifest
+        """
+
+        filename = self._get_manifest_file(name, version)
+        with open(filename + '.tmp', 'w') as f:
+            json.dump(manifest, f)
+        os.replace(filename + '.tmp', filename)
+        self._manifests[(name, str(version))] = (NumpyNpyStorage._get_file_stat(filename), manifest)
+
+    def _write_segments(self, name, version, numpy_dict):
+        """ Write the arrays of a numpy dictionary as segments
+
+        Arguments:
+            name {str} -- the identifier of the object
+            version {str} -- the version the segments are written for
+            numpy_dict {numpy dict} -- the numpy dictionary
+
+        Returns:
+            dict -- dictionary of the array names to the segment file names (None for arrays which are None)
+        """
+
+        folder = self._get_dir(name)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        result = {}
+        for k, v in numpy_dict.items():
+            if v is None:
+                result[k] = None
+                continue
+            segment = str(version) + '_' + k + '.npy'
+            np.save(folder + '/' + segment, np.asarray(v), allow_pickle=False)
+            result[k] = segment
+        return result
+
+    def _load_segment(self, name, segment, n_rows):
+        """ Return the memory mapped array of a segment
+
+        Arguments:
+            name {str} -- the identifier of the object
+            segment {str} -- the segment file name
+            n_rows {int} -- number of rows of the segment
+
+        Returns:
+            numpy array -- the (read-only) array
+        """
+
+        path = self._get_dir(name) + '/' + segment
+        data = self._segments.pop(path, None)
+        if data is None:
+            if n_rows == 0:
+                # empty files cannot be mapped
+                data = np.load(path, allow_pickle=False)
+            else:
+                data = np.load(path, mmap_mode='r', allow_pickle=False)
+        if self._max_open_segments > 0:
+            self._segments[path] = data
+            while len(self._segments) > self._max_open_segments:
+                self._segments.popitem(last=False)
+        return data
+
+    def _delete(self, name, version):
+        """ Delete an object with a predefined version
+
+        The segments which are not used by other versions of the object are removed.
+
+        Arguments:
+            name {str} -- identifier of the object
+            version {str} -- the version id
+        """
+
+        manifest = self._get_manifest(name, version, throw_error_not_exist=False)
+        if manifest is None:
+            return
+        os.remove(self._get_manifest_file(name, version))
+        self._manifests.pop((name, str(version)), None)
+        folder = self._get_dir(name)
+        used = set()
+        for filename in os.listdir(folder):
+            if filename.endswith('.json'):
+                other = self._get_manifest(name, filename[:-len('.json')])
+                for v in other.values():
+                    if v is not None:
+                        used.update(v['segments'])
+        for v in manifest.values():
+            if v is None:
+                continue
+            for segment in v['segments']:
+                if segment not in used:
+                    self._segments.pop(folder + '/' + segment, None)
+                    os.remove(folder + '/' + segment)
+        if len(os.listdir(folder)) == 0:
+            os.rmdir(folder)
+
+    def add(self, name, version, numpy_dict):
+        """ Add numpy data from an object to the storage.
+
+        Arguments:
+            name {str} -- the identifier of the object to add
+            version {str} -- the object version
+            numpy_dict {numpy dict} -- the numpy dictionary to add
+        """
+
+        logger.debug('Adding data for ' + name + ' and version ' + str(version))
+        segments = self._write_segments(name, version, numpy_dict)
+        manifest = {}
+        for k, v in numpy_dict.items():
+            if v is None:
+                manifest[k] = None
+            else:
+                manifest[k] = {'segments': [segments[k]], 'ends': [v.shape[0] if len(v.shape) > 0 else 0]}
+        self._write_manifest(name, version, manifest)
+
+    @staticmethod
+    def _write_header(f, dtype, shape, length=None):
+        """ Write the header of a .npy file (format version 1.0)
+
+        Arguments:
+            f {file} -- the file opened for writing (positioned at the beginning)
+            dtype {numpy dtype} -- the data type of the array
+            shape {tuple} -- the shape of the array
+
+        Keyword Arguments:
+            length {int or None} -- the length of the header (including the magic string), None for the smallest length 
+                                    which is a multiple of 64 (default: {None})
+
+        Returns:
+            int -- the length of the header
+        """
+
+        magic = np.lib.format.magic(1, 0)
+        header = "{'descr': " + repr(np.lib.format.dtype_to_descr(dtype)) + ", 'fortran_order': False, 'shape': " + repr(tuple(shape)) + ", }"
+        if length is None:
+            length = (len(magic) + 2 + len(header) + 1 + 63) // 64 * 64
+        f.write(magic + struct.pack('<H', length - len(magic) - 2) + (header.ljust(length - len(magic) - 3) + '\n').encode('latin1'))
+        return length
+
+    def add_chunked(self, name, version, numpy_chunks):
+        """ Add numpy data of an object which is given in blocks of rows to the storage.
+
+        The blocks of each array are written one after another into one segment of the version whose header (containing 
+        the number of rows) is written again after the last block, so only the current block is kept in memory.
+
+        Arguments:
+            name {str} -- the identifier of the object to add
+            version {str} -- the object version
+            numpy_chunks {iterable of numpy dict} -- the blocks of the numpy data, each containing the same keys
+
+        Raises:
+            Exception -- raises an exception if the blocks of an array differ in the shape of their rows
+        """
+
+        logger.debug('Adding data in blocks for ' + name + ' and version ' + str(version))
+        folder = self._get_dir(name)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        # array name -> None or dict with the open segment file, its header length, the dtype, the shape of a row and the number of rows
+        segments = {}
+        try:
+            for numpy_dict in numpy_chunks:
+                for k, v in numpy_dict.items():
+                    if v is None:
+                        segments.setdefault(k, None)
+                        continue
+                    v = np.asarray(v)
+                    if segments.get(k) is None:
+                        segment = str(version) + '_' + k + '.npy'
+                        f = open(folder + '/' + segment, 'wb')
+                        # the header is written for the maximal number of rows so that the final header fits into it
+                        length = NumpyNpyStorage._write_header(f, v.dtype, (2**63 - 1, ) + v.shape[1:])
+                        segments[k] = {'segment': segment, 'file': f, 'length': length, 'dtype': v.dtype, 'shape': v.shape[1:], 'rows': 0}
+                    s = segments[k]
+                    if v.shape[1:] != s['shape']:
+                        logger.error('Cannot add block of ' + k + ' with shape ' + str(v.shape) + ' to rows of shape ' + str(s['shape']) + '.')
+                        raise Exception('Cannot add block of ' + k + ' with shape ' + str(v.shape) + ' to rows of shape ' + str(s['shape']) + '.')
+                    np.ascontiguousarray(v, dtype=s['dtype']).tofile(s['file'])
+                    s['rows'] += v.shape[0]
+            manifest = {}
+            for k, s in segments.items():
+                if s is None:
+                    manifest[k] = None
+                    continue
+                s['file'].seek(0)
+                NumpyNpyStorage._write_header(s['file'], s['dtype'], (s['rows'], ) + s['shape'], s['length'])
+                s['file'].close()
+                manifest[k] = {'segments': [s['segment']], 'ends': [s['rows']]}
+        except:
+            for s in segments.values():
+                if s is not None:
+                    s['file'].close()
+                    os.remove(folder + '/' + s['segment'])
+            raise
+        self._write_manifest(name, version, manifest)
+
+    def append(self, name, version_old, version_new, numpy_dict):
+        """ append data to the an existing object
+
+        Arguments:
+            name {str} -- the object identifier
+            version_old {str} -- the previous object version
+            version_new {str} -- the next object version
+            numpy_dict {numpy dict} -- the data to add as a numpy dictionary
+
+        Raises:
+            Exception -- raises an exception if the previous version does not contain an array of the numpy dictionary
+        """
+
+        previous = self._get_manifest(name, version_old)
+        for k in numpy_dict.keys():
+            if previous.get(k) is None:
+                logger.error('Cannot append data because ' + name + ' has no data ' + k + ' in version ' + str(version_old) + '.')
+                raise Exception('Cannot append data because ' + name + ' has no data ' + k + ' in version ' + str(version_old) + '.')
+        logger.debug('Appending data for ' + name + ' with version ' + str(version_new))
+        manifest = {}
+        for k, v in numpy_dict.items():
+            segments, ends = previous[k]['segments'], previous[k]['ends']
+            first = len(segments)
+            if len(segments) >= self._max_segments:
+                # merge the newest segments which are not larger than the segments merged after them (including the appended rows)
+                first -= 1
+                n_rows = ends[first] - (ends[first - 1] if first > 0 else 0) + v.shape[0]
+                while first > 0 and ends[first - 1] - (ends[first - 2] if first > 1 else 0) <= n_rows:
+                    first -= 1
+                    n_rows += ends[first] - (ends[first - 1] if first > 0 else 0)
+                logger.debug('Merging ' + str(len(segments) - first) + ' segments of ' + name + ' with the appended data of ' + k + '.')
+                parts = [self._load_segment(name, segments[i], ends[i] - (ends[i - 1] if i > 0 else 0)) for i in range(first, len(segments))]
+                segment = self._write_merged_segment(name, version_new, k, parts + [np.asarray(v)])
+            else:
+                segment = self._write_segments(name, version_new, {k: v})[k]
+            manifest[k] = {'segments': segments[:first] + [segment], 'ends': ends[:first] + [ends[-1] + v.shape[0]]}
+        self._write_manifest(name, version_new, manifest)
+
+    def _write_merged_segment(self, name, version, key, parts):
+        """ Write the concatenation of arrays as segment
+
+        The arrays are written one after another, so they are not concatenated in memory.
+
+        Arguments:
+            name {str} -- the identifier of the object
+            version {str} -- the version the segment is written for
+            key {str} -- the name of the array
+            parts {list of numpy arrays} -- the arrays to concatenate
+
+        Returns:
+            str -- the segment file name
+        """
+
+        segment = str(version) + '_' + key + '.npy'
+        dtype = np.result_type(*parts)
+        with open(self._get_dir(name) + '/' + segment, 'wb') as f:
+            NumpyNpyStorage._write_header(f, dtype, (sum([x.shape[0] for x in parts]), ) + parts[0].shape[1:])
+            for x in parts:
+                np.ascontiguousarray(x, dtype=dtype).tofile(f)
+        return segment
+
+    def get(self, name, version, from_index=0, to_index=None, columns=None):
+        """ get the numpy object for a name and a version, rows can be used
+
+        Arguments:
+            name {str} -- identifier of the object
+            version {str} -- version of the object
+
+        Keyword Arguments:
+            from_index {int} -- the index from which the data should be taken (default: {0})
+            to_index {int or None} -- the index to which the data is returned (None means till the end) (default: {None})
+            columns {dict or None} -- if not None, only the arrays contained as keys are returned, restricted to the columns given
+                                        by the list of column indices (None for all columns) belonging to the key (default: {None})
+
+        Raises:
+            Exception -- raises an exception if no object with the name and version exists
+
+        Returns:
+            numpy array -- the numpy object to return
+        """
+
+        logger.debug('Get data for ' + name + ' and version ' + str(version))
+        manifest = self._get_manifest(name, version)
+        result = {}
+        for k, v in manifest.items():
+            if columns is not None and k not in columns.keys():
+                continue
+            if v is None:
+                result[k] = None
+                continue
+            ends = v['ends']
+            index = None if columns is None or columns[k] is None else _column_index(columns[k])
+            if len(ends) == 1 and ends[0] == 0:
+                data = self._load_segment(name, v['segments'][0], 0)
+                if len(data.shape) == 0:
+                    result[k] = data
+                    continue
+            start, end, _ = slice(from_index, to_index).indices(ends[-1])
+            end = max(start, end)
+            first = bisect_right(ends, start, 0, len(ends) - 1)
+            last = max(first, bisect_left(ends, end, 0, len(ends) - 1))
+            parts = []
+            for i in range(first, last + 1):
+                offset = 0 if i == 0 else ends[i - 1]
+                data = self._load_segment(name, v['segments'][i], ends[i] - offset)
+                rows = slice(max(start - offset, 0), end - offset)
+                parts.append(data[rows] if index is None else data[rows, index])
+            if len(parts) == 1:
+                result[k] = parts[0]
+            else:
+                result[k] = np.concatenate(parts, axis=0)
+        return result
+
+    def object_exists(self, name, version):
+        """ checks whether the object exists
+
+        Arguments:
+            name {str} -- the identifier of the object
+            version {str} -- the version of the object
+
+        Returns:
+            bool -- returns true if the object exists
+        """
+
+        return os.path.exists(self._get_manifest_file(name, version))
+
+    def close(self):
+        """ Release the memory mapped segments (arrays returned before remain valid)
+        """
+
+        self._segments.clear()
@@ -3,11 +3,13 @@
 This module contains pailab's machine learning repository.
 """
 import abc
+import contextlib
 import json
+import itertools
 import os
 from datetime import datetime
 from numpy import linalg
-from numpy import inf, load
+from numpy import inf, load, ndarray
 from enum import Enum
 from copy import deepcopy
 from types import SimpleNamespace
@@ -255,7 +257,7 @@ class Job(RepoObject, abc.ABC):
 
         def get(self, name, version=None, full_object = False,
                 modifier_versions=None, obj_fields=None,  repo_info_fields=None,
-                throw_error_not_exist=True, throw_error_not_unique=True, adjust_modification_info = True):
+                throw_error_not_exist=True, throw_error_not_unique=True, adjust_modification_info = True, columns=None, lazy=False):
             """ Get function
             
             Arguments:
@@ -265,11 +267,13 @@ class Job(RepoObject, abc.ABC):
                 version {str} -- An explicit version of the object can be returned (default: {None})
                 full_object {bool} -- Determines whether to return the full object - meaning including large object parts (default: {False})
                 modifier_versions {str} -- [description] (default: {None})
-                obj_fields {[type]} -- [description] (default: {None})
-                repo_info_fields {[type]} -- [description] (default: {None})
+                obj_fields {[type]} -- not used, see MLRepo.get (default: {None})
+                repo_info_fields {[type]} -- not used, see MLRepo.get (default: {None})
                 throw_error_not_exist {bool} -- true - throw error if not exists, else return [] (default: {True})
                 throw_error_not_unique {bool} -- true - throw error if item is not unique, else return [] (default: {True})
                 adjust_modification_info {bool} -- [description] (default: {True})
+                columns {list of str or None} -- names of the coordinates of RawData and DataSet objects which are loaded, None for all coordinates (default: {None})
+                lazy {bool} -- if True, the numpy objects are loaded on first access (default: {False})
             """
 
             new_v = self._get_version(name, version)
@@ -280,7 +284,7 @@ class Job(RepoObject, abc.ABC):
                     m_v[k] = self._get_version(k,v)
             obj = self.ml_repo.get(name, version=new_v, full_object=full_object,
                 modifier_versions=m_v, obj_fields=obj_fields,  repo_info_fields=repo_info_fields,
-                throw_error_not_exist=throw_error_not_exist, throw_error_not_unique=throw_error_not_unique)
+                throw_error_not_exist=throw_error_not_exist, throw_error_not_unique=throw_error_not_unique, columns=columns, lazy=lazy)
             if isinstance(obj, list):
                 if len(obj) == 0:
                     if throw_error_not_exist:
@@ -316,6 +320,39 @@ class Job(RepoObject, abc.ABC):
             else:     
                 self.modification_info[obj.repo_info[RepoInfoKey.NAME]] = obj.repo_info[RepoInfoKey.VERSION]
 
+        def add_chunked(self, obj, numpy_chunks, message, category = None):
+            """ Add an object whose numpy data is given in blocks of rows (see MLRepo._add_chunked)
+            
+            Arguments:
+                obj {RepoObject} -- The object to add
+                numpy_chunks {iterable of numpy dict} -- the blocks of the numpy data
+                message {str} -- A commit message
+            
+            Keyword Arguments:
+                category {MLObjectType} -- The object type, if None the type is determined by the object (default: {None})
+            """
+
+            self.ml_repo._add_chunked(obj, numpy_chunks, message, category = category)
+            self.modification_info[obj.repo_info[RepoInfoKey.NAME]] = obj.repo_info[RepoInfoKey.VERSION]
+
+        def iter_batches(self, name, version=None, batch_size=10000, columns=None):
+            """ Iterate over the data of a RawData or DataSet object in blocks of rows (see MLRepo.iter_batches)
+            
+            Arguments:
+                name {str} -- The name of the object
+            
+            Keyword Arguments:
+                version {str} -- An explicit version of the object can be used (default: {None})
+                batch_size {int} -- maximal number of rows of a block (default: {10000})
+                columns {list of str or None} -- names of the coordinates which are returned, None for all coordinates (default: {None})
+
+            Returns:
+                generator -- generator of the tuples of x_data and y_data blocks
+            """
+
+            obj = self.get(name, version)
+            return self.ml_repo.iter_batches(name, obj.repo_info[RepoInfoKey.VERSION], batch_size, columns)
+
         def get_training_data(self, obj_version, full_object):
             """ Get the training data
             
@@ -368,6 +405,17 @@ class Job(RepoObject, abc.ABC):
             return self._predecessors
         return []
 
+    def get_input_names(self):
+        """ Returns the names of the data objects read by the job
+
+        Job runners may use these names to run the job in a process which already loaded (and cached) the data.
+        
+        Returns:
+            list of strings -- list of object names
+        """
+
+        return []
+
     def run(self, ml_repo, jobid):
         """ Run a job
         
@@ -445,7 +493,7 @@ class EvalJob(Job):
 
     def __init__(self, model, data, user, eval_function_version=repo_store.RepoStore.LAST_VERSION,
                 model_version=repo_store.RepoStore.LAST_VERSION, data_version=repo_store.RepoStore.LAST_VERSION,
-                repo_info = RepoInfo()):
+                repo_info = RepoInfo(), chunk_size = None):
         """ Init function for the EvalJob
         
         Arguments:
@@ -458,6 +506,9 @@ class EvalJob(Job):
             model_version {str} -- version of the model (default: {repo_store.RepoStore.LAST_VERSION})
             data_version {str} -- version of the data (default: {repo_store.RepoStore.LAST_VERSION})
             repo_info {[type]} -- [description] (default: {RepoInfo()})
+            chunk_size {int or None} -- if not None, the data is preprocessed and evaluated in blocks of chunk_size rows and the result is 
+                    stored block by block, so that only one block must be kept in memory. Note that the preprocessors and the evaluation 
+                    function must then work on each row separately (default: {None})
         """
 
         super(EvalJob, self).__init__(repo_info)
@@ -467,6 +518,7 @@ class EvalJob(Job):
         self.eval_function_version = eval_function_version
         self.model_version = model_version
         self.data_version = data_version
+        self.chunk_size = chunk_size
         # list of jobids which must have been run before this job should be excuted
         self.predecessors = []
 
@@ -484,32 +536,41 @@ class EvalJob(Job):
         model_def_version = model.repo_info[RepoInfoKey.MODIFICATION_INFO][model_definition_name]
         model_definition = repo.get(model_definition_name, model_def_version)
         
-        data = repo.get(self.data, self.data_version, full_object=True)
+        # the chunk size of the job overrides the chunk size of the repo's configuration
+        chunk_size = getattr(self, 'chunk_size', None)
+        if chunk_size is None:
+            chunk_size = repo.ml_repo.get_config().get('eval_chunk_size')
+        data = repo.get(self.data, self.data_version, full_object = chunk_size is None)
         eval_func = repo.get(model_definition.eval_function, self.eval_function_version)
-
-        x_data = data.x_data  
-        x_coord_names = data.x_coord_names      
-        if model.preprocessors is not None:
-            for k in range(len(model.preprocessors)):
-                prepro = model.preprocessors[k]
-                transforming_func = repo.get(prepro.transforming_function, model.repo_info.modification_info[prepro.transforming_function])
-                prepro_param = None
-                if not prepro.preprocessing_param == None:
-                    prepro_param = repo.get(prepro.preprocessing_param, model.repo_info.modification_info[prepro.preprocessing_param])
-                if prepro.fitting_function is not None:
-                    x_data, x_coord_names = transforming_func.create()(prepro_param, x_data, x_coord_names, model.fitted_preprocessors[k])
-                else:
-                    x_data, x_coord_names = transforming_func.create()(prepro_param, x_data, x_coord_names)
-            data.x_data = x_data
-            data.x_coord_names = x_coord_names
-        y = eval_func.create()(model, data)
-        
-        result = repo_objects.RawData(y, data.y_coord_names, repo_info={
-                            RepoInfoKey.NAME: MLRepo.get_eval_name(model_definition, data),
-                            RepoInfoKey.CATEGORY: MLObjectType.EVAL_DATA.value
-                            }
-                            )
-         # create modification info
+        transforming_funcs = self._get_transforming_functions(repo, model)
+        result_info = {RepoInfoKey.NAME: MLRepo.get_eval_name(model_definition, data),
+                        RepoInfoKey.CATEGORY: MLObjectType.EVAL_DATA.value}
+        if chunk_size is None:
+            if len(transforming_funcs) > 0:
+                data.x_data, data.x_coord_names = EvalJob._preprocess(transforming_funcs, data.x_data, data.x_coord_names)
+            y = eval_func.create()(model, data)
+            result = repo_objects.RawData(y, data.y_coord_names, repo_info=result_info)
+        else:
+            logging.info('Evaluating in chunks of ' + str(chunk_size) + ' rows.')
+            eval_f = eval_func.create()
+            x_coord_names = data.x_coord_names
+            def eval_chunks():
+                for x_data, _ in repo.iter_batches(self.data, data.repo_info[RepoInfoKey.VERSION], chunk_size, columns=x_coord_names):
+                    data.x_data, data.x_coord_names = EvalJob._preprocess(transforming_funcs, x_data, x_coord_names)
+                    yield repo_objects.RawData._cast_data_to_numpy(eval_f(model, data))
+            chunks = eval_chunks()
+            y = next(chunks, None)
+            if y is None:
+                logger.error('Cannot evaluate ' + self.data + ' in chunks since it contains no data.')
+                raise Exception('Cannot evaluate ' + self.data + ' in chunks since it contains no data.')
+            result = repo_objects.RawData(y, data.y_coord_names, repo_info=result_info)
+            result.x_data = None
+            def numpy_chunks(y):
+                yield {'x_data': y}
+                for y in chunks:
+                    result.n_data += y.shape[0]
+                    yield {'x_data': y}
+        # create modification info
         _add_modification_info(result, model, model_definition, data, eval_func)
         model_param_name = str(NamingConventions.ModelParam(model = model_definition_name))
         if model_param_name in model.repo_info.modification_info.keys():
@@ -517,9 +578,66 @@ class EvalJob(Job):
         training_param_name = str(NamingConventions.TrainingParam(model = model_definition_name))
         if training_param_name in model.repo_info.modification_info.keys():
             result.repo_info.modification_info[training_param_name] = model.repo_info.modification_info[training_param_name]
-        repo.add(result, 'evaluate data ' +
-                 self.data + ' with model ' + self.model)
+        if chunk_size is None:
+            repo.add(result, 'evaluate data ' +
+                    self.data + ' with model ' + self.model)
+        else:
+            repo.add_chunked(result, numpy_chunks(y), 'evaluate data ' +
+                    self.data + ' with model ' + self.model)
         logging.info('Finished evaluation job ' + str(jobid))
+
+    def get_input_names(self):
+        """ Returns the names of the data objects read by the job
+        
+        Returns:
+            list of strings -- the name of the evaluated data
+        """
+
+        return [self.data]
+
+    @staticmethod
+    def _get_transforming_functions(repo, model):
+        """ Return the transforming functions of the preprocessors of a model together with their arguments
+
+        Arguments:
+            repo {MLrepository} -- repository used to get the data
+            model {Model} -- the calibrated model
+
+        Returns:
+            list -- list of tuples of the transforming function and the list of arguments preceding the data (parameter and fitted preprocessor)
+        """
+
+        result = []
+        if model.preprocessors is None:
+            return result
+        for k in range(len(model.preprocessors)):
+            prepro = model.preprocessors[k]
+            transforming_func = repo.get(prepro.transforming_function, model.repo_info.modification_info[prepro.transforming_function])
+            prepro_param = None
+            if not prepro.preprocessing_param == None:
+                prepro_param = repo.get(prepro.preprocessing_param, model.repo_info.modification_info[prepro.preprocessing_param])
+            if prepro.fitting_function is not None:
+                result.append((transforming_func.create(), [prepro_param], [model.fitted_preprocessors[k]]))
+            else:
+                result.append((transforming_func.create(), [prepro_param], []))
+        return result
+
+    @staticmethod
+    def _preprocess(transforming_funcs, x_data, x_coord_names):
+        """ Apply the transforming functions of the preprocessors to the data
+
+        Arguments:
+            transforming_funcs {list} -- the transforming functions with their arguments (see _get_transforming_functions)
+            x_data {numpy array} -- the x_data
+            x_coord_names {list of str} -- the names of the x-coordinates
+
+        Returns:
+            tuple -- the transformed x_data and x-coordinate names
+        """
+
+        for transforming_func, args, fitted in transforming_funcs:
+            x_data, x_coord_names = transforming_func(*args, x_data, x_coord_names, *fitted)
+        return x_data, x_coord_names
     
     def get_modifier_versions(self, repo):
         """ Get the modifier versions
@@ -740,6 +858,9 @@ class TrainingJob(Job):
 
 class MeasureJob(Job):
     """ Defintion of a job to measure the error
+
+    MLRepo.run_measures computes the measures with MeasureGroupJob, this job computes a single measure. It is kept since repositories 
+    created by former versions contain MeasureJob objects which must still be loadable, and MeasureGroupJob uses its computation of the measures.
     """
 
     @repo_object_init()
@@ -775,45 +896,38 @@ class MeasureJob(Job):
         """
 
         logging.info('Start measure job ' + self.repo_info.name)
-        target = repo.get(self.data_name, self.data_version, full_object = True)
+        # if coordinates are given, only the columns of these coordinates are loaded
+        columns = None
+        measure_name = MeasureConfiguration.get_name(self.measure_type)
+        if not repo_objects.MeasureConfiguration._ALL_COORDINATES in self.coordinates:
+            measure_name = MeasureConfiguration.get_name((self.measure_type, self.coordinates))
+            columns = self.coordinates
+        target = repo.get(self.data_name, self.data_version, full_object = True, columns = columns)
         m_name = self.model_name.split('/')[0] #if given model name is a name of calibrated model, split to find the evaluation
         eval_data_name = NamingConventions.EvalData(data = self.data_name, model = m_name)
-        eval_data = repo.get(str(eval_data_name), modifier_versions={self.model_name: self.model_version, self.data_name: self.data_version}, full_object = True )
+        eval_data = repo.get(str(eval_data_name), modifier_versions={self.model_name: self.model_version, self.data_name: self.data_version}, 
+                             full_object = True, columns = columns)
         logger.info('run MeasureJob on data ' + self.data_name + ':' + str(self.data_version) 
                         + ', ' + str(eval_data_name) + ':' + str(eval_data.repo_info[RepoInfoKey.VERSION])
                 )
-        columns = []
-        measure_name = MeasureConfiguration.get_name(self.measure_type)
-        if not repo_objects.MeasureConfiguration._ALL_COORDINATES in self.coordinates:
-            measure_name = MeasureConfiguration.get_name((self.measure_type, self.coordinates))
-            for x in self.coordinates:
-                columns.append(target.y_coord_names.index(x))
-        if len(columns) == 0:
-            v = self._compute(target.y_data, eval_data.x_data)
-        else:
-            v = self._compute(target.y_data[:,columns], eval_data.x_data[:,columns])
-        result_name = str(NamingConventions.Measure(eval_data_name, measure_type = measure_name))
-        result = repo_objects.Measure( v, 
-                                repo_info = {RepoInfoKey.NAME : result_name, RepoInfoKey.CATEGORY: MLObjectType.MEASURE.value})
-        
-        # create modification info
-        result.repo_info.modification_info[self.model_name] = eval_data.repo_info.modification_info[self.model_name]
-        result.repo_info.modification_info[self.data_name] = eval_data.repo_info.modification_info[self.data_name]
-        result.repo_info.modification_info[str(eval_data_name)] = eval_data.repo_info.version
-        result.repo_info.modification_info[m_name] = eval_data.repo_info.modification_info[m_name]
-        model_param_name = str(NamingConventions.ModelParam(model = m_name))
-        if model_param_name in eval_data.repo_info.modification_info.keys():
-            result.repo_info.modification_info[model_param_name] = eval_data.repo_info.modification_info[model_param_name]
-        training_param_name = str(NamingConventions.TrainingParam(model = m_name))
-        if training_param_name in eval_data.repo_info.modification_info.keys():
-            result.repo_info.modification_info[training_param_name] = eval_data.repo_info.modification_info[training_param_name]
-        ################
+        v = self._compute(target.y_data, eval_data.x_data)
+        result = MeasureJob._create_measure(v, measure_name, eval_data, self.model_name, self.data_name)
+        result_name = result.repo_info[RepoInfoKey.NAME]
 
         logging.debug('Add result ' + result_name)
 
         repo.add(result, 'computing  measure ' + self.measure_type + ' on data ' + self.data_name)
         logging.info('Finished measure job ' + self.repo_info.name)
         
+    def get_input_names(self):
+        """ Returns the names of the data objects read by the job
+        
+        Returns:
+            list of strings -- the names of the target data and the evaluation data
+        """
+
+        return [self.data_name, str(NamingConventions.EvalData(data = self.data_name, model = self.model_name.split('/')[0]))]
+
     def get_modifier_versions(self, repo):
         """ Get the modifier versions
         
@@ -832,6 +946,40 @@ class MeasureJob(Job):
             measure_name = MeasureConfiguration.get_name((self.measure_type, self.coordinates))
         return measure_name, modifiers
 
+    @staticmethod
+    def _create_measure(value, measure_name, eval_data, model_name, data_name):
+        """ Create the measure object together with its modification info
+
+        Arguments:
+            value {double} -- the value of the measure
+            measure_name {str} -- the name of the measure (see MeasureConfiguration.get_name)
+            eval_data {RawData} -- the evaluation data the measure has been computed on
+            model_name {str} -- name of the model
+            data_name {str} -- name of the data
+
+        Returns:
+            Measure -- the measure
+        """
+
+        m_name = model_name.split('/')[0] #if given model name is a name of calibrated model, split to find the evaluation
+        eval_data_name = eval_data.repo_info[RepoInfoKey.NAME]
+        result_name = str(NamingConventions.Measure(eval_data_name, measure_type = measure_name))
+        result = repo_objects.Measure( value, 
+                                repo_info = {RepoInfoKey.NAME : result_name, RepoInfoKey.CATEGORY: MLObjectType.MEASURE.value})
+        
+        # create modification info
+        result.repo_info.modification_info[model_name] = eval_data.repo_info.modification_info[model_name]
+        result.repo_info.modification_info[data_name] = eval_data.repo_info.modification_info[data_name]
+        result.repo_info.modification_info[str(eval_data_name)] = eval_data.repo_info.version
+        result.repo_info.modification_info[m_name] = eval_data.repo_info.modification_info[m_name]
+        model_param_name = str(NamingConventions.ModelParam(model = m_name))
+        if model_param_name in eval_data.repo_info.modification_info.keys():
+            result.repo_info.modification_info[model_param_name] = eval_data.repo_info.modification_info[model_param_name]
+        training_param_name = str(NamingConventions.TrainingParam(model = m_name))
+        if training_param_name in eval_data.repo_info.modification_info.keys():
+            result.repo_info.modification_info[training_param_name] = eval_data.repo_info.modification_info[training_param_name]
+        return result
+
     def _compute(self, target_data, eval_data):
         """ Computes the specified error measure
         
@@ -846,16 +994,35 @@ class MeasureJob(Job):
             double -- the error
         """
 
-        if self.measure_type == repo_objects.MeasureConfiguration.MAX:
-            return self._compute_max(target_data, eval_data)
-        if self.measure_type == repo_objects.MeasureConfiguration.R2:
-           return self._compute_r2(target_data, eval_data)
-        if self.measure_type == repo_objects.MeasureConfiguration.MSE:
-           return self._compute_mse(target_data, eval_data)
+        return MeasureJob._compute_measure(self.measure_type, target_data, eval_data)
+
+    @staticmethod
+    def _compute_measure(measure_type, target_data, eval_data):
+        """ Computes an error measure
+        
+        Arguments:
+            measure_type {str} -- string describing the measure type
+            target_data {[type]} -- the target data
+            eval_data {[type]} -- the evaluated data
+        
+        Raises:
+            NotImplementedError -- If the measuretype is not implemented, raise an exception
+        
+        Returns:
+            double -- the error
+        """
+
+        if measure_type == repo_objects.MeasureConfiguration.MAX:
+            return MeasureJob._compute_max(target_data, eval_data)
+        if measure_type == repo_objects.MeasureConfiguration.R2:
+           return MeasureJob._compute_r2(target_data, eval_data)
+        if measure_type == repo_objects.MeasureConfiguration.MSE:
+           return MeasureJob._compute_mse(target_data, eval_data)
         else:
             raise NotImplementedError
         
-    def _compute_max(self, target_data, eval_data):
+    @staticmethod
+    def _compute_max(target_data, eval_data):
         """ Computes the maximum error measure
         
         Arguments:
@@ -869,7 +1036,8 @@ class MeasureJob(Job):
         logger.debug('computing maximum error')
         return linalg.norm(target_data-eval_data, inf)
 
-    def _compute_r2(self, target_data, eval_data):
+    @staticmethod
+    def _compute_r2(target_data, eval_data):
         """ Computes the r2 error measure
         
         Arguments:
@@ -883,7 +1051,8 @@ class MeasureJob(Job):
         from sklearn.metrics import r2_score
         return r2_score(target_data, eval_data)        
 
-    def _compute_mse(self, target_data, eval_data):
+    @staticmethod
+    def _compute_mse(target_data, eval_data):
         """ Computes the mean squared error error measure
         
         Arguments:
@@ -897,6 +1066,136 @@ class MeasureJob(Job):
         from sklearn.metrics import mean_squared_error
         return mean_squared_error(target_data, eval_data) 
 
+class MeasureGroupJob(Job):
+    """ Definition of a job computing several measures of one model on one dataset
+
+    The target data and the evaluation data are loaded once and all measures are computed on them, 
+    each measure is stored as a separate Measure object.
+    """
+
+    @repo_object_init()
+    def __init__(self, measures, data_name, model_name, data_version=repo_store.RepoStore.LAST_VERSION,
+                model_version=repo_store.RepoStore.LAST_VERSION, repo_info = RepoInfo()):
+        """ Constructor for the MeasureGroupJob class
+
+        Arguments:
+            measures {list} -- list of tuples of the measure type and the coordinates (see MeasureJob) of the measures to compute
+            data_name {str} -- name of data for which the measures shall be calculated
+            model_name {str} -- name of model for which the measures shall be calculated
+
+        Keyword Arguments:
+            data_version {versionnumber} -- version of data to be used (default: {repo_store.RepoStore.LAST_VERSION})
+            model_version {versionnumber} -- version of model to be used (default: {repo_store.RepoStore.LAST_VERSION})
+        """
+
+        super(MeasureGroupJob, self).__init__(repo_info)
+        self.measures = measures
+        self.model_name = model_name
+        self.model_version = model_version
+        self.data_name = data_name
+        self.data_version = data_version
+
+    @staticmethod
+    def _get_measure_name(measure):
+        """ Return the name of a measure
+
+        Arguments:
+            measure {tuple} -- tuple of the measure type and the coordinates
+
+        Returns:
+            str -- the name of the measure
+        """
+
+        if repo_objects.MeasureConfiguration._ALL_COORDINATES in measure[1]:
+            return MeasureConfiguration.get_name(measure[0])
+        return MeasureConfiguration.get_name((measure[0], measure[1]))
+
+    def _get_eval_data_name(self):
+        """ Return the name of the evaluation data the measures are computed on
+
+        Returns:
+            str -- the name of the evaluation data
+        """
+
+        return str(NamingConventions.EvalData(data = self.data_name, model = self.model_name.split('/')[0]))
+
+    def _run(self, repo, jobid):
+        """ Run the job with data from the given repo
+
+        Arguments:
+            repo {MLrepository} -- repository used to get and store the data
+            jobid {str} -- the job id to be executed
+        """
+
+        logging.info('Start measure job ' + self.repo_info.name)
+        # only the y-coordinates of the target data are loaded
+        target = repo.get(self.data_name, self.data_version)
+        target = repo.get(self.data_name, self.data_version, full_object = True, columns = target.y_coord_names)
+        eval_data_name = self._get_eval_data_name()
+        eval_data = repo.get(eval_data_name, modifier_versions={self.model_name: self.model_version, self.data_name: self.data_version}, 
+                             full_object = True)
+        logger.info('run MeasureGroupJob on data ' + self.data_name + ':' + str(self.data_version) 
+                        + ', ' + eval_data_name + ':' + str(eval_data.repo_info[RepoInfoKey.VERSION])
+                )
+        results = []
+        for measure in self.measures:
+            target_data = target.y_data
+            eval_values = eval_data.x_data
+            if not repo_objects.MeasureConfiguration._ALL_COORDINATES in measure[1]:
+                target_data = target_data[:, [target.y_coord_names.index(c) for c in measure[1]]]
+                eval_values = eval_values[:, [eval_data.x_coord_names.index(c) for c in measure[1]]]
+            v = MeasureJob._compute_measure(measure[0], target_data, eval_values)
+            results.append(MeasureJob._create_measure(v, MeasureGroupJob._get_measure_name(measure), eval_data, self.model_name, self.data_name))
+            logging.debug('Add result ' + results[-1].repo_info[RepoInfoKey.NAME])
+        repo.add(results, 'computing measures on data ' + self.data_name)
+        logging.info('Finished measure job ' + self.repo_info.name)
+
+    def check_rerun(self, ml_repo):
+        """ Check whether the job must be executed, i.e. whether one of its measures has not yet been computed for the model and data versions
+
+        The measures which have already been computed are removed from the job.
+        
+        Arguments:
+            ml_repo {MLrepository} -- repository used to get and store the data
+        
+        Returns:
+            bool -- Info whether the job must be run
+        """
+
+        eval_data_name = self._get_eval_data_name()
+        _, modifier_versions = self.get_modifier_versions(ml_repo)
+        measures = []
+        for measure in self.measures:
+            result_name = str(NamingConventions.Measure(eval_data_name, measure_type = MeasureGroupJob._get_measure_name(measure)))
+            if ml_repo.get(result_name, version = None, modifier_versions = modifier_versions, throw_error_not_exist = False) == []:
+                measures.append(measure)
+        self.measures = measures
+        return len(measures) > 0
+
+    def get_input_names(self):
+        """ Returns the names of the data objects read by the job
+        
+        Returns:
+            list of strings -- the names of the target data and the evaluation data
+        """
+
+        return [self.data_name, self._get_eval_data_name()]
+
+    def get_modifier_versions(self, repo):
+        """ Get the modifier versions
+        
+        Arguments:
+            repo {MLrepository} -- repository used to get and store the data
+        
+        Returns:
+            tuple of string, dict -- return the object name and the modifiers
+        """
+
+        modifiers = {}
+        modifiers[self.data_name] =  self.data_version
+        modifiers[self.model_name] = self.model_version
+        return self.repo_info[RepoInfoKey.NAME], modifiers
+
 # endregion
 class Name:
     def __init__(self, name_order, tag):
@@ -1059,6 +1358,10 @@ class MLRepo:
         
         self._numpy_repo = NumpyStoreFactory.get(self._config['numpy_store']['type'], **self._config['numpy_store']['config'])
         self._ml_repo = RepoStoreFactory.get(self._config['repo_store']['type'], **self._config['repo_store']['config'])
+        self._ml_repo.set_cache(self._config['repo_store'].get('cache_size', 0))
+        self._set_numpy_cache(self._config['numpy_store'].get('cache_size', 0), self._config['numpy_store'].get('cache_max_bytes', 2**30))
+        # lock shared with other processes using the same storages (see _set_process_lock)
+        self._process_lock = None
         self._job_runner = JobRunnerFactory.get(self._config['job_runner']['type'], self, **self._config['job_runner']['config'])
         self._user = self._config['user']
         
@@ -1086,7 +1389,40 @@ class MLRepo:
         if save_config:
             self._save_config()
       
-    def _add(self, repo_object, message='', category = None):
+    def _set_process_lock(self, lock):
+        """ Set a lock shared by all processes which add objects to the storages of this repo
+
+        If a lock is set, the mapping is reloaded from the storage before objects are added (with the lock held) so that 
+        names added to the mapping by other processes are not lost.
+
+        Arguments:
+            lock {multiprocessing.Lock or None} -- the lock, None if no other process uses the storages
+        """
+
+        self._process_lock = lock
+
+    def _reload_mapping(self):
+        """ Reload the mapping from the storage
+        """
+
+        repo_dict = self._ml_repo.get('repo_mapping', versions=repo_store.RepoStore.LAST_VERSION)
+        self._mapping = repo_objects.create_repo_obj(repo_dict[0])
+
+    @contextlib.contextmanager
+    def _lock_mapping(self):
+        """ Context manager to hold the process lock (if set) while the mapping may be changed
+
+        The mapping is reloaded after the lock has been acquired.
+        """
+
+        if self._process_lock is None:
+            yield
+            return
+        with self._process_lock:
+            self._reload_mapping()
+            yield
+
+    def _add(self, repo_object, message='', category = None, add_numpy = True):
         """ Add a repo_object to the repository.
         
         Arguments:
@@ -1095,6 +1431,7 @@ class MLRepo:
         Keyword Arguments:
             message {str} -- commit message (default: {''})
             category {MLObjectType} -- Category of repo_object which overwrites the objects category. (default: {None})
+            add_numpy {bool} -- if False, the numpy data is not added (since it has already been added to the numpy store) (default: {True})
         
         Returns:
             tuple of string and bool -- version number of object added and boolean if mapping has changed
@@ -1110,7 +1447,7 @@ class MLRepo:
         repo_object.repo_info[RepoInfoKey.AUTHOR] = self._user
         obj_dict = repo_objects.create_repo_obj_dict(repo_object)
         version = self._ml_repo.add(obj_dict)
-        if len(repo_object.repo_info[RepoInfoKey.BIG_OBJECTS]) > 0:
+        if add_numpy and len(repo_object.repo_info[RepoInfoKey.BIG_OBJECTS]) > 0:
             np_dict = repo_object.numpy_to_dict()
             self._numpy_repo.add(repo_object.repo_info[RepoInfoKey.NAME],
                                 repo_object.repo_info[RepoInfoKey.VERSION],
@@ -1154,29 +1491,85 @@ class MLRepo:
             str or dictionary -- version number of object added or dictionary of names and versions of objects added
         """
 
-        version = repo_store._version_str()
+        return self._add_version(repo_object, message, category, repo_store._version_str())
+
+    def _add_version(self, repo_object, message, category, version, add_numpy = True):
+        """ Add a repo_object or list of repo objects to the repository with the given version (see add).
+
+        Arguments:
+            repo_object {RepoObject} -- repo_object or list of repo_objects to be added, will be modified so that it contains the version number
+            message {str} -- commit message
+            category {MLObjectType} -- Category of repo_object which overwrites the objects category.
+            version {str} -- the version of the objects and of the commit info
+
+        Keyword Arguments:
+            add_numpy {bool} -- if False, the numpy data of the objects is not added (default: {True})
+
+        Returns:
+            str or dictionary -- version number of object added or dictionary of names and versions of objects added
+        """
+
         result = {}
         repo_list = repo_object
         mapping_changed = False
         if not isinstance(repo_list,list):
             repo_list = [repo_object]
-        if isinstance(repo_list, list):
+        # all objects, the mapping and the commit info are stored in one transaction of the underlying storage
+        with self._lock_mapping(), self._ml_repo.transaction():
             for obj in repo_list:
                 obj.repo_info.version = version
-                result[obj.repo_info[RepoInfoKey.NAME]], mapping_changed_tmp = self._add(obj, message, category)
+                result[obj.repo_info[RepoInfoKey.NAME]], mapping_changed_tmp = self._add(obj, message, category, add_numpy)
                 mapping_changed = mapping_changed or mapping_changed_tmp
-        if mapping_changed:
-            obj_dict = repo_objects.create_repo_obj_dict(self._mapping)
-            self._ml_repo.replace(obj_dict)
-            
-        commit_message = repo_objects.CommitInfo(message, self._user, result, repo_info = {RepoInfoKey.CATEGORY: MLObjectType.COMMIT_INFO.value,
-                RepoInfoKey.NAME: 'CommitInfo', RepoInfoKey.VERSION : version} )
-        self._add(commit_message)
+            if mapping_changed:
+                obj_dict = repo_objects.create_repo_obj_dict(self._mapping)
+                self._ml_repo.replace(obj_dict)
+                
+            commit_message = repo_objects.CommitInfo(message, self._user, result, repo_info = {RepoInfoKey.CATEGORY: MLObjectType.COMMIT_INFO.value,
+                    RepoInfoKey.NAME: 'CommitInfo', RepoInfoKey.VERSION : version} )
+            self._add(commit_message)
         if not isinstance(repo_object, list):
             if len(result) == 1 or (mapping_changed and len(result) == 2):
                 return result[repo_object.repo_info[RepoInfoKey.NAME]]
         return result
 
+    def _add_chunked(self, repo_object, numpy_chunks, message='', category = None):
+        """ Add a repo object whose numpy data is given in blocks of rows.
+
+        The blocks are written to the numpy store as data of the version of the added object (see NumpyStore.add_chunked) 
+        so that only the current block must be kept in memory. The object is added after the last block has been written,
+        so the attributes of the object which are not part of the numpy data (e.g. the number of rows) must be complete 
+        when the last block has been returned. If writing the blocks or adding the object fails, the numpy data is deleted.
+
+        Arguments:
+            repo_object {RepoObject} -- repo_object to be added (its numpy data is ignored), will be modified so that it contains the version number
+            numpy_chunks {iterable of numpy dict} -- the blocks of the numpy data, each containing the same keys
+        
+        Keyword Arguments:
+            message {str} -- commit message (default: {''})
+            category {MLObjectType} -- Category of repo_object which overwrites the objects category. (default: {None})
+        
+        Raises:
+            Exception -- raises an exception if no block is given
+
+        Returns:
+            str -- version number of object added
+        """
+
+        name = repo_object.repo_info[RepoInfoKey.NAME]
+        numpy_chunks = iter(numpy_chunks)
+        first = next(numpy_chunks, None)
+        if first is None:
+            logger.error('Cannot add ' + name + ' since no data is given.')
+            raise Exception('Cannot add ' + name + ' since no data is given.')
+        version = repo_store._version_str()
+        try:
+            self._numpy_repo.add_chunked(name, version, itertools.chain([first], numpy_chunks))
+            repo_object.numpy_from_dict({})
+            return self._add_version(repo_object, message, category, version, add_numpy = False)
+        except:
+            self._numpy_repo._delete(name, version)
+            raise
+
     def get_training_data(self, version=repo_store.RepoStore.LAST_VERSION, full_object=True):
         """ Returns training data 
 
@@ -1377,6 +1770,51 @@ class MLRepo:
         """
         return self._ml_repo
 
+    @staticmethod
+    def _select_coordinates(raw_data, columns):
+        """ Restrict the coordinate names of a RawData object to the given coordinates
+
+        Arguments:
+            raw_data {RawData} -- the RawData object (without numpy data), its x_coord_names and y_coord_names are set to the selected coordinates
+            columns {list of str or None} -- names of the x- and y-coordinates to select, None to select all coordinates
+
+        Raises:
+            Exception -- raises an exception if a coordinate is neither an x- nor a y-coordinate of the object
+
+        Returns:
+            dict or None -- dictionary of the numpy data to load together with the column indices of the selected coordinates (None if all data is loaded)
+        """
+
+        if columns is None:
+            return None
+        if isinstance(columns, str):
+            columns = [columns]
+        x_coord_names = raw_data.x_coord_names or []
+        y_coord_names = raw_data.y_coord_names or []
+        for c in columns:
+            if c not in x_coord_names and c not in y_coord_names:
+                logger.error('Coordinate ' + c + ' is not a coordinate of ' + raw_data.repo_info[RepoInfoKey.NAME] + '.')
+                raise Exception('Coordinate ' + c + ' is not a coordinate of ' + raw_data.repo_info[RepoInfoKey.NAME] + '.')
+        result = {}
+        for data, coord_names in [('x_data', 'x_coord_names'), ('y_data', 'y_coord_names')]:
+            names = getattr(raw_data, coord_names)
+            if names is None:
+                continue
+            selected = [c for c in columns if c in names]
+            if len(selected) > 0:
+                result[data] = [names.index(c) for c in selected]
+            setattr(raw_data, coord_names, selected)
+        return result
+
+    def get_config(self):
+        """ Return the configuration of the ml repo
+
+        Returns:
+            dict -- the configuration
+        """
+
+        return self._config
+
     def get_numpy_data_store(self):
         """ Return the numpy data store of the ml repo
         
@@ -1386,9 +1824,140 @@ class MLRepo:
 
         return self._numpy_repo
     
+    def _set_numpy_cache(self, max_size, max_bytes=None):
+        """ Enable caching of the numpy data of object versions
+
+        The numpy data loaded by get is kept in a least recently used cache which is bounded by the number of object versions
+        and by the number of bytes of the cached arrays. If the complete numpy data of a version is cached, all requests of 
+        rows or columns of this version are answered from the cache, otherwise only requests of the same rows and columns are.
+        The cached arrays are shared by all objects returned, therefore they are read-only: copy the arrays before modifying them in place.
+
+        Arguments:
+            max_size {int} -- maximal number of object versions whose numpy data is cached, caching is disabled if max_size is not positive
+
+        Keyword Arguments:
+            max_bytes {int or None} -- maximal number of bytes of the cached arrays, None for no limit (default: {None})
+        """
+
+        if max_size is not None and max_size > 0:
+            self._numpy_cache = repo_store._ObjectCache(max_size, max_bytes)
+        else:
+            self._numpy_cache = None
+
+    def _get_numpy(self, name, version, from_index=0, to_index=None, columns=None, fill_cache=True):
+        """ Return the numpy data of an object version from the numpy cache or the numpy store
+
+        Arguments:
+            name {str} -- the object name
+            version {str} -- the object version
+
+        Keyword Arguments:
+            from_index {int} -- the index from which the data is returned (default: {0})
+            to_index {int or None} -- the index to which the data is returned (None means till the end) (default: {None})
+            columns {dict or None} -- the column indices of the numpy objects to return (see NumpyStore.get) (default: {None})
+            fill_cache {bool} -- if True, the data read from the numpy store is put into the cache, otherwise the cache is 
+                    only used if it already contains the data (default: {True})
+
+        Returns:
+            numpy dict -- the numpy data (read-only arrays if the cache is enabled)
+        """
+
+        if self._numpy_cache is None:
+            return self._numpy_repo.get(name, version, from_index, to_index, columns=columns)
+        # the cache entry of a version maps the requested rows and columns to the data, (0, None, None) denotes the complete data
+        request = (from_index, to_index, None if columns is None else 
+                    tuple(sorted([(k, None if v is None else tuple(v)) for k, v in columns.items()])))
+        complete = (0, None, None)
+        entry = self._numpy_cache.get(name, str(version))
+        if entry is not None and request in entry:
+            return dict(entry[request])
+        if entry is not None and complete in entry:
+            result = {}
+            for k, v in entry[complete].items():
+                if columns is not None and k not in columns.keys():
+                    continue
+                if isinstance(v, ndarray) and len(v.shape) > 0:
+                    v = v[from_index:to_index]
+                    if columns is not None and columns[k] is not None:
+                        v = v[:, repo_store._column_index(columns[k])]
+                result[k] = v
+            return result
+        numpy_dict = self._numpy_repo.get(name, version, from_index, to_index, columns=columns)
+        if not fill_cache:
+            return numpy_dict
+        for v in numpy_dict.values():
+            if isinstance(v, ndarray):
+                v.flags.writeable = False
+        # the complete data replaces the data of other requests
+        entry = {} if entry is None or request == complete else dict(entry)
+        entry[request] = numpy_dict
+        n_bytes = sum([v.nbytes for x in entry.values() for v in x.values() if isinstance(v, ndarray)])
+        self._numpy_cache.put(name, str(version), entry, n_bytes)
+        return dict(numpy_dict)
+
+    def _get_numpy_loader(self, name, version, from_index=0, to_index=None, columns=None):
+        """ Return a function loading a single numpy object of an object version from the numpy store
+
+        Arguments:
+            name {str} -- the object name
+            version {str} -- the object version
+
+        Keyword Arguments:
+            from_index {int} -- the index from which the data is loaded (default: {0})
+            to_index {int or None} -- the index to which the data is loaded (None means till the end) (default: {None})
+            columns {dict or None} -- the column indices of the numpy objects to load (see NumpyStore.get), numpy objects 
+                    not contained are None (default: {None})
+
+        Returns:
+            callable -- function returning the numpy object for a given attribute name
+        """
+
+        def load(key):
+            if columns is not None and key not in columns.keys():
+                return None
+            numpy_dict = self._get_numpy(name, version, from_index, to_index, 
+                                            columns={key: None if columns is None else columns[key]}, fill_cache=False)
+            return numpy_dict.get(key)
+        return load
+
+    def get_fields(self, name, version=repo_store.RepoStore.LAST_VERSION, obj_fields=None, repo_info_fields=None,
+                   modifier_versions=None, throw_error_not_exist=True, throw_error_not_unique=True):
+        """ Get only some fields of repo objects. In contrast to get, the object dictionaries are returned instead of the objects 
+        since they do not contain all data needed to create the objects.
+        
+        Arguments:
+            name {str} -- the object name
+        
+        Keyword Arguments:
+            version {str} -- object version, default is latest (-1) (default: {repo_store.RepoStore.LAST_VERSION})
+            obj_fields {list of str or str} -- fields of the object which are returned, 'all' for all fields, None for no fields (default: {None})
+            repo_info_fields {list of str or str} -- fields of the repo_info which are returned, 'all' for all fields, None for no fields (default: {None})
+            modifier_versions {dict or None} -- versions of the modifiers the objects must have been created with (default: {None})
+            throw_error_not_exist {bool} -- true - throw error if not exists, else return [] (default: {True})
+            throw_error_not_unique {bool} -- true - throw error if item is not unique, else return [] (default: {True})
+        
+        Raises:
+            Exception -- raises an exception if no object with the specific name is found
+        
+        Returns:
+            dict or list thereof -- The object dictionary containing the requested fields
+        """
+
+        repo_dict = self._ml_repo.get(name, version, modifier_versions, obj_fields, repo_info_fields, 
+                                      throw_error_not_exist, throw_error_not_unique)
+        if len(repo_dict) == 0:
+            if throw_error_not_exist:
+                logger.error('No object found with name ' +  name + ' and version ' + str(version) + ', modifier_versions: ' + str(modifier_versions))
+                raise Exception('No object found with name ' +  name + ' and version ' + str(version))
+            else:
+                return []
+        if len(repo_dict) == 1:
+            return repo_dict[0]
+        return repo_dict
+
     def get(self, name, version=repo_store.RepoStore.LAST_VERSION, full_object=False,
              modifier_versions=None, obj_fields=None,  repo_info_fields=None,
-             throw_error_not_exist=True, throw_error_not_unique=True):
+             throw_error_not_exist=True, throw_error_not_unique=True, columns=None, lazy=False):
         """ Get repo objects. It throws an exception, if an object with the name does not exist.
         
         Arguments:
@@ -1397,12 +1966,18 @@ class MLRepo:
         Keyword Arguments:
             version {str} -- object version, default is latest (-1). If the fields are nested (an element of a dictionary which is an element of a 
                     dictionary, use path notation to the element, i.e. p/elem1/elem2 to get p[elem1][elem2]) (default: {repo_store.RepoStore.LAST_VERSION})
-            full_object {bool} -- flag to determine whether the numpy objects are loaded (True->load) (default: {False})
+            full_object {bool} -- flag to determine whether the numpy objects are loaded (True->load), the arrays are read-only if the cache of 
+                    the numpy store is enabled (see _set_numpy_cache) (default: {False})
             modifier_versions {[type]} -- [description] (default: {None})
-            obj_fields {[type]} -- [description] (default: {None})
-            repo_info_fields {[type]} -- [description] (default: {None})
+            obj_fields {list of str or None} -- not used, the complete objects are returned, use get_fields to retrieve only some fields (default: {None})
+            repo_info_fields {list of str or None} -- not used, the complete objects are returned, use get_fields to retrieve only some fields (default: {None})
             throw_error_not_exist {bool} -- true - throw error if not exists, else return [] (default: {True})
             throw_error_not_unique {bool} -- true - throw error if item is not unique, else return [] (default: {True})
+            columns {list of str or None} -- names of the x- and y-coordinates of RawData and DataSet objects which are loaded, if None all coordinates are loaded.
+                    The x_coord_names and y_coord_names of the returned objects contain only the selected coordinates (in the given order) and 
+                    x_data (y_data) is None if no x- (y-) coordinate is selected (default: {None})
+            lazy {bool} -- if True (and full_object is True), the numpy objects are not loaded by this call but each of them is loaded from the 
+                    numpy store on first access of the respective attribute (and then kept by the object) (default: {False})
         
         Raises:
             Exception -- raises an exception if no object with the specific name is found
@@ -1412,7 +1987,7 @@ class MLRepo:
         """
 
         logging.debug('Getting ' + name + ', version ' + str(version))
-        repo_dict = self._ml_repo.get(name, version, modifier_versions, obj_fields, repo_info_fields, 
+        repo_dict = self._ml_repo.get(name, version, modifier_versions, None, None, 
                                       throw_error_not_exist, throw_error_not_unique)
         if len(repo_dict) == 0:
             if throw_error_not_exist:
@@ -1426,25 +2001,80 @@ class MLRepo:
             result = repo_objects.create_repo_obj(x)
             if isinstance(result, DataSet):
                 raw_data = self.get(result.raw_data, result.raw_data_version, False)
-                if full_object:
-                    numpy_data = self._numpy_repo.get(result.raw_data, raw_data.repo_info[RepoInfoKey.VERSION], 
-                                                        result.start_index, result.end_index)
+                numpy_columns = MLRepo._select_coordinates(raw_data, columns)
+                if full_object and not lazy:
+                    numpy_data = self._get_numpy(result.raw_data, raw_data.repo_info[RepoInfoKey.VERSION], 
+                                                        result.start_index, result.end_index, columns=numpy_columns)
                     repo_objects.repo_object_init.numpy_from_dict(raw_data, numpy_data)
                 result.set_data(raw_data)
-
+                if full_object and lazy:
+                    repo_objects.set_lazy_attributes(result, ['x_data', 'y_data'], 
+                        self._get_numpy_loader(result.raw_data, raw_data.repo_info[RepoInfoKey.VERSION], 
+                                                result.start_index, result.end_index, numpy_columns))
+
+            numpy_columns = None
+            if isinstance(result, repo_objects.RawData):
+                numpy_columns = MLRepo._select_coordinates(result, columns)
             numpy_dict = {}
-            if len(result.repo_info[RepoInfoKey.BIG_OBJECTS]) > 0 and full_object:
-                numpy_dict = self._numpy_repo.get(
-                    result.repo_info[RepoInfoKey.NAME], result.repo_info[RepoInfoKey.VERSION])
-            #for x in result.repo_info[RepoInfoKey.BIG_OBJECTS]:
-            #    if not x in numpy_dict:
-            #        numpy_dict[x] = None
-            result.numpy_from_dict(numpy_dict)
+            if len(result.repo_info[RepoInfoKey.BIG_OBJECTS]) > 0 and full_object and lazy:
+                repo_objects.set_lazy_attributes(result, result.repo_info[RepoInfoKey.BIG_OBJECTS], 
+                    self._get_numpy_loader(result.repo_info[RepoInfoKey.NAME], result.repo_info[RepoInfoKey.VERSION], columns=numpy_columns))
+            else:
+                if len(result.repo_info[RepoInfoKey.BIG_OBJECTS]) > 0 and full_object:
+                    numpy_dict = self._get_numpy(
+                        result.repo_info[RepoInfoKey.NAME], result.repo_info[RepoInfoKey.VERSION], columns=numpy_columns)
+                #for x in result.repo_info[RepoInfoKey.BIG_OBJECTS]:
+                #    if not x in numpy_dict:
+                #        numpy_dict[x] = None
+                result.numpy_from_dict(numpy_dict)
             tmp.append(result)
         if len(tmp) == 1:
             return tmp[0]
         return tmp
 
+    def iter_batches(self, name, version=repo_store.RepoStore.LAST_VERSION, batch_size=10000, columns=None):
+        """ Iterate over the data of a RawData or DataSet object in blocks of rows.
+
+        Each block is read separately from the numpy store, so that only one block has to be kept in memory. For a DataSet, only the rows 
+        between its start and end index are returned. The coordinate names belonging to the columns of the blocks are the coordinate names 
+        of the object returned by get(name, version, columns=columns).
+        
+        Arguments:
+            name {str} -- name of the RawData or DataSet object
+        
+        Keyword Arguments:
+            version {str} -- version of the object (default: {repo_store.RepoStore.LAST_VERSION})
+            batch_size {int} -- maximal number of rows of a block (default: {10000})
+            columns {list of str or None} -- names of the x- and y-coordinates which are returned, None for all coordinates (default: {None})
+        
+        Raises:
+            Exception -- raises an exception if the batch size is not positive
+            Exception -- raises an exception if the object is neither a RawData nor a DataSet object
+
+        Yields:
+            tuple -- tuple of the x_data and y_data block of the same rows (y_data is None if the object has no or no selected y-coordinates)
+        """
+
+        if batch_size <= 0:
+            logger.error('Batch size must be positive.')
+            raise Exception('Batch size must be positive.')
+        obj = self.get(name, version)
+        if isinstance(obj, DataSet):
+            raw_data = self.get(obj.raw_data, obj.raw_data_version)
+            start, end = obj.start_index, obj.end_index
+        elif isinstance(obj, repo_objects.RawData):
+            raw_data = obj
+            start, end = 0, None
+        else:
+            logger.error('Cannot iterate over ' + name + ' since it is neither a RawData nor a DataSet object.')
+            raise Exception('Cannot iterate over ' + name + ' since it is neither a RawData nor a DataSet object.')
+        numpy_columns = MLRepo._select_coordinates(raw_data, columns)
+        start, end, _ = slice(start, end).indices(raw_data.n_data)
+        for from_index in range(start, end, batch_size):
+            numpy_dict = self._get_numpy(raw_data.repo_info[RepoInfoKey.NAME], raw_data.repo_info[RepoInfoKey.VERSION],
+                                         from_index, min(from_index + batch_size, end), columns=numpy_columns, fill_cache=False)
+            yield numpy_dict.get('x_data'), numpy_dict.get('y_data')
+
     def delete(self, name, version):
         """ Delete a specific object. 
 
@@ -1459,13 +2089,14 @@ class MLRepo:
             Exception -- If the object has depending objects, it can not be deleted and an error is thrown.
         """
 
-        dependent_objects = self._ml_repo._get_by_modification_info(name, version, [k.value for k in MLObjectType])
+        dependent_objects = self._ml_repo._get_by_modification_info(name, version, [k.value for k in MLObjectType], load_objects=False)
         if len(dependent_objects) > 0:
-            obj_list = ';'
-            obj_list.join([k.repo_info.name + ': ' + k.repo_info.version for k in dependent_objects ])
+            obj_list = '; '.join([k[0] + ': ' + k[1] for k in dependent_objects])
             raise Exception("Objects dependending on the object to be deleted, please delete these objects first, objects: "+ obj_list)
         self._ml_repo._delete(name, version)
         self._numpy_repo._delete(name, version)
+        if self._numpy_cache is not None:
+            self._numpy_cache.invalidate(name, str(version))
 
     @staticmethod
     def get_calibrated_model_name(model_name):
@@ -1520,6 +2151,9 @@ class MLRepo:
                     version_end=repo_store.RepoStore.LAST_VERSION):
         """ Return a list of histories of object member variables without bigobjects
         
+        If only repo_info_fields are specified, the history is read from the metadata of the storage without loading the objects.
+        If neither repo_info_fields nor obj_member_fields are specified, the complete object dictionaries are returned.
+
         Arguments:
             name {str} -- the object name
         
@@ -1540,17 +2174,22 @@ class MLRepo:
             return tmp
         return [tmp]
 
-    def get_commits(self,  version_start=repo_store.RepoStore.FIRST_VERSION, version_end=repo_store.RepoStore.LAST_VERSION):
+    def get_commits(self,  version_start=repo_store.RepoStore.FIRST_VERSION, version_end=repo_store.RepoStore.LAST_VERSION, repo_info_fields=None):
         """ gets the commits
         
         Keyword Arguments:
             version_start {str} -- only display versions after version_start (default: {repo_store.RepoStore.FIRST_VERSION})
             version_end {str} -- only display versions up to version_end (default: {repo_store.RepoStore.LAST_VERSION})
+            repo_info_fields {list of strings} -- if not None, only a list of dictionaries containing these fields of the commits' repo_info is returned
+                                which does not need to load the commit objects (default: {None})
         
         Returns:
             list of commit infos -- returns a list of commit infots
         """
 
+        if repo_info_fields is not None:
+            return self.get_history('CommitInfo', repo_info_fields=repo_info_fields, 
+                                    version_start=version_start, version_end=version_end)
         tmp = self.get('CommitInfo', (version_start, version_end))
         if isinstance(tmp, list):
             return tmp
@@ -1811,17 +2450,17 @@ class MLRepo:
         job_ids = []
         for mod in models:
             for n, v in datasets_.items():
-                for m_name, m in measures_to_run.items():
-                    measure_job = MeasureJob(m_name, m[0], m[1], n, mod[0], v, mod[1],
-                        repo_info = {RepoInfoKey.NAME: mod[0] + '/jobs/measure/' + n + '/' + m[0],
-                            RepoInfoKey.CATEGORY: MLObjectType.JOB.value})
-                    if measure_job.check_rerun(self) :
-                        measure_job.set_predecessor_jobs(predecessors)
-                        self.add(measure_job)
-                        self._job_runner.add(measure_job.repo_info[RepoInfoKey.NAME], measure_job.repo_info[RepoInfoKey.VERSION], self._user)
-                        job_ids.append((measure_job.repo_info[RepoInfoKey.NAME], measure_job.repo_info[RepoInfoKey.VERSION]))
-                        logging.info('Measure job ' + measure_job.repo_info[RepoInfoKey.NAME]+ ', version: ' 
-                        + str(measure_job.repo_info[RepoInfoKey.VERSION]) + ' added to jobrunner.')
+                # one job computes all measures of the model on the dataset so that the data is loaded only once
+                measure_job = MeasureGroupJob([(m[0], m[1]) for m in measures_to_run.values()], n, mod[0], v, mod[1],
+                    repo_info = {RepoInfoKey.NAME: mod[0] + '/jobs/measure/' + n,
+                        RepoInfoKey.CATEGORY: MLObjectType.JOB.value})
+                if measure_job.check_rerun(self) :
+                    measure_job.set_predecessor_jobs(predecessors)
+                    self.add(measure_job)
+                    self._job_runner.add(measure_job.repo_info[RepoInfoKey.NAME], measure_job.repo_info[RepoInfoKey.VERSION], self._user)
+                    job_ids.append((measure_job.repo_info[RepoInfoKey.NAME], measure_job.repo_info[RepoInfoKey.VERSION]))
+                    logging.info('Measure job ' + measure_job.repo_info[RepoInfoKey.NAME]+ ', version: ' 
+                    + str(measure_job.repo_info[RepoInfoKey.VERSION]) + ' added to jobrunner.')
         return job_ids
 
     def run_tests(self, test_definitions = None, predecessors = []):
@@ -1887,6 +2526,14 @@ class MLRepo:
         self._ml_repo.pull()
         self._numpy_repo.pull()
 
+    def close(self):
+        """ Release resources held by the numpy store (e.g. hdf5 files kept open for reading)
+
+        The repo can still be used afterwards, the resources are acquired again when needed.
+        """
+
+        self._numpy_repo.close()
+
     def _object_exists(self, name):
         """ checks whether an object exists (True) or not (False)
         
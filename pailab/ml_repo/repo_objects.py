@@ -429,6 +429,77 @@ def create_repo_obj(obj):
     result = get_object_from_classname(repo_info['classname'], obj)
     return result
 
+class _LazyAttribute:
+    """ Non-data descriptor which loads the value of an attribute on first access
+
+    The loaded value is stored in the instance dictionary so that all further accesses (and assignments) bypass the descriptor.
+    """
+
+    def __init__(self, name, load):
+        """ Constructor
+
+        Arguments:
+            name {str} -- name of the attribute
+            load {callable} -- function called with the attribute name returning the value of the attribute
+        """
+
+        self._name = name
+        self._load = load
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = self._load(self._name)
+        instance.__dict__[self._name] = value
+        return value
+
+
+def _reduce_lazy_object(obj, protocol):
+    """ Reduce an object with lazy attributes to the reduction of an object of its original class
+
+    All lazy attributes are loaded before so that copies and pickles do not depend on the loading function.
+    """
+
+    cls = obj.__class__
+    for name, attr in cls.__dict__.items():
+        if isinstance(attr, _LazyAttribute):
+            getattr(obj, name)
+    result = super(cls, obj).__reduce_ex__(protocol)
+    if isinstance(result, tuple) and len(result) > 1 and len(result[1]) > 0 and result[1][0] is cls:
+        result = (_new_object, (cls.__bases__[0],)) + tuple(result[2:])
+    return result
+
+
+def _new_object(cls):
+    """ Create an uninitialized object of a class (used to unpickle objects with lazy attributes)
+    """
+
+    return cls.__new__(cls)
+
+
+def set_lazy_attributes(obj, names, load):
+    """ Turn attributes of an object into attributes which are loaded on first access and then cached.
+
+    The object is moved to a subclass of its class (with the same name) defining a descriptor for each of the attributes. 
+    Once loaded (or assigned), an attribute is a plain instance attribute. Copies and pickles of the object are objects of the 
+    original class with all attributes loaded.
+
+    Arguments:
+        obj {object} -- the object
+        names {list of str} -- names of the attributes
+        load {callable} -- function called with the attribute name on first access, returning the value of the attribute
+    """
+
+    cls = obj.__class__
+    attributes = {name: _LazyAttribute(name, load) for name in names}
+    attributes['__module__'] = cls.__module__
+    attributes['__qualname__'] = cls.__qualname__
+    attributes['__reduce_ex__'] = _reduce_lazy_object
+    for name in names:
+        obj.__dict__.pop(name, None)
+    obj.__class__ = type(cls.__name__, (cls,), attributes)
+
+
 class RawData(RepoObject):
     """ Class to store numpy data.
     """
@@ -848,7 +919,7 @@ class DataSet(RepoObject):
         """
 
         if raw_data.x_data is not None:
-            setattr(self, 'x_data',raw_data.x_data) # todo more efficient implementation over numpy_repo to avoid loading all and then cutting off
+            setattr(self, 'x_data',raw_data.x_data)
         if raw_data.y_data is not None:
             setattr(self, 'y_data', raw_data.y_data)
         setattr(self, 'x_coord_names', raw_data.x_coord_names)
@@ -1,8 +1,13 @@
 import uuid
 import datetime
-
+import logging
 import abc
+import contextlib
+from collections import OrderedDict
+from copy import deepcopy
+import numpy as np
 from pailab.ml_repo.repo_objects import RepoInfoKey  # pylint: disable=E0401
+logger = logging.getLogger(__name__)
 
 
 def _version_str():
@@ -31,6 +36,261 @@ def _time_from_version(v):
     return datetime.datetime(1582, 10, 15) + datetime.timedelta(microseconds=v.time / 10)
 
 
+def _field_names(fields):
+    """ Return the field names as strings or None if all fields are requested
+
+    Arguments:
+        fields {list of str or RepoInfoKey, str or RepoInfoKey} -- the fields (or 'all')
+
+    Returns:
+        list of str or None -- list of field names, None if all fields are requested
+    """
+
+    if not isinstance(fields, list):
+        fields = [fields]
+    result = []
+    for f in fields:
+        if isinstance(f, RepoInfoKey):
+            result.append(f.value)
+        elif isinstance(f, str) and f.lower() == 'all':
+            return None
+        else:
+            for k in RepoInfoKey:
+                if k.name == f:
+                    f = k.value
+                    break
+            result.append(f)
+    return result
+
+
+def _column_index(columns):
+    """ Return the index selecting the given columns of a (two dimensional) array
+
+    If the columns are contiguous and increasing, a slice is returned so that numpy returns a view and hdf5 reads a hyperslab.
+
+    Arguments:
+        columns {list of int or None} -- indices of the columns, None for all columns
+
+    Returns:
+        slice or list of int -- index for the second dimension of the array
+    """
+
+    if columns is None:
+        return slice(None)
+    columns = list(columns)
+    if len(columns) == 0:
+        return slice(0, 0)
+    if columns[0] >= 0 and columns == list(range(columns[0], columns[0] + len(columns))):
+        return slice(columns[0], columns[0] + len(columns))
+    return columns
+
+
+def _select_fields(obj, obj_fields=None, repo_info_fields=None):
+    """ Return a dictionary containing only the selected fields of the object dictionary
+
+    The version and name of the object are always contained in the repo_info of the result.
+
+    Arguments:
+        obj {dict} -- the object dictionary (or a dictionary only containing the key 'repo_info')
+
+    Keyword Arguments:
+        obj_fields {list of str or str} -- fields of the object which are returned, 'all' for all fields, None for no fields (default: {None})
+        repo_info_fields {list of str or str} -- fields of the repo_info which are returned, 'all' for all fields, None for no fields (default: {None})
+
+    Returns:
+        dict -- dictionary with the selected fields
+    """
+
+    repo_info = obj['repo_info']
+    result = {'repo_info': {RepoInfoKey.NAME.value: repo_info.get(RepoInfoKey.NAME.value),
+                            RepoInfoKey.VERSION.value: repo_info.get(RepoInfoKey.VERSION.value)}}
+    if repo_info_fields is not None:
+        names = _field_names(repo_info_fields)
+        if names is None:
+            names = repo_info.keys()
+        for k in names:
+            if k in repo_info:
+                result['repo_info'][k] = repo_info[k]
+    if obj_fields is not None:
+        names = _field_names(obj_fields)
+        if names is None:
+            names = [k for k in obj.keys() if k != 'repo_info']
+        for k in names:
+            if k in obj:
+                result[k] = obj[k]
+    return result
+
+
+def _read_only_error(*args, **kwargs):
+    logger.error('Cannot modify a read-only object returned by a RepoStore, use copy.deepcopy to get a modifiable copy.')
+    raise Exception('Cannot modify a read-only object returned by a RepoStore, use copy.deepcopy to get a modifiable copy.')
+
+
+class _FrozenDict(dict):
+    """ A dictionary which cannot be modified
+
+    Copies (copy.copy, copy.deepcopy, pickle) of the dictionary are plain modifiable dictionaries.
+    """
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = __ior__ = _read_only_error
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        result = {}
+        memo[id(self)] = result
+        for k, v in self.items():
+            result[deepcopy(k, memo)] = deepcopy(v, memo)
+        return result
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+
+class _FrozenList(list):
+    """ A list which cannot be modified
+
+    Copies (copy.copy, copy.deepcopy, pickle) of the list are plain modifiable lists.
+    """
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = append = extend = insert = pop = remove = clear = sort = reverse = _read_only_error
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        result = []
+        memo[id(self)] = result
+        for v in self:
+            result.append(deepcopy(v, memo))
+        return result
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+
+def _freeze(value):
+    """ Return a read-only version of the value
+
+    Dictionaries and lists are converted to read-only dictionaries and lists (recursively), numpy arrays are set to
+    not writeable. All other objects are returned as they are.
+
+    Arguments:
+        value {object} -- the value to freeze (must not be referenced elsewhere)
+
+    Returns:
+        object -- the read-only value
+    """
+
+    if isinstance(value, dict):
+        return _FrozenDict({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return _FrozenList([_freeze(v) for v in value])
+    if isinstance(value, tuple):
+        return tuple([_freeze(v) for v in value])
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    return value
+
+
+class _ObjectCache:
+    """ Size bounded LRU cache of object dictionaries keyed by name and version
+
+    The cache is bounded by the number of objects and optionally by the total number of bytes of the objects 
+    (as given when they are put into the cache).
+    """
+
+    def __init__(self, max_size, max_bytes=None):
+        """ Constructor
+
+        Arguments:
+            max_size {int} -- maximal number of objects in the cache
+
+        Keyword Arguments:
+            max_bytes {int or None} -- maximal number of bytes of the objects in the cache, None for no limit (default: {None})
+        """
+
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # (name, version) -> object and its number of bytes
+        self._objects = OrderedDict()
+
+    def get(self, name, version):
+        """ Return the cached object or None if it is not in the cache
+
+        Arguments:
+            name {str} -- identifier of the object
+            version {str} -- version of the object
+
+        Returns:
+            dict or None -- the object dictionary
+        """
+
+        obj = self._objects.get((name, version))
+        if obj is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._objects.move_to_end((name, version))
+        return obj[0]
+
+    def put(self, name, version, obj, n_bytes=0):
+        """ Add an object to the cache, the least recently used objects are removed if the cache is full
+
+        Objects larger than max_bytes are not cached.
+
+        Arguments:
+            name {str} -- identifier of the object
+            version {str} -- version of the object
+            obj {dict} -- the object dictionary
+
+        Keyword Arguments:
+            n_bytes {int} -- the number of bytes of the object (default: {0})
+        """
+
+        self.invalidate(name, version)
+        if self.max_bytes is not None and n_bytes > self.max_bytes:
+            return
+        self._objects[(name, version)] = (obj, n_bytes)
+        self.n_bytes += n_bytes
+        while len(self._objects) > self.max_size or (self.max_bytes is not None and self.n_bytes > self.max_bytes):
+            _, (_, n_bytes) = self._objects.popitem(last=False)
+            self.n_bytes -= n_bytes
+
+    def invalidate(self, name, version):
+        """ Remove an object from the cache
+
+        Arguments:
+            name {str} -- identifier of the object
+            version {str} -- version of the object
+        """
+
+        obj = self._objects.pop((name, version), None)
+        if obj is not None:
+            self.n_bytes -= obj[1]
+
+    def clear(self):
+        """ Remove all objects from the cache
+        """
+
+        self._objects.clear()
+        self.n_bytes = 0
+
+    def get_statistics(self):
+        """ Return the hit/miss statistics of the cache
+
+        Returns:
+            dict -- dictionary with number of hits, misses, current and maximal size and current and maximal number of bytes
+        """
+
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._objects), 'max_size': self.max_size,
+                'bytes': self.n_bytes, 'max_bytes': self.max_bytes}
+
+
 FIRST_VERSION = 'first'
 LAST_VERSION = 'last'
 
@@ -65,6 +325,80 @@ class RepoStore(abc.ABC):
 
     """
 
+    # LRU cache of object dictionaries, None if caching is disabled (see set_cache)
+    _object_cache = None
+    # categories of objects which are replaced in place (possibly by other processes) and therefore never cached
+    _NOT_CACHED_CATEGORIES = ('JOB', 'MAPPING')
+    # index of the first and latest version of each object name, filled lazily when placeholders are resolved
+    _version_index = None
+
+    def _check_version_index(self):
+        """ Checks whether the version index is still valid
+
+        This method may be overwritten by subclasses whose storage may be changed by other processes, 
+        e.g. to clear the index if the storage was changed.
+        """
+
+        pass
+
+    def _clear_version_index(self, name=None):
+        """ Removes the entry of the given object (or all entries) from the version index
+
+        Keyword Arguments:
+            name {str} -- identifier of the object, if None the whole index is cleared (default: {None})
+        """
+
+        if self._version_index is None:
+            return
+        if name is None:
+            self._version_index.clear()
+        else:
+            self._version_index.pop(name, None)
+
+    def _get_indexed_versions(self, name, throw_error_not_exist=True):
+        """ Returns the first and latest version of an object using the version index
+
+        Arguments:
+            name {str} -- identifier of the object
+
+        Keyword Arguments:
+            throw_error_not_exist {bool} -- throw an error if not exists (default: {True})
+
+        Returns:
+            tuple -- first and latest version
+        """
+
+        if self._version_index is None:
+            self._version_index = {}
+        self._check_version_index()
+        entry = self._version_index.get(name)
+        if entry is None:
+            entry = (self.get_first_version(name, throw_error_not_exist),
+                     self.get_latest_version(name, throw_error_not_exist))
+            if entry[0] == [] or entry[1] == []:
+                return entry
+            self._version_index[name] = entry
+        return entry
+
+    def _update_version_index(self, name, version):
+        """ Updates the version index after a new version of an object has been added
+
+        Arguments:
+            name {str} -- identifier of the object
+            version {str} -- the new version
+        """
+
+        if self._version_index is None:
+            return
+        entry = self._version_index.get(name)
+        if entry is None:
+            return
+        time = uuid.UUID(version).time
+        if time >= uuid.UUID(entry[1]).time:
+            self._version_index[name] = (entry[0], version)
+        elif time < uuid.UUID(entry[0]).time:
+            self._version_index[name] = (version, entry[1])
+
     def _replace_version_placeholder(self, name, versions, throw_error_not_exist=True):
         """ replaces the version placeholder
 
@@ -81,9 +415,9 @@ class RepoStore(abc.ABC):
 
         def replace_version(name, version, throw_error_not_exist):
             if version == FIRST_VERSION:
-                return self.get_first_version(name, throw_error_not_exist)
+                return self._get_indexed_versions(name, throw_error_not_exist)[0]
             if version == LAST_VERSION:
-                return self.get_latest_version(name, throw_error_not_exist)
+                return self._get_indexed_versions(name, throw_error_not_exist)[1]
             if isinstance(version, int):
                 return self.get_version(name, version, throw_error_not_exist)
             return version
@@ -124,6 +458,7 @@ class RepoStore(abc.ABC):
         if obj['repo_info'][RepoInfoKey.VERSION.value] is None:
             obj['repo_info'][RepoInfoKey.VERSION.value] = _version_str()
         self._add(obj)
+        self._update_version_index(obj['repo_info'][RepoInfoKey.NAME.value], obj['repo_info'][RepoInfoKey.VERSION.value])
         return obj['repo_info'][RepoInfoKey.VERSION.value]
 
     @abc.abstractmethod
@@ -136,7 +471,58 @@ class RepoStore(abc.ABC):
 
         pass
 
-    def _get_by_modification_info(self, modifier_name, modifier_version, object_types=[]):
+    def set_cache(self, max_size):
+        """ Enable caching of objects retrieved by get
+
+        Objects are cached by name and version in a least recently used cache. Since versioned objects are immutable the
+        cache only needs to be invalidated by replace and _delete. Only complete objects requested by a single version are cached.
+        The values of cached objects are frozen (see memory_handler.RepoObjectMemoryStorage with frozen_objects) and returned
+        without copying them, only the object dictionary and its repo_info are copied. Use copy.deepcopy to get a modifiable 
+        copy of a value. Jobs and the mapping are updated in place and are therefore never cached.
+
+        Arguments:
+            max_size {int} -- maximal number of cached objects, caching is disabled if max_size is not positive
+        """
+
+        if max_size is not None and max_size > 0:
+            self._object_cache = _ObjectCache(max_size)
+        else:
+            self._object_cache = None
+
+    def get_cache_statistics(self):
+        """ Return the hit/miss statistics of the object cache
+
+        Returns:
+            dict or None -- dictionary with number of hits, misses, current and maximal size, None if caching is disabled
+        """
+
+        if self._object_cache is None:
+            return None
+        return self._object_cache.get_statistics()
+
+    def _invalidate_cache(self, name, version):
+        """ Remove an object from the cache, must be called by subclasses whenever a stored object is changed or deleted
+
+        Arguments:
+            name {str} -- identifier of the object
+            version {str} -- version of the object
+        """
+
+        if self._object_cache is not None:
+            self._object_cache.invalidate(name, version)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """ Context manager bundling all changes made within the context into one transaction
+
+        All objects added or replaced within the context are persisted together when the context is left. If an exception is raised
+        within the context, none of these changes is persisted. Contexts may be nested, only the outermost context commits.
+        This method may be overwritten by subclasses, the default implementation applies all changes immediately.
+        """
+
+        yield
+
+    def _get_by_modification_info(self, modifier_name, modifier_version, object_types=[], load_objects=True):
         """ Return list of all objects which were modified by a given object.
 
         This method may be overwritten by subclasses to enhance performance.
@@ -147,22 +533,28 @@ class RepoStore(abc.ABC):
 
         Keyword Arguments:
             object_types {list of str} -- list of strings defining the object types (default: {[]})
+            load_objects {bool} -- if True, the objects are returned, otherwise only tuples of their names and versions (default: {True})
 
         Returns:
-            list -- list of objects, empty if no such objects exist
+            list -- list of objects (or tuples of name and version), empty if no such objects exist
         """
 
         result = []
         modifier = {modifier_name: modifier_version}
+        repo_info_fields = None
+        if not load_objects:
+            repo_info_fields = [RepoInfoKey.VERSION]
         for category in object_types:
             names = self.get_names(category)
             for n in names:
-                objs = self.get(n, modifier_versions=modifier,
+                objs = self.get(n, modifier_versions=modifier, repo_info_fields=repo_info_fields,
                                 throw_error_not_exist=False, throw_error_not_unique=False)
-                if isinstance(objs, list):
+                if not isinstance(objs, list):
+                    objs = [objs]
+                if load_objects:
                     result.extend(objs)
                 else:
-                    result.append(objs)
+                    result.extend([(n, obj['repo_info'][RepoInfoKey.VERSION.value]) for obj in objs])
         return result
 
     def get(self, name, versions=None, modifier_versions=None, obj_fields=None,  repo_info_fields=None,
@@ -198,9 +590,41 @@ class RepoStore(abc.ABC):
             for k, v in modifier_versions.items():
                 modifier_versions[k] = self._replace_version_placeholder(
                     k, v, throw_error_not_exist)
-        return self._get(name, versions, modifier_versions,
-                         obj_fields, repo_info_fields,
-                         throw_error_not_exist, throw_error_not_unique)
+        use_cache = self._object_cache is not None and isinstance(versions, str) and modifier_versions is None \
+            and obj_fields is None and repo_info_fields is None
+        if use_cache:
+            obj = self._object_cache.get(name, versions)
+            if obj is not None:
+                return [RepoStore._read_cached_object(obj)]
+        result = self._get(name, versions, modifier_versions,
+                           obj_fields, repo_info_fields,
+                           throw_error_not_exist, throw_error_not_unique)
+        if use_cache and len(result) == 1:
+            category = result[0]['repo_info'].get(RepoInfoKey.CATEGORY.value)
+            if getattr(category, 'value', category) not in RepoStore._NOT_CACHED_CATEGORIES:
+                # the object returned by _get is not referenced by the store, so it can be frozen without copying it
+                obj = {k: _freeze(v) for k, v in result[0].items() if k != 'repo_info'}
+                obj['repo_info'] = result[0]['repo_info']
+                self._object_cache.put(name, versions, obj)
+                return [RepoStore._read_cached_object(obj)]
+        return result
+
+    @staticmethod
+    def _read_cached_object(obj):
+        """ Return a cached object dictionary
+
+        The frozen values of the object are shared with the cache, only the dictionary itself and the repo_info are copied.
+
+        Arguments:
+            obj {dict} -- the cached object dictionary
+
+        Returns:
+            dict -- the object dictionary
+        """
+
+        result = dict(obj)
+        result['repo_info'] = deepcopy(obj['repo_info'])
+        return result
 
     def push(self):
         """ Push changes to an external repo.
@@ -359,6 +783,29 @@ class NumpyStore(abc.ABC):
 
         pass
 
+    def add_chunked(self, name, version, numpy_chunks):
+        """ Add numpy data of an object which is given in blocks of rows to the storage.
+
+        All blocks are stored as data of the given version. This implementation concatenates the blocks and calls add,
+        storages which write to files overwrite it to write each block when it is returned so that only the current block
+        must be kept in memory.
+
+        Arguments:
+            name {str} -- Name (as string) of object
+            version {str} -- object version
+            numpy_chunks {iterable of numpy dict} -- the blocks of the numpy data, each containing the same keys
+        """
+
+        blocks = {}
+        for numpy_dict in numpy_chunks:
+            for k, v in numpy_dict.items():
+                blocks.setdefault(k, []).append(v)
+        numpy_dict = {}
+        for k, v in blocks.items():
+            v = [x for x in v if x is not None]
+            numpy_dict[k] = None if len(v) == 0 else np.concatenate(v, axis=0)
+        self.add(name, version, numpy_dict)
+
     @abc.abstractmethod
     def append(self, name, version_old, version_new, numpy_dict):
         """ Append data to an existing object
@@ -373,7 +820,7 @@ class NumpyStore(abc.ABC):
         pass
 
     @abc.abstractmethod
-    def get(self, name, version, from_index=0, to_index=None):
+    def get(self, name, version, from_index=0, to_index=None, columns=None):
         """ get the numpy object for a name and a version, rows can be used
 
         Arguments:
@@ -383,6 +830,8 @@ class NumpyStore(abc.ABC):
         Keyword Arguments:
             from_index {int} -- the index from which the data should be taken (default: {0})
             to_index {int or None} -- the index to which the data is returned (None means till the end) (default: {None})
+            columns {dict or None} -- if not None, only the arrays contained as keys are returned, restricted to the columns given 
+                                        by the list of column indices (None for all columns) belonging to the key (default: {None})
 
         Returns:
             numpy array -- the numpy object to return
@@ -399,3 +848,9 @@ class NumpyStore(abc.ABC):
         """
 
         pass
+
+    def close(self):
+        """ Release resources (e.g. open files) held by the store, the store can still be used afterwards.
+        """
+
+        pass
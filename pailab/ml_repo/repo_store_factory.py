@@ -44,7 +44,7 @@ class RepoStoreFactory:
             return RepoObjectGitStorage(**kwargs)
         elif repo_store_type == 'memory_handler':
             from pailab.ml_repo.memory_handler import RepoObjectMemoryStorage
-            return RepoObjectMemoryStorage()
+            return RepoObjectMemoryStorage(**kwargs)
         raise Exception('Cannot create RepoStore: Unknown repo type ' + repo_store_type +
                         '. Use only types from the list returned by RepoStoreFactory.get_repo_stores().')
 
@@ -61,7 +61,7 @@ class NumpyStoreFactory:
             list of str -- list of supported big data handler types
         """
 
-        return ['memory_handler', 'hdf_handler']
+        return ['memory_handler', 'hdf_handler', 'npy_handler']
 
     @staticmethod
     def get(numpy_store_type, **kwargs):
@@ -71,6 +71,7 @@ class NumpyStoreFactory:
         Currently these types are supported:
         * memory_handler
         * hdf_handler
+        * npy_handler
 
         Arguments:
             numpy_store_type {str} -- the name of the big data store type
@@ -87,5 +88,8 @@ class NumpyStoreFactory:
         elif numpy_store_type == 'hdf_handler':
             from pailab.ml_repo.numpy_handler_hdf import NumpyHDFStorage
             return NumpyHDFStorage(**kwargs)
+        elif numpy_store_type == 'npy_handler':
+            from pailab.ml_repo.numpy_handler_npy import NumpyNpyStorage
+            return NumpyNpyStorage(**kwargs)
         raise Exception('Cannot create NumpyStore: Unknown  type ' + numpy_store_type +
                         '. Use only types from the list returned by NumpyStoreFactory.get_numpy_stores().')
@@ -75,17 +75,25 @@ class RepoObjectItem:
         return result
 
     def history(self, version = (repo_store.FIRST_VERSION,repo_store.LAST_VERSION), repo_info = [RepoInfoKey.AUTHOR, RepoInfoKey.COMMIT_DATE, RepoInfoKey.COMMIT_MESSAGE], obj_data = []):
-        history = self._repo.get(self._name, version = version)
-        if not isinstance(history, list):
-            history = [history]
+        obj_fields = None
+        if len(obj_data) > 0:
+            obj_fields = obj_data
+        version_start, version_end = version, version
+        if isinstance(version, tuple):
+            version_start, version_end = version
+        history = self._repo.get_history(self._name, repo_info_fields = repo_info, obj_member_fields = obj_fields, 
+                                        version_start = version_start, version_end = version_end)
         result = {}
         for h in history:
             r = {}
             for r_info in repo_info:
-                r[str(r_info)] = h.repo_info[r_info]
+                if isinstance(r_info, RepoInfoKey):
+                    r[str(r_info)] = h['repo_info'].get(r_info.value)
+                else:
+                    r[str(r_info)] = h['repo_info'].get(r_info)
             for o_info in obj_data:
-                r[o_info] = obj_data.__dict__[o_info]
-            result[h.repo_info[RepoInfoKey.VERSION]] = r
+                r[o_info] = h.get(o_info)
+            result[h['repo_info'][RepoInfoKey.VERSION.value]] = r
         return result
 
     def __call__(self, containing_str=None):
@@ -139,25 +147,34 @@ class RawDataItem(RepoObjectItem):
             numpy_dict['y_data'] =  y_data
         raw_data.n_data += x_data.shape[0]
         old_version = raw_data.repo_info[RepoInfoKey.VERSION]
-        new_version = self._repo.add(raw_data)
-        self._repo._numpy_repo.append(self._name, old_version, new_version, numpy_dict)
-        # now find all datasets which are affected by the updated data
-        changed_data_sets = []
-        training_data = self._repo.get_training_data(full_object = False)
-        if isinstance(training_data, DataSet):
-            if training_data.raw_data == self._name and training_data.raw_data_version == repo_store.RepoStore.LAST_VERSION:
-                if training_data.end_index is None or training_data.end_index < 0:
-                    training_data.raw_data_version = new_version
-                    changed_data_sets.append(training_data)
-        test_data = self._repo.get_names(MLObjectType.TEST_DATA)
-        for d in test_data:
-            data = self._repo.get(d)
-            if isinstance(data, DataSet):
-                if data.raw_data == self._name and data.raw_data_version == repo_store.RepoStore.LAST_VERSION:
-                    if data.end_index is None or data.end_index < 0:
-                        data.raw_data_version = new_version
-                        changed_data_sets.append(data)
-        self._repo.add(changed_data_sets, 'RawData ' + self._name + ' updated, add DataSets depending om the updated RawData.')
+        # the new RawData version and the updated DataSets are stored in one transaction, the numpy store does not take part 
+        # in the transaction so that the appended data is deleted if the transaction is rolled back
+        new_version = None
+        try:
+            with self._repo._ml_repo.transaction():
+                new_version = self._repo.add(raw_data)
+                self._repo._numpy_repo.append(self._name, old_version, new_version, numpy_dict)
+                # now find all datasets which are affected by the updated data
+                changed_data_sets = []
+                training_data = self._repo.get_training_data(full_object = False)
+                if isinstance(training_data, DataSet):
+                    if training_data.raw_data == self._name and training_data.raw_data_version == repo_store.RepoStore.LAST_VERSION:
+                        if training_data.end_index is None or training_data.end_index < 0:
+                            training_data.raw_data_version = new_version
+                            changed_data_sets.append(training_data)
+                test_data = self._repo.get_names(MLObjectType.TEST_DATA)
+                for d in test_data:
+                    data = self._repo.get(d)
+                    if isinstance(data, DataSet):
+                        if data.raw_data == self._name and data.raw_data_version == repo_store.RepoStore.LAST_VERSION:
+                            if data.end_index is None or data.end_index < 0:
+                                data.raw_data_version = new_version
+                                changed_data_sets.append(data)
+                self._repo.add(changed_data_sets, 'RawData ' + self._name + ' updated, add DataSets depending om the updated RawData.')
+        except:
+            if new_version is not None:
+                self._repo._numpy_repo._delete(self._name, new_version)
+            raise
         if hasattr(self, 'obj'):#update current object
             self.obj = self._repo.get(self._name, version=new_version)
         logger.info('Finished appending data to RawData' + self._name)
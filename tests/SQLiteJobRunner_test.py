@@ -14,6 +14,9 @@ from pailab.job_runner.job_runner import SQLiteJobRunner
 from pailab.job_runner.job_runner_factory import JobRunnerFactory
 
 import time
+import sqlite3
+import threading
+from copy import deepcopy
 
 import logging
 # logging.basicConfig(level=logging.DEBUG)
@@ -53,6 +56,18 @@ def train_func_test(training_param, data):
     return TestClass(2, 3, repo_info={})  # pylint: disable=E1123
 
 
+def train_func_error(training_param, data):
+    '''Dummy model training function for testing which always fails
+    '''
+    raise Exception('training failed')
+
+
+def train_func_exit(training_param, data):
+    '''Dummy model training function for testing which terminates the process
+    '''
+    os._exit(1)
+
+
 class JobRunnerFactory_Test(unittest.TestCase):
     """Tests for JobRunnerFactory
 
@@ -185,7 +200,8 @@ class SQLiteJobRunner_Test(unittest.TestCase):
         n_waiting_jobs = len(waiting_jobs)
         # count the number of jobs waiting for preprocessing
         n_waiting_pred = count_waiting_pred(waiting_jobs)
-        self.assertEqual(n_waiting_jobs, 10)
+        # one training job, three evaluation jobs and one measure job per dataset
+        self.assertEqual(n_waiting_jobs, 7)
         for i in range(n_waiting_jobs):
             self.repository._job_runner.run(1)
             if i == 0:
@@ -201,6 +217,215 @@ class SQLiteJobRunner_Test(unittest.TestCase):
 
         # now count the jobs waiting for predecessors
 
+    def test_claim_job(self):
+        job = self.repository.run_training()
+        other_runner = SQLiteJobRunner('tmp/job_runner.sqlite', self.repository)
+        self.assertEqual(self.repository._job_runner._claim_job(), (job[0], str(job[1])))
+        # the job is leased to the first runner and cannot be claimed again
+        self.assertIsNone(other_runner._claim_job())
+        job_info = self.repository._job_runner.get_info(job[0], job[1])
+        self.assertEqual(job_info['job_state'], JobState.RUNNING.value)
+        self.assertEqual(job_info['worker_id'], self.repository._job_runner._id)
+        other_runner.close_connection()
+
+    def test_requeue_expired_lease(self):
+        job = self.repository.run_training()
+        job_runner = self.repository._job_runner
+        # simulate a runner which died after claiming the job
+        job_runner._lease_time = -1.0
+        job_runner._claim_job()
+        other_runner = SQLiteJobRunner('tmp/job_runner.sqlite', self.repository)
+        other_runner.run(1)
+        job_info = other_runner.get_info(job[0], job[1])
+        self.assertEqual(job_info['job_state'], JobState.SUCCESSFULLY_FINISHED.value)
+        self.assertEqual(job_info['worker_id'], other_runner._id)
+        # the result of the runner which lost the lease is discarded
+        job_runner._set_finished(job[0], str(job[1]), 'error', 'stack_trace')
+        job_info = other_runner.get_info(job[0], job[1])
+        self.assertEqual(job_info['job_state'], JobState.SUCCESSFULLY_FINISHED.value)
+        other_runner.close_connection()
+
+    def test_renew_lease_error(self):
+        job = self.repository.run_training()
+        job_runner = self.repository._job_runner
+        job_runner._lease_time = 0.3
+        job_runner._claim_job()
+        calls = []
+        update_lease = job_runner._update_lease
+        def failing_update_lease(conn, job_name, job_version):
+            calls.append(job_name)
+            if len(calls) == 1:
+                raise sqlite3.OperationalError('database is locked')
+            update_lease(conn, job_name, job_version)
+        job_runner._update_lease = failing_update_lease
+        stop = threading.Event()
+        thread = threading.Thread(target=job_runner._renew_lease, args=(job[0], str(job[1]), stop))
+        thread.start()
+        # the heartbeat continues after the failed update and renews the lease
+        time.sleep(1.0)
+        self.assertTrue(thread.is_alive())
+        self.assertGreater(len(calls), 1)
+        lease_expiry = job_runner._conn.execute("select lease_expiry from jobs where job_name = ? and job_version = ?",
+                                                (job[0], str(job[1]))).fetchone()[0]
+        self.assertGreater(lease_expiry, time.time())
+        stop.set()
+        thread.join()
+
+    def test_wakeup(self):
+        config = deepcopy(self.repository.get_config())
+        config['workspace'] = None
+        config['job_runner'] = {'type': 'simple', 'config': {}}
+
+        def run_worker():
+            # sqlite connections cannot be shared between threads, so the worker uses its own repo and runner
+            worker_repo = repo.MLRepo(config=config)
+            worker = SQLiteJobRunner('tmp/job_runner.sqlite', worker_repo, sleep=60)
+            worker.run(2)
+            worker.close_connection()
+            worker_repo._ml_repo.close_connection()
+        thread = threading.Thread(target=run_worker)
+        thread.start()
+        time.sleep(0.2)
+        job = self.repository.run_training()
+        # the idle worker is woken up by adding the job and does not sleep for 60 seconds
+        thread.join(timeout=20)
+        self.assertFalse(thread.is_alive())
+        job_info = self.repository._job_runner.get_info(job[0], job[1])
+        self.assertEqual(job_info['job_state'], JobState.SUCCESSFULLY_FINISHED.value)
+
+
+class ProcessPoolJobRunner_Test(unittest.TestCase):
+
+    def setUp(self):
+        '''Setup a repo using the process_pool job runner with training and test data, a model definition and a measure configuration
+        '''
+        try:
+            shutil.rmtree('tmp_pool')
+        except OSError:
+            pass
+        config = {'user': 'test_user',
+                  'workspace': 'tmp_pool',
+                  'repo_store':
+                  {
+                      'type': 'disk_handler',
+                      'config': {
+                          'folder': 'tmp_pool',
+                          'file_format': 'pickle'
+                      }
+                  },
+                  'numpy_store':
+                  {
+                      'type': 'hdf_handler',
+                      'config': {
+                          'folder': 'tmp_pool/numpy'
+                      }
+                  },
+                  'job_runner':
+                  {
+                      'type': 'process_pool',
+                      'config': {
+                          'n_workers': 2,
+                          'cache_size': 10
+                      }
+                  }
+                  }
+        self.repository = repo.MLRepo(user='unittestuser', config=config)
+        for i in range(3):
+            raw_data = RawData(np.zeros([10, 1]), ['x0'], np.zeros(
+                [10, 1]), ['y0'], repo_info={repo_objects.RepoInfoKey.NAME.value: 'raw_' + str(i)})
+            self.repository.add(raw_data, category=repo.MLObjectType.RAW_DATA)
+        training_data = DataSet('raw_0', 0, None,
+                                repo_info={repo_objects.RepoInfoKey.NAME.value: 'training_data_1', repo_objects.RepoInfoKey.CATEGORY: repo.MLObjectType.TRAINING_DATA})
+        test_data_1 = DataSet('raw_1', 0, None,
+                              repo_info={repo_objects.RepoInfoKey.NAME.value: 'test_data_1',  repo_objects.RepoInfoKey.CATEGORY: repo.MLObjectType.TEST_DATA})
+        test_data_2 = DataSet('raw_2', 0, None,
+                              repo_info={repo_objects.RepoInfoKey.NAME.value: 'test_data_2',  repo_objects.RepoInfoKey.CATEGORY: repo.MLObjectType.TEST_DATA})
+        self.repository.add([training_data, test_data_1, test_data_2])
+        self.repository.add_eval_function(eval_func_test)
+        self.repository.add_training_function(train_func_test)
+        self.repository.add(TestClass(1, 2, repo_info={repo_objects.RepoInfoKey.NAME.value: 'training_param',  # pylint: disable=E1123
+                                                       repo_objects.RepoInfoKey.CATEGORY: repo.MLObjectType.TRAINING_PARAM}))
+        self.repository.add_model('model')
+        measure_config = repo_objects.MeasureConfiguration([repo_objects.MeasureConfiguration.MAX, repo_objects.MeasureConfiguration.R2],
+                                                           repo_info={RepoInfoKey.NAME: 'measure_config'})
+        self.repository.add(measure_config, category=MLObjectType.MEASURE_CONFIGURATION)
+
+    def tearDown(self):
+        self.repository._job_runner.close()
+        self.repository._ml_repo.close_connection()
+        shutil.rmtree('tmp_pool', ignore_errors=True)
+
+    def test_job_runner(self):
+        job_runner = self.repository._job_runner
+        job = self.repository.run_training(run_descendants=True)
+        self.assertTrue(job_runner.wait(timeout=300))
+        self.assertEqual(job_runner.get_waiting_jobs(), [])
+        self.assertEqual(job_runner.get_info(job[0], job[1]).state, JobState.SUCCESSFULLY_FINISHED.value)
+        # the objects added by the worker processes
+        self.assertEqual(len(self.repository.get_names(MLObjectType.MEASURE)), 6)
+        self.repository._reload_mapping()
+        self.assertEqual(len(self.repository._mapping[MLObjectType.MEASURE]), 6)
+        self.assertEqual(len(self.repository._mapping[MLObjectType.CALIBRATED_MODEL]), 1)
+        model = self.repository.get('model/model')
+        eval_data = self.repository.get('model/eval/test_data_2', full_object=True)
+        self.assertEqual(eval_data.repo_info.modification_info['model/model'], model.repo_info.version)
+        self.assertEqual(eval_data.x_data.shape, (10, 1))
+
+    def test_select_worker(self):
+        job_runner = self.repository._job_runner
+        job_runner._worker_load = [1, 0]
+        job_runner._worker_inputs[0]['test_data_1'] = True
+        # jobs are routed to the worker which already read their inputs if it is not too busy
+        self.assertEqual(job_runner._select_worker(['test_data_1', 'model/eval/test_data_1']), 0)
+        self.assertEqual(job_runner._select_worker(['test_data_2']), 1)
+        job_runner._worker_load = [2, 0]
+        self.assertEqual(job_runner._select_worker(['test_data_1']), 1)
+        job_runner._worker_load = [0, 0]
+
+    def test_failed_predecessor(self):
+        job_runner = self.repository._job_runner
+        train_func_name = self.repository.get('model').training_function
+        self.repository.add_training_function(train_func_error, repo_name=train_func_name)
+        job = self.repository.run_training(run_descendants=True)
+        self.assertFalse(job_runner.wait(timeout=300))
+        self.assertEqual(job_runner.get_info(job[0], job[1]).state, JobState.FAILED.value)
+        eval_jobs = [x for x in job_runner._jobs.values() if '/eval_job/' in x[0]]
+        self.assertEqual(len(eval_jobs), 3)
+        for eval_job in eval_jobs:
+            job_info = job_runner.get_info(eval_job[0], eval_job[1])
+            self.assertEqual(job_info.state, JobState.FAILED.value)
+            self.assertTrue(job_info.error_message.startswith('Predecessor job'))
+        job_runner._throw_job_error = True
+        self.repository.add_training_function(train_func_test)
+        self.repository.add_training_function(train_func_error, repo_name=train_func_name)
+        self.repository.run_training()
+        with self.assertRaises(Exception):
+            job_runner.wait(timeout=300)
+
+    def test_worker_died(self):
+        job_runner = self.repository._job_runner
+        train_func_name = self.repository.get('model').training_function
+        # the worker process running the job dies
+        self.repository.add_training_function(train_func_exit, repo_name=train_func_name)
+        job = self.repository.run_training(run_descendants=True)
+        self.assertFalse(job_runner.wait(timeout=300))
+        self.assertEqual(job_runner.get_info(job[0], job[1]).state, JobState.FAILED.value)
+        self.assertEqual(job_runner.get_waiting_jobs(), [])
+        self.assertEqual(job_runner._worker_load, [0, 0])
+        # an idle worker process dies, the next job submitted to it fails and the worker is replaced
+        job_runner._executors[0].submit(os._exit, 1).exception(timeout=300)
+        self.repository.add_training_function(train_func_test, repo_name=train_func_name)
+        job = self.repository.run_training(run_descendants=True)
+        self.assertFalse(job_runner.wait(timeout=300))
+        job_info = job_runner.get_info(job[0], job[1])
+        self.assertEqual(job_info.state, JobState.FAILED.value)
+        self.assertTrue(job_info.error_message.startswith('Cannot submit job'))
+        self.assertEqual(job_runner._worker_load, [0, 0])
+        self.repository.add_training_function(train_func_test, repo_name=train_func_name)
+        job = self.repository.run_training(run_descendants=True)
+        self.assertTrue(job_runner.wait(timeout=300))
+        self.assertEqual(job_runner.get_info(job[0], job[1]).state, JobState.SUCCESSFULLY_FINISHED.value)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,79 @@
+""" Micro-benchmark for the sql statements of the RepoObjectDiskStorage
+
+Measures the per call time of get_latest_version and _get (repo_info fields only, so that no object file is read) and 
+compares the time of their sql statements with bound parameters to the same statements built by string concatenation 
+as they were used before the statements were parameterized.
+
+Run with: python disk_storage_benchmark.py [number of versions] [number of calls]
+"""
+import sys
+import shutil
+import timeit
+import itertools
+import pailab.ml_repo.repo as repo
+import pailab.ml_repo.repo_objects as repo_objects
+import pailab.ml_repo.disk_handler as disk_handler
+
+
+class TestClass:
+    @repo_objects.repo_object_init()
+    def __init__(self):
+        self.a = 1.0
+
+
+def _setup(folder, n_versions):
+    shutil.rmtree(folder, ignore_errors=True)
+    storage = disk_handler.RepoObjectDiskStorage(folder)
+    with storage.transaction():
+        for i in range(n_versions):
+            for name in ['obj', 'other']:
+                obj = TestClass(repo_info={repo_objects.RepoInfoKey.NAME.value: name,
+                                           repo_objects.RepoInfoKey.CATEGORY: repo.MLObjectType.TRAINING_DATA})
+                storage.add(repo_objects.create_repo_obj_dict(obj))
+    return storage
+
+
+def _latest_version_concatenated(storage, name):
+    for row in storage._conn.execute("select version from versions where name = '" + name + "' order by uuid_time DESC LIMIT 1"):
+        return row[0]
+
+
+def _latest_version_parameterized(storage, name):
+    for row in storage._conn.execute("select version from versions where name = ? order by uuid_time DESC LIMIT 1", (name,)):
+        return row[0]
+
+
+def _get_concatenated(storage, name, version):
+    storage._conn.execute("select category from mapping where name = '" + name + "'").fetchall()
+    return storage._conn.execute("select path, file, version, repo_info from versions where name = '" + name
+                                 + "' and version = '" + version + "'").fetchall()
+
+
+def _get_parameterized(storage, name, version):
+    storage._conn.execute("select category from mapping where name = ?", (name,)).fetchall()
+    return storage._conn.execute("select path, file, version, repo_info from versions where name = ? and version = ?",
+                                 (name, version)).fetchall()
+
+
+def main(n_versions=1000, n_calls=10000):
+    folder = 'tmp_disk_storage_benchmark'
+    storage = _setup(folder, n_versions)
+    # _get is called for changing versions so that the concatenated statements differ from call to call
+    versions = itertools.cycle([row[0] for row in storage._conn.execute("select version from versions where name = 'obj'")])
+    results = [('get_latest_version', lambda: storage.get_latest_version('obj'),
+                lambda: _latest_version_parameterized(storage, 'obj'),
+                lambda: _latest_version_concatenated(storage, 'obj')),
+               ('_get', lambda: storage._get('obj', next(versions), repo_info_fields=[repo_objects.RepoInfoKey.VERSION]),
+                lambda: _get_parameterized(storage, 'obj', next(versions)),
+                lambda: _get_concatenated(storage, 'obj', next(versions)))]
+    print('versions: ' + str(n_versions) + ', calls: ' + str(n_calls))
+    for label, method, parameterized, concatenated in results:
+        t = [timeit.timeit(f, number=n_calls) / n_calls * 1e6 for f in [method, parameterized, concatenated]]
+        print(label + ': ' + '{:.1f}'.format(t[0]) + 'us/call, statements only: parameterized ' + '{:.1f}'.format(t[1])
+              + 'us/call, concatenated ' + '{:.1f}'.format(t[2]) + 'us/call, saved ' + '{:.1f}'.format(t[2] - t[1]) + 'us/call')
+    storage.close_connection()
+    shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:3]])
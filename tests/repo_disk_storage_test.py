@@ -4,7 +4,7 @@ import os
 import shutil
 import pailab.ml_repo.repo as repo
 import pailab.ml_repo.repo_objects as repo_objects
-from pailab.ml_repo.repo_store import RepoStore
+from pailab.ml_repo.repo_store import RepoStore, _time_from_version
 import pailab.ml_repo.disk_handler as disk_handler
 import time
 import logging
@@ -133,6 +133,178 @@ class RepoDiskStorageTest(unittest.TestCase):
         self.assertEqual(
             obj[1]['repo_info'][repo_objects.RepoInfoKey.VERSION.value], self._object_versions[1])
 
+    def test_get_by_modification_info(self):
+        '''Test retrieval of the objects modified by a given object
+        '''
+        result = self._storage._get_by_modification_info('modifier_1', self._modifier1_versions[0],
+                                                         [repo.MLObjectType.TRAINING_DATA.value], load_objects=False)
+        self.assertEqual(result, sorted([('obj', self._object_versions[0]), ('obj', self._object_versions[1])]))
+        result = self._storage._get_by_modification_info('modifier_1', self._modifier1_versions[0],
+                                                         [repo.MLObjectType.TEST_DATA.value], load_objects=False)
+        self.assertEqual(len(result), 0)
+        result = self._storage._get_by_modification_info('modifier_2', self._modifier2_versions[3],
+                                                         [repo.MLObjectType.TRAINING_DATA.value])
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0]['repo_info']['version'], self._object_versions[3])
+        self.assertEqual(result[0]['a'], 1.0)
+
+    def test_get_repo_info_fields(self):
+        '''Test if repo_info fields are returned from the database without reading the object files
+        '''
+        # the repo_info of an object is read from file as long as it is missing in the database
+        self._storage._conn.execute("update versions set repo_info = NULL where version = '" + self._object_versions[0] + "'")
+        self._storage._conn.commit()
+        obj = self._storage.get('obj', versions=self._object_versions[0],
+                                repo_info_fields=[repo_objects.RepoInfoKey.MODIFICATION_INFO])
+        self.assertEqual(obj[0]['repo_info']['modification_info']['modifier_1'], self._modifier1_versions[0])
+        self.assertEqual(self._storage._conn.execute("select count(*) from versions where repo_info is NULL").fetchone()[0], 1)
+        # the migration of databases of older versions fills the repo_info from file
+        self._storage._conn.execute('PRAGMA user_version = 1')
+        self._storage._conn.close()
+        self._storage = disk_handler.RepoObjectDiskStorage('tmp_disk_storage')
+        self.assertEqual(self._storage._conn.execute("select count(*) from versions where repo_info is NULL").fetchone()[0], 0)
+        # remove all object files, the repo_info must still be available
+        shutil.rmtree('tmp_disk_storage/TRAINING_DATA/obj')
+        obj = self._storage.get('obj', versions=(RepoStore.FIRST_VERSION, RepoStore.LAST_VERSION),
+                                repo_info_fields=[repo_objects.RepoInfoKey.MODIFICATION_INFO, 'category'])
+        self.assertEqual(len(obj), len(self._object_versions))
+        for i in range(len(obj)):
+            self.assertEqual(obj[i]['repo_info'][repo_objects.RepoInfoKey.VERSION.value], self._object_versions[i])
+            self.assertEqual(obj[i]['repo_info']['modification_info']['modifier_2'], self._modifier2_versions[i])
+            self.assertEqual(obj[i]['repo_info']['category'], repo.MLObjectType.TRAINING_DATA)
+            self.assertFalse('a' in obj[i])
+        # object fields still need the files
+        obj = self._storage.get('modifier_1', versions=RepoStore.LAST_VERSION, obj_fields=['a'])
+        self.assertEqual(obj[0]['a'], 1.0)
+        self.assertFalse('b' in obj[0])
+
+    def test_json_tuples(self):
+        '''Test if tuples are restored by the json encoding of repo_info and objects
+        '''
+        obj = {'a': (1, 'x'), 'b': [(2, 3)], 'c': {'d': ((4,),)}}
+        encoded = disk_handler.json.dumps(obj, cls=disk_handler._RepoJSONEncoder)
+        self.assertEqual(disk_handler.json.loads(encoded, cls=disk_handler._RepoJSONDecoder), obj)
+
+    def test_migrate_db(self):
+        '''Test migration of a database with text uuid times and without indexes
+        '''
+        conn = self._storage._conn
+        for name, version in conn.execute('select name, version from versions').fetchall():
+            conn.execute("update versions set uuid_time = '" + str(_time_from_version(version)) + "' where name = '"
+                + name + "' and version = '" + version + "'")
+        conn.execute('update modification_info set modifier_uuid_time = NULL')
+        for index in ['versions_name_time', 'modification_info_modifier', 'modification_info_name_modifier']:
+            conn.execute('drop index ' + index)
+        conn.commit()
+        conn.execute('PRAGMA user_version = 0')
+        conn.close()
+        self._storage = disk_handler.RepoObjectDiskStorage('tmp_disk_storage')
+        conn = self._storage._conn
+        self.assertEqual(conn.execute('PRAGMA user_version').fetchone()[0], 2)
+        self.assertEqual(conn.execute("select count(*) from versions where typeof(uuid_time) != 'integer'").fetchone()[0], 0)
+        self.assertEqual(conn.execute("select count(*) from modification_info where typeof(modifier_uuid_time) != 'integer'").fetchone()[0], 0)
+        plan = str(conn.execute("explain query plan select version from versions where name = 'obj' order by uuid_time DESC LIMIT 1").fetchall())
+        self.assertTrue('versions_name_time' in plan)
+        self.assertEqual(self._storage.get_latest_version('obj'), self._object_versions[-1])
+        obj = self._storage.get('obj', modifier_versions={
+                                'modifier_1': (self._modifier1_versions[0], self._modifier1_versions[1])})
+        self.assertEqual(len(obj), 4)
+
+    def test_cache(self):
+        '''Test the object cache in front of get
+        '''
+        self._storage.set_cache(2)
+        obj = self._storage.get('obj', versions=self._object_versions[0])[0]
+        obj['a'] = 5.0 # modifying the returned object must not modify the cached object
+        obj = self._storage.get('obj', versions=self._object_versions[0])[0]
+        self.assertEqual(obj['a'], 1.0)
+        self.assertEqual(self._storage.get_cache_statistics()['hits'], 1)
+        self.assertEqual(self._storage.get_cache_statistics()['misses'], 1)
+        # cached objects are not read from file
+        os.remove('tmp_disk_storage/TRAINING_DATA/obj/' + self._object_versions[0] + '.pck')
+        obj = self._storage.get('obj', versions=self._object_versions[0])[0]
+        self.assertEqual(obj['a'], 1.0)
+        # replace invalidates the cached object
+        obj = self._storage.get('obj', versions=RepoStore.LAST_VERSION)[0]
+        obj['a'] = 5.0
+        self._storage.replace(obj)
+        self.assertEqual(self._storage.get('obj', versions=RepoStore.LAST_VERSION)[0]['a'], 5.0)
+        # least recently used objects are removed
+        self._storage.get('modifier_1', versions=RepoStore.LAST_VERSION)
+        self.assertEqual(self._storage.get_cache_statistics()['size'], 2)
+        self._storage.get('obj', versions=self._object_versions[1])
+        self.assertEqual(self._storage.get_cache_statistics()['size'], 2)
+        self.assertRaises(Exception, self._storage.get, 'obj', versions=self._object_versions[0])
+        # the values of cached objects are read-only and returned without copying them
+        obj = TestClass(repo_info={repo_objects.RepoInfoKey.NAME.value: 'obj_cached', repo_objects.RepoInfoKey.CATEGORY: repo.MLObjectType.TRAINING_DATA})
+        obj.b = {'x': list(range(1000))}
+        self._storage.add(repo_objects.create_repo_obj_dict(obj))
+        obj_1 = self._storage.get('obj_cached', versions=RepoStore.LAST_VERSION)[0]
+        obj_2 = self._storage.get('obj_cached', versions=RepoStore.LAST_VERSION)[0]
+        self.assertIs(obj_1['b'], obj_2['b'])
+        self.assertEqual(obj_2['b']['x'], list(range(1000)))
+        with self.assertRaises(Exception):
+            obj_2['b']['x'].append(1000)
+        self.assertIsNot(obj_1['repo_info'], obj_2['repo_info'])
+        self._storage.set_cache(0)
+        self.assertIsNone(self._storage.get_cache_statistics())
+
+    def test_version_index(self):
+        '''Test resolution of first and last version placeholders via the version index
+        '''
+        obj = self._storage.get('obj', versions=RepoStore.LAST_VERSION)[0]
+        self.assertEqual(self._storage._version_index['obj'], (self._object_versions[0], self._object_versions[-1]))
+        obj['repo_info'][repo_objects.RepoInfoKey.VERSION.value] = None
+        version = self._storage.add(obj)
+        self.assertEqual(self._storage._version_index['obj'], (self._object_versions[0], version))
+        # changes from another process are detected
+        storage = disk_handler.RepoObjectDiskStorage('tmp_disk_storage')
+        obj['repo_info'][repo_objects.RepoInfoKey.VERSION.value] = None
+        version = storage.add(obj)
+        storage.close_connection()
+        self.assertEqual(self._storage.get('obj', versions=RepoStore.LAST_VERSION)[0]['repo_info']['version'], version)
+        # deletion of the latest version
+        self._storage._delete('obj', version)
+        self.assertEqual(self._storage.get('obj', versions=RepoStore.LAST_VERSION)[0]['repo_info']['version'],
+            self._storage._version_index['obj'][1])
+        self.assertNotEqual(self._storage._version_index['obj'][1], version)
+
+    def test_transaction(self):
+        '''Test that objects added within a transaction are written together when the transaction is left
+        '''
+        with self._storage.transaction():
+            versions = []
+            for i in range(3):
+                obj = TestClass(repo_info={repo_objects.RepoInfoKey.NAME.value: 'obj_transaction',
+                                           repo_objects.RepoInfoKey.CATEGORY: repo.MLObjectType.TRAINING_DATA})
+                versions.append(self._storage.add(repo_objects.create_repo_obj_dict(obj)))
+            # objects are already accessible but files are written when the transaction is committed
+            self.assertEqual(self._storage.get_latest_version('obj_transaction'), versions[-1])
+            self.assertEqual(self._storage.get('obj_transaction', versions=versions[0])[0]['a'], 1.0)
+            self.assertFalse(os.path.exists('tmp_disk_storage/TRAINING_DATA/obj_transaction/' + versions[0] + '.pck'))
+        for v in versions:
+            self.assertTrue(os.path.exists('tmp_disk_storage/TRAINING_DATA/obj_transaction/' + v + '.pck'))
+        self.assertEqual(len(self._storage.get('obj_transaction')), 3)
+        self.assertEqual(len(self._storage.check_integrity()), 0)
+
+    def test_transaction_rollback(self):
+        '''Test that no object is stored if an error occurs within a transaction
+        '''
+        try:
+            with self._storage.transaction():
+                obj = TestClass(repo_info={repo_objects.RepoInfoKey.NAME.value: 'obj_transaction',
+                                           repo_objects.RepoInfoKey.CATEGORY: repo.MLObjectType.TRAINING_DATA})
+                self._storage.add(repo_objects.create_repo_obj_dict(obj))
+                obj = self._storage.get('obj', versions=RepoStore.LAST_VERSION)[0]
+                obj['a'] = 5.0
+                self._storage.replace(obj)
+                raise Exception('error within transaction')
+        except Exception:
+            pass
+        self.assertEqual(len(self._storage.get('obj_transaction', throw_error_not_exist=False)), 0)
+        self.assertEqual(self._storage.get('obj', versions=RepoStore.LAST_VERSION)[0]['a'], 1.0)
+        self.assertEqual(len(self._storage.check_integrity()), 0)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,9 +1,10 @@
 import unittest
 import os
+from copy import deepcopy
 import numpy as np
 
 from pailab import RepoInfoKey, MLObjectType, repo_object_init, RepoInfoKey, DataSet, RawData, MLRepo  # pylint: disable=E0401
-from pailab.ml_repo.repo import NamingConventions
+from pailab.ml_repo.repo import NamingConventions, EvalJob, MeasureJob
 from pailab.ml_repo.repo_objects import RepoInfo
 import pailab.tools.tests as ml_tests
 import pailab.ml_repo.repo_objects as repo_objects
@@ -167,6 +168,16 @@ def preprocessor_transforming_function_test(preprocessor_param, data_x, x_coord_
     ''' 
     return data_x, x_coord_names
 
+def eval_func_rows_test(model, data):
+    '''Dummy model eval function for testing evaluation in chunks
+    
+        Function returns the rowwise sum of the x_data
+    Arguments:
+        model {} -- dummy model, not used
+        data {} -- the data
+    '''
+    return np.sum(data.x_data, axis=1, keepdims=True)
+
 def preprocessor_fitting_function_test(preprocessor_param, data_x, x_coord_names):
     return TestClass(4,5, repo_info = {}) # pylint: disable=E1123
 
@@ -288,6 +299,147 @@ class RepoTest(unittest.TestCase):
         obj = self.repository.get('training_data_1', version = repo_store.RepoStore.LAST_VERSION, full_object = True)
         self.assertEqual(obj.x_data.shape[0], 10)
     
+    def test_get_columns(self):
+        """Test if only the selected coordinates are loaded
+        """
+        x_data = np.arange(30, dtype=float).reshape([10, 3])
+        raw_data = repo_objects.RawData(x_data, ['x0', 'x1', 'x2'], -x_data[:, 0:2], ['y0', 'y1'], repo_info = {  # pylint: disable=E0602
+            repo_objects.RepoInfoKey.NAME.value: 'raw_columns'})
+        self.repository.add(raw_data, category=MLObjectType.RAW_DATA)
+        self.repository.add(DataSet('raw_columns', 2, 5, repo_info = {repo_objects.RepoInfoKey.NAME.value: 'test_data_columns',
+                                    repo_objects.RepoInfoKey.CATEGORY: MLObjectType.TEST_DATA}))
+        obj = self.repository.get('raw_columns', full_object = True, columns = ['x2', 'y1', 'x0'])
+        self.assertEqual(obj.x_coord_names, ['x2', 'x0'])
+        self.assertEqual(obj.y_coord_names, ['y1'])
+        self.assertTrue(np.array_equal(obj.x_data, x_data[:, [2, 0]]))
+        self.assertTrue(np.array_equal(obj.y_data, -x_data[:, [1]]))
+        obj = self.repository.get('test_data_columns', full_object = True, columns = ['x1'])
+        self.assertEqual(obj.x_coord_names, ['x1'])
+        self.assertEqual(obj.y_coord_names, [])
+        self.assertTrue(np.array_equal(obj.x_data, x_data[2:5, 1:2]))
+        self.assertIsNone(getattr(obj, 'y_data', None))
+        with self.assertRaises(Exception):
+            self.repository.get('raw_columns', full_object = True, columns = ['z'])
+
+    def test_get_lazy(self):
+        """Test if numpy data is loaded on first access if lazy is set
+        """
+        x_data = np.arange(30, dtype=float).reshape([10, 3])
+        raw_data = repo_objects.RawData(x_data, ['x0', 'x1', 'x2'], -x_data[:, 0:2], ['y0', 'y1'], repo_info = {  # pylint: disable=E0602
+            repo_objects.RepoInfoKey.NAME.value: 'raw_lazy'})
+        self.repository.add(raw_data, category=MLObjectType.RAW_DATA)
+        self.repository.add(DataSet('raw_lazy', 2, 5, repo_info = {repo_objects.RepoInfoKey.NAME.value: 'test_data_lazy',
+                                    repo_objects.RepoInfoKey.CATEGORY: MLObjectType.TEST_DATA}))
+        numpy_store = self.repository.get_numpy_data_store()
+        loaded = []
+        get = numpy_store.get
+        def logging_get(name, version, from_index=0, to_index=None, columns=None):
+            loaded.append((name, tuple(columns.keys()) if columns is not None else None))
+            return get(name, version, from_index, to_index, columns)
+        numpy_store.get = logging_get
+        obj = self.repository.get('raw_lazy', full_object = True, lazy = True)
+        self.assertEqual(loaded, [])
+        self.assertIsInstance(obj, repo_objects.RawData)
+        self.assertTrue(np.array_equal(obj.y_data, -x_data[:, 0:2]))
+        self.assertEqual(loaded, [('raw_lazy', ('y_data',))])
+        self.assertTrue(np.array_equal(obj.y_data, -x_data[:, 0:2]))
+        self.assertEqual(len(loaded), 1)
+        obj = self.repository.get('test_data_lazy', full_object = True, lazy = True, columns = ['x1'])
+        self.assertIsNone(obj.y_data)
+        self.assertTrue(np.array_equal(obj.x_data, x_data[2:5, 1:2]))
+        self.assertEqual(loaded[1:], [('raw_lazy', ('x_data',))])
+        obj = self.repository.get('raw_lazy', full_object = True, lazy = True)
+        obj_copy = deepcopy(obj)
+        self.assertIs(type(obj_copy), repo_objects.RawData)
+        self.assertTrue(np.array_equal(obj_copy.x_data, x_data))
+        self.assertNotIn('x_data', obj.to_dict())
+        numpy_store.get = get
+
+    def test_get_fields(self):
+        """Test if get_fields returns the object dictionaries and get still returns the objects
+        """
+        obj = self.repository.get_fields('raw_1', repo_info_fields = [RepoInfoKey.VERSION])
+        self.assertIsInstance(obj, dict)
+        self.assertEqual(obj['repo_info'][RepoInfoKey.VERSION.value], self.repository.get('raw_1').repo_info.version)
+        obj = self.repository.get_fields('raw_1', obj_fields = ['x_coord_names'])
+        self.assertEqual(obj['x_coord_names'], ['x0'])
+        obj = self.repository.get('raw_1', obj_fields = ['x_coord_names'])
+        self.assertIsInstance(obj, repo_objects.RawData)
+
+    def test_append_raw_data_rollback(self):
+        """Test if the appended numpy data is deleted if appending to a RawData object fails
+        """
+        from unittest import mock
+        from pailab.tools.tools import RawDataItem
+        numpy_versions = list(self.repository._numpy_repo._store['raw_1'].keys())
+        with mock.patch.object(self.repository, 'get_training_data', side_effect=Exception('failed')):
+            with self.assertRaises(Exception):
+                RawDataItem('raw_1', self.repository).append(np.ones([5,1]), np.ones([5,1]))
+        self.assertEqual(list(self.repository._numpy_repo._store['raw_1'].keys()), numpy_versions)
+
+    def test_numpy_cache(self):
+        """Test if the numpy data is loaded once if the numpy cache is enabled
+        """
+        x_data = np.arange(30, dtype=float).reshape([10, 3])
+        raw_data = repo_objects.RawData(x_data, ['x0', 'x1', 'x2'], -x_data[:, 0:2], ['y0', 'y1'], repo_info = {  # pylint: disable=E0602
+            repo_objects.RepoInfoKey.NAME.value: 'raw_cached'})
+        self.repository.add(raw_data, category=MLObjectType.RAW_DATA)
+        self.repository.add(DataSet('raw_cached', 2, 5, repo_info = {repo_objects.RepoInfoKey.NAME.value: 'test_data_cached',
+                                    repo_objects.RepoInfoKey.CATEGORY: MLObjectType.TEST_DATA}))
+        self.repository._set_numpy_cache(10)
+        numpy_store = self.repository.get_numpy_data_store()
+        loaded = []
+        get = numpy_store.get
+        def logging_get(name, version, from_index=0, to_index=None, columns=None):
+            loaded.append(name)
+            return get(name, version, from_index, to_index, columns)
+        numpy_store.get = logging_get
+        # only the requested rows and columns are loaded and cached
+        for i in range(2):
+            obj = self.repository.get('test_data_cached', full_object = True, columns = ['x1', 'y0'])
+            self.assertTrue(np.array_equal(obj.x_data, x_data[2:5, 1:2]))
+            self.assertTrue(np.array_equal(obj.y_data, -x_data[2:5, 0:1]))
+        self.assertEqual(loaded, ['raw_cached'])
+        # the complete data is used for all requests
+        obj = self.repository.get('raw_cached', full_object = True)
+        self.assertTrue(np.array_equal(obj.x_data, x_data))
+        obj = self.repository.get('test_data_cached', full_object = True, columns = ['x2'])
+        self.assertTrue(np.array_equal(obj.x_data, x_data[2:5, 2:3]))
+        self.assertEqual(loaded, ['raw_cached', 'raw_cached'])
+        # the cached arrays are shared and therefore read-only
+        self.assertFalse(obj.x_data.flags.writeable)
+        self.assertEqual(self.repository._numpy_cache.get_statistics()['bytes'], x_data.nbytes + raw_data.y_data.nbytes)
+        # data exceeding the maximal number of bytes is not cached
+        self.repository._set_numpy_cache(10, 100)
+        for i in range(2):
+            self.repository.get('raw_cached', full_object = True)
+        self.assertEqual(loaded, ['raw_cached'] * 4)
+        numpy_store.get = get
+        self.repository._set_numpy_cache(0)
+
+    def test_iter_batches(self):
+        """Test iterating over the data in blocks of rows
+        """
+        x_data = np.arange(30, dtype=float).reshape([10, 3])
+        raw_data = repo_objects.RawData(x_data, ['x0', 'x1', 'x2'], -x_data[:, 0:2], ['y0', 'y1'], repo_info = {  # pylint: disable=E0602
+            repo_objects.RepoInfoKey.NAME.value: 'raw_batches'})
+        self.repository.add(raw_data, category=MLObjectType.RAW_DATA)
+        self.repository.add(DataSet('raw_batches', 2, 9, repo_info = {repo_objects.RepoInfoKey.NAME.value: 'test_data_batches',
+                                    repo_objects.RepoInfoKey.CATEGORY: MLObjectType.TEST_DATA}))
+        batches = list(self.repository.iter_batches('raw_batches', batch_size = 4))
+        self.assertEqual([x.shape[0] for x, _ in batches], [4, 4, 2])
+        self.assertTrue(np.array_equal(np.concatenate([x for x, _ in batches]), x_data))
+        self.assertTrue(np.array_equal(np.concatenate([y for _, y in batches]), -x_data[:, 0:2]))
+        batches = list(self.repository.iter_batches('test_data_batches', batch_size = 3, columns = ['x1', 'y0']))
+        self.assertEqual(len(batches), 3)
+        self.assertTrue(np.array_equal(np.concatenate([x for x, _ in batches]), x_data[2:9, 1:2]))
+        self.assertTrue(np.array_equal(np.concatenate([y for _, y in batches]), -x_data[2:9, 0:1]))
+        batches = list(self.repository.iter_batches('test_data_batches', columns = ['x1']))
+        self.assertEqual(len(batches), 1)
+        self.assertIsNone(batches[0][1])
+        with self.assertRaises(Exception):
+            next(self.repository.iter_batches('raw_batches', batch_size = 0))
+
     def test_repo_RawData(self):
         """Test RawData within repo
         """
@@ -342,6 +494,94 @@ class RepoTest(unittest.TestCase):
         self.repository.run_evaluation() # run first the evaluation so that there is at least one evaluation
         self.repository.run_measures()
     
+    def test_run_measures_grouped(self):
+        '''Test if all measures of a model on a dataset are computed by one job
+        '''
+        self.repository._job_runner = SimpleJobRunner(self.repository, throw_job_error = True)
+        x_data = np.arange(20, dtype=float).reshape([10, 2])
+        raw_data = repo_objects.RawData(x_data, ['x0', 'x1'], np.zeros([10,1]), ['y0'], repo_info = {repo_objects.RepoInfoKey.NAME.value: 'raw_measures'})
+        self.repository.add(raw_data, category=MLObjectType.RAW_DATA)
+        self.repository.add(DataSet('raw_measures', 0, None, repo_info = {repo_objects.RepoInfoKey.NAME.value: 'test_data_measures',  
+                                    repo_objects.RepoInfoKey.CATEGORY: MLObjectType.TEST_DATA}))
+        self.repository.add_eval_function(eval_func_rows_test, 'eval_func')
+        datasets = {'test_data_measures': repo_store.RepoStore.LAST_VERSION}
+        self.repository.run_evaluation('model/model', datasets = datasets)
+        job_ids = self.repository.run_measures('model/model', datasets = datasets)
+        self.assertEqual(len(job_ids), 1)
+        eval_data_name = str(NamingConventions.EvalData(data = 'test_data_measures', model = 'model'))
+        eval_data = self.repository.get(eval_data_name)
+        for measure in [repo_objects.MeasureConfiguration.MAX, (repo_objects.MeasureConfiguration.MAX, ['y0'])]:
+            measure_name = str(NamingConventions.Measure(eval_data_name, measure_type = repo_objects.MeasureConfiguration.get_name(measure)))
+            result = self.repository.get(measure_name)
+            self.assertEqual(result.value, 37.0)
+            self.assertEqual(result.repo_info.modification_info[eval_data_name], eval_data.repo_info.version)
+            self.assertEqual(result.repo_info.modification_info['test_data_measures'], 
+                            self.repository.get('test_data_measures').repo_info.version)
+        # the measures have already been computed for the model and data versions
+        self.assertEqual(self.repository.run_measures('model/model', datasets = datasets), [])
+
+    def test_run_measures_existing_measure_jobs(self):
+        '''Test if measures computed by the former per measure jobs are not computed again
+        '''
+        self.repository._job_runner = SimpleJobRunner(self.repository, throw_job_error = True)
+        x_data = np.arange(20, dtype=float).reshape([10, 2])
+        raw_data = repo_objects.RawData(x_data, ['x0', 'x1'], np.zeros([10,1]), ['y0'], repo_info = {repo_objects.RepoInfoKey.NAME.value: 'raw_measures'})
+        self.repository.add(raw_data, category=MLObjectType.RAW_DATA)
+        self.repository.add(DataSet('raw_measures', 0, None, repo_info = {repo_objects.RepoInfoKey.NAME.value: 'test_data_measures',  
+                                    repo_objects.RepoInfoKey.CATEGORY: MLObjectType.TEST_DATA}))
+        self.repository.add_eval_function(eval_func_rows_test, 'eval_func')
+        datasets = {'test_data_measures': repo_store.RepoStore.LAST_VERSION}
+        self.repository.run_evaluation('model/model', datasets = datasets)
+        for m_name, m in self.repository.get('measure_config').measures.items():
+            measure_job = MeasureJob(m_name, m[0], m[1], 'test_data_measures', 'model/model', 
+                repo_info = {RepoInfoKey.NAME: 'model/model/jobs/measure/test_data_measures/' + m_name,
+                    RepoInfoKey.CATEGORY: MLObjectType.JOB.value})
+            self.repository.add(measure_job)
+            self.repository._job_runner.add(measure_job.repo_info[RepoInfoKey.NAME], measure_job.repo_info[RepoInfoKey.VERSION], 'test_user')
+        self.assertEqual(len(self.repository.get_names(MLObjectType.MEASURE)), 2)
+        # the jobs are now named by model and dataset only but the measures are found by their modification info
+        self.assertEqual(self.repository.run_measures('model/model', datasets = datasets), [])
+
+    def test_run_eval_chunked(self):
+        '''Test running an evaluation in chunks
+        '''
+        self.repository._job_runner = SimpleJobRunner(self.repository, throw_job_error = True)
+        x_data = np.arange(20, dtype=float).reshape([10, 2])
+        raw_data = repo_objects.RawData(x_data, ['x0', 'x1'], np.zeros([10,1]), ['y0'], repo_info = {repo_objects.RepoInfoKey.NAME.value: 'raw_chunks'})
+        self.repository.add(raw_data, category=MLObjectType.RAW_DATA)
+        self.repository.add(DataSet('raw_chunks', 1, None, repo_info = {repo_objects.RepoInfoKey.NAME.value: 'test_data_chunks',  
+                                    repo_objects.RepoInfoKey.CATEGORY: MLObjectType.TEST_DATA}))
+        self.repository.add_eval_function(eval_func_rows_test, 'eval_func')
+        eval_data_name = str(NamingConventions.EvalData(data = 'test_data_chunks', model = 'model'))
+        job = EvalJob('model/model', 'test_data_chunks', 'unittestuser', chunk_size = 4, 
+                    repo_info = {RepoInfoKey.NAME: 'model/model/jobs/eval_job/test_data_chunks', RepoInfoKey.CATEGORY: MLObjectType.JOB.value})
+        self.repository.run(job)
+        eval_data = self.repository.get(eval_data_name, full_object = True)
+        self.assertEqual(eval_data.n_data, 9)
+        self.assertEqual(eval_data.x_coord_names, ['y0'])
+        self.assertTrue(np.array_equal(eval_data.x_data, np.sum(x_data[1:], axis=1, keepdims=True)))
+        self.assertEqual(eval_data.repo_info.modification_info['test_data_chunks'], 
+                        self.repository.get('test_data_chunks').repo_info.version)
+        self.assertTrue(np.array_equal(self.repository.get(eval_data_name, full_object = True, columns = ['y0']).x_data[:, 0], 
+                        np.sum(x_data[1:], axis=1)))
+        # the blocks are stored as numpy data of the version of the evaluation only
+        self.assertEqual(list(self.repository._numpy_repo._store[eval_data_name].keys()), [eval_data.repo_info.version])
+        # chunk size from the repo's configuration
+        self.repository.get_config()['eval_chunk_size'] = 2
+        self.repository.add_eval_function(eval_func_rows_test, 'eval_func')
+        self.repository.run_evaluation(datasets = {'test_data_chunks': repo_store.RepoStore.LAST_VERSION})
+        eval_data = self.repository.get(eval_data_name, full_object = True)
+        self.assertEqual(len(self.repository.get_history(eval_data_name)), 2)
+        self.assertTrue(np.array_equal(eval_data.x_data, np.sum(x_data[1:], axis=1, keepdims=True)))
+        versions = [x['repo_info']['version'] for x in self.repository.get_history(eval_data_name)]
+        self.assertEqual(sorted(self.repository._numpy_repo._store[eval_data_name].keys()), sorted(versions))
+        for version in versions:
+            # the jobs creating the evaluation depend on it
+            for job_name, job_version in self.repository._ml_repo._get_by_modification_info(eval_data_name, version, [MLObjectType.JOB.value], load_objects=False):
+                self.repository.delete(job_name, job_version)
+            self.repository.delete(eval_data_name, version)
+        self.assertFalse(eval_data_name in self.repository._numpy_repo._store.keys())
+
     def test_repo_training_test_data(self):
         # init repository with sample in memory handler
         repository = MLRepo(user = 'unittestuser')
@@ -454,7 +694,8 @@ class MLRepoConstructorTest(unittest.TestCase):
               'config': {
                   'folder': 'tmp/objects', 
                   'file_format': 'json'
-              }
+              },
+              'cache_size': 100
           },
           'numpy_store':
           {
@@ -485,6 +726,65 @@ class MLRepoConstructorTest(unittest.TestCase):
         # end instantiate with workspace
 
 
+class RepoObjectMemoryStorageTest(unittest.TestCase):
+    def _create(self, name, modification_info={}):
+        obj = TestClass(1, 2, repo_info={RepoInfoKey.NAME: name, RepoInfoKey.CATEGORY: MLObjectType.MODEL.value,
+                                         RepoInfoKey.MODIFICATION_INFO: modification_info})
+        obj_dict = repo_objects.create_repo_obj_dict(obj)
+        obj_dict['repo_info'][RepoInfoKey.VERSION.value] = repo_store._version_str()
+        return obj_dict
+
+    def test_version_order_and_modifiers(self):
+        storage = memory_handler.RepoObjectMemoryStorage()
+        modifier_versions = [storage.add(self._create('modifier')) for i in range(3)]
+        objs = [self._create('obj', {'modifier': modifier_versions[i % 3]}) for i in range(6)]
+        versions = [obj['repo_info'][RepoInfoKey.VERSION.value] for obj in objs]
+        # add in reverse order, the versions must be ordered by time
+        for obj in reversed(objs):
+            storage.add(obj)
+        self.assertEqual(storage.get_first_version('obj'), versions[0])
+        self.assertEqual(storage.get_latest_version('obj'), versions[-1])
+        self.assertEqual(storage.get_version('obj', 2), versions[2])
+        result = storage.get('obj', versions=(versions[1], versions[3]))
+        self.assertEqual([x['repo_info']['version'] for x in result], versions[1:4])
+        result = storage.get('obj', versions=[versions[4], versions[0]])
+        self.assertEqual([x['repo_info']['version'] for x in result], [versions[0], versions[4]])
+        result = storage.get('obj', modifier_versions={'modifier': [modifier_versions[0], modifier_versions[2]]})
+        self.assertEqual([x['repo_info']['version'] for x in result], [versions[0], versions[2], versions[3], versions[5]])
+        result = storage.get('obj', versions=(versions[1], versions[4]), modifier_versions={'modifier': modifier_versions[1]})
+        self.assertEqual([x['repo_info']['version'] for x in result], [versions[1], versions[4]])
+        storage._delete('obj', versions[1])
+        result = storage.get('obj', modifier_versions={'modifier': modifier_versions[1]})
+        self.assertEqual([x['repo_info']['version'] for x in result], [versions[4]])
+        self.assertEqual(storage.get_version('obj', 1), versions[2])
+
+    def test_frozen_objects(self):
+        storage = memory_handler.RepoObjectMemoryStorage(frozen_objects=True)
+        obj_dict = self._create('obj')
+        obj_dict['param'] = {'values': [1, 2], 'mat': np.zeros([2])}
+        version = storage.add(obj_dict)
+        # changes of the added dictionary do not change the stored object
+        obj_dict['param']['values'].append(3)
+        result = storage.get('obj', versions=version)[0]
+        self.assertEqual(result['param']['values'], [1, 2])
+        # reads share the stored values which cannot be modified
+        self.assertTrue(result['param'] is storage.get('obj', versions=version)[0]['param'])
+        self.assertRaises(Exception, result['param']['values'].append, 3)
+        with self.assertRaises(Exception):
+            result['param']['a'] = 1.0
+        with self.assertRaises(ValueError):
+            result['param']['mat'][0] = 1.0
+        # the repo_info and deep copies are private copies
+        result['repo_info']['version'] = 'other'
+        self.assertEqual(storage.get('obj', versions=version)[0]['repo_info']['version'], version)
+        param = deepcopy(result['param'])
+        param['values'].append(3)
+        param['mat'][0] = 1.0
+        self.assertEqual(type(param), dict)
+        obj = repo_objects.create_repo_obj(storage.get('obj', versions=version)[0])
+        self.assertEqual(obj.a, 1)
+
+
 class NumpyMemoryHandlerTest(unittest.TestCase):
     def test_append(self):
         numpy_store = memory_handler.NumpyMemoryStorage()
@@ -502,6 +802,28 @@ class NumpyMemoryHandlerTest(unittest.TestCase):
         self.assertEqual(numpy_dict_3['b'][5],5.0)
         self.assertEqual(numpy_dict_3['b'][0],0.0)
 
+    def test_append_chain(self):
+        numpy_store = memory_handler.NumpyMemoryStorage()
+        data = np.arange(40, dtype=float).reshape([20, 2])
+        numpy_store.add('test_data', 'v0', {'a': data[0:3]})
+        for i in range(1, 9):
+            numpy_store.append('test_data', 'v' + str(i-1), 'v' + str(i), {'a': data[3+(i-1)*2:3+i*2]})
+        # append to an older version
+        numpy_store.append('test_data', 'v4', 'w5', {'a': -data[0:1]})
+        for from_index, to_index in [(0, 5), (4, None), (4, 6), (5, 12), (3, 3), (-4, None), (-6, -2), (0, None), (5, 12)]:
+            result = numpy_store.get('test_data', 'v8', from_index, to_index)['a']
+            self.assertTrue(np.array_equal(result, data[0:19][from_index:to_index]))
+            result = numpy_store.get('test_data', 'v4', from_index, to_index)['a']
+            self.assertTrue(np.array_equal(result, data[0:11][from_index:to_index]))
+        self.assertTrue(np.array_equal(numpy_store.get('test_data', 'w5')['a'], np.concatenate((data[0:11], -data[0:1]))))
+        numpy_store._delete('test_data', 'v4')
+        self.assertTrue(np.array_equal(numpy_store.get('test_data', 'v8', 10, 13)['a'], data[10:13]))
+        for columns in [[1], [1, 0], []]:
+            self.assertTrue(np.array_equal(numpy_store.get('test_data', 'v8', 2, 7, columns={'a': columns})['a'], data[2:7, columns]))
+        # contiguous columns of rows within one chunk are returned as view
+        result = numpy_store.get('test_data', 'v8', columns={'a': [1]})['a']
+        self.assertTrue(np.shares_memory(result, numpy_store.get('test_data', 'v8')['a']))
+
 # define model
 class SuperML:
     @repo_object_init()
@@ -693,6 +1015,305 @@ class NumpyHDFStorageTest(unittest.TestCase):
         self.assertEqual(test_data_get['test_data'].shape, test_data.shape)
         self.assertEqual(test_data[0,0,0], test_data_get['test_data'][0,0,0])
 
+    def test_get_rows(self):
+        """test reading row ranges of added and appended data (in one file and in different files)
+        """
+        data = np.arange(24, dtype=float).reshape([12, 2])
+        for version_files in [False, True]:
+            store = NumpyHDFStorage('test_numpy_hdf5/' + str(version_files), version_files)
+            store.add('test', '1', {'x': data[0:5], 'y': data[0:5, 0]})
+            store.append('test', '1', '2', {'x': data[5:8], 'y': data[5:8, 0]})
+            store.append('test', '2', '3', {'x': data[8:12], 'y': data[8:12, 0]})
+            for version, n_rows in [('1', 5), ('2', 8), ('3', 12)]:
+                for from_index, to_index in [(0, None), (2, None), (1, 4), (4, 6), (3, 3), (0, 20), (-3, None), (-5, -1)]:
+                    result = store.get('test', version, from_index, to_index)
+                    self.assertTrue(np.array_equal(result['x'], data[0:n_rows][from_index:to_index]))
+                    self.assertTrue(np.array_equal(result['y'], data[0:n_rows, 0][from_index:to_index]))
+                for columns in [[1], [0, 1], [1, 0], [1, 1], []]:
+                    result = store.get('test', version, 1, 4, columns={'x': columns})
+                    self.assertEqual(list(result.keys()), ['x'])
+                    self.assertTrue(np.array_equal(result['x'], data[1:4, columns]))
+
+
+    def test_compression(self):
+        """test the compression and chunk settings of the datasets
+        """
+        import h5py
+        data = np.arange(24, dtype=float).reshape([12, 2])
+        for version_files in [False, True]:
+            folder = 'test_numpy_hdf5/' + str(version_files)
+            store = NumpyHDFStorage(folder, version_files, compression='gzip', compression_level=4, shuffle=True, chunks=4,
+                                    object_config={'other': {'compression': 'lzf', 'chunks': None}})
+            for name in ['test', 'other']:
+                store.add(name, '1', {'x': data[0:5]})
+                store.append(name, '1', '2', {'x': data[5:12]})
+                self.assertTrue(np.array_equal(store.get(name, '2')['x'], data))
+            with h5py.File(folder + '/' + store._create_file_name('test', '1'), 'r') as f:
+                dataset = f['/data/1/x']
+                self.assertEqual(dataset.compression, 'gzip')
+                self.assertEqual(dataset.compression_opts, 4)
+                self.assertTrue(dataset.shuffle)
+                self.assertEqual(dataset.chunks, (4, 2))
+            with h5py.File(folder + '/' + store._create_file_name('other', '1'), 'r') as f:
+                self.assertEqual(f['/data/1/x'].compression, 'lzf')
+                self.assertTrue(f['/data/1/x'].shuffle)
+        with self.assertRaises(Exception):
+            NumpyHDFStorage('test_numpy_hdf5', compression='zip')
+
+
+    def test_open_files_other_process(self):
+        """test writing a file in another process while it is kept open in the pool of open files
+        """
+        import subprocess
+        import sys
+        data = np.arange(24, dtype=float).reshape([12, 2])
+        store = NumpyHDFStorage('test_numpy_hdf5', max_open_files=2)
+        store.add('test', '0', {'x': data[0:5]})
+        self.assertTrue(np.array_equal(store.get('test', '0')['x'], data[0:5]))
+        code = ("import numpy as np\n"
+                "from pailab.ml_repo.numpy_handler_hdf import NumpyHDFStorage\n"
+                "NumpyHDFStorage('test_numpy_hdf5').append('test', '0', '1', {'x': np.arange(24, dtype=float).reshape([12, 2])[5:12]})\n")
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(repo_store.__file__))))
+        result = subprocess.run([sys.executable, '-c', code], env=env, stderr=subprocess.PIPE)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        store.close()
+        self.assertTrue(np.array_equal(store.get('test', '1')['x'], data))
+        store.close()
+
+    def test_open_files(self):
+        """test reading with the pool of open files
+        """
+        data = np.arange(24, dtype=float).reshape([12, 2])
+        for version_files in [False, True]:
+            store = NumpyHDFStorage('test_numpy_hdf5/' + str(version_files), version_files, max_open_files=2)
+            for name in ['a', 'b', 'c']:
+                store.add(name, '1', {'x': data[0:5]})
+                self.assertTrue(np.array_equal(store.get(name, '1')['x'], data[0:5]))
+                self.assertTrue(store.object_exists(name, '1'))
+            self.assertEqual(len(store._open_files), 2)
+            # writing a file which is open for reading
+            store.get('c', '1')
+            store.append('c', '1', '2', {'x': data[5:12]})
+            self.assertTrue(np.array_equal(store.get('c', '2')['x'], data))
+            self.assertTrue(np.array_equal(store.get('c', '1')['x'], data[0:5]))
+            self.assertLessEqual(len(store._open_files), 2)
+            store.close()
+            self.assertEqual(len(store._open_files), 0)
+            self.assertTrue(np.array_equal(store.get('c', '2', 3, 6)['x'], data[3:6]))
+            store.close()
+
+
+    def test_compact(self):
+        """test compaction of chains of appended versions in different files
+        """
+        data = np.arange(24, dtype=float).reshape([12, 2])
+        store = NumpyHDFStorage('test_numpy_hdf5', True)
+        store.add('sub/test', '0', {'x': data[0:2]})
+        for i in range(1, 6):
+            store.append('sub/test', str(i-1), str(i), {'x': data[2*i:2*i+2]})
+        self.assertEqual(store.get_chain_depths(), {'sub/test': {str(i): i for i in range(6)}})
+        store.compact('sub/test', '4')
+        self.assertEqual(store.get_chain_depth('sub/test', '4'), 0)
+        self.assertEqual(store.get_chain_depth('sub/test', '5'), 1)
+        for i in range(6):
+            self.assertTrue(np.array_equal(store.get('sub/test', str(i))['x'], data[0:2*i+2]))
+        # automatic compaction
+        store = NumpyHDFStorage('test_numpy_hdf5', True, max_chain_depth=2)
+        store.add('test', '0', {'x': data[0:2]})
+        for i in range(1, 6):
+            store.append('test', str(i-1), str(i), {'x': data[2*i:2*i+2]})
+            self.assertLessEqual(store.get_chain_depth('test', str(i)), 2)
+        for i in range(6):
+            self.assertTrue(np.array_equal(store.get('test', str(i))['x'], data[0:2*i+2]))
+
+
+    def test_delete(self):
+        """test deleting versions which share data with appended versions
+        """
+        data = np.arange(24, dtype=float).reshape([12, 2])
+        for version_files in [False, True]:
+            folder = 'test_numpy_hdf5/' + str(version_files)
+            store = NumpyHDFStorage(folder, version_files)
+            store.add('test', '0', {'x': data[0:2], 'y': data[0:2, 0]})
+            for i in range(1, 5):
+                store.append('test', str(i-1), str(i), {'x': data[2*i:2*i+2], 'y': data[2*i:2*i+2, 0]})
+            # delete the first version (owning the data), a version in between and the last version
+            for deleted in ['0', '2', '4']:
+                store._delete('test', deleted)
+                self.assertFalse(store.object_exists('test', deleted))
+                for i in [i for i in range(5) if store.object_exists('test', str(i))]:
+                    result = store.get('test', str(i))
+                    self.assertTrue(np.array_equal(result['x'], data[0:2*i+2]))
+                    self.assertTrue(np.array_equal(result['y'], data[0:2*i+2, 0]))
+            self.assertEqual(sorted(os.listdir(folder)), ['test.hdf5'] if not version_files else ['test_1.hdf5', 'test_3.hdf5'])
+            store.append('test', '3', '5', {'x': data[8:10], 'y': data[8:10, 0]})
+            self.assertTrue(np.array_equal(store.get('test', '5')['x'], data[0:10]))
+            store._delete('test', '1')
+            store._delete('test', '3')
+            store._delete('test', '5')
+            self.assertEqual(os.listdir(folder), [])
+            # deleting data which does not exist is ignored
+            store._delete('test', '1')
+
+    def test_add_chunked(self):
+        """test adding data in blocks
+        """
+        data = np.arange(24, dtype=float).reshape([12, 2])
+        for version_files in [False, True]:
+            folder = 'test_numpy_hdf5/' + str(version_files)
+            store = NumpyHDFStorage(folder, version_files, chunks=2)
+            store.add_chunked('test', '0', ({'x': data[i:i+5], 'y': data[i:i+5, 0], 'z': None} for i in range(0, 12, 5)))
+            result = store.get('test', '0')
+            self.assertTrue(np.array_equal(result['x'], data))
+            self.assertTrue(np.array_equal(result['y'], data[:, 0]))
+            self.assertFalse('z' in result.keys())
+            self.assertTrue(np.array_equal(store.get('test', '0', 3, 7, columns={'x': [1]})['x'], data[3:7, [1]]))
+            store.append('test', '0', '1', {'x': data[0:2], 'y': data[0:2, 0]})
+            self.assertEqual(store.get('test', '1')['x'].shape, (14, 2))
+            self.assertEqual(sorted(os.listdir(folder)), ['test.hdf5'] if not version_files else ['test_0.hdf5', 'test_1.hdf5', 'test_append_1.hdf5'])
+            store._delete('test', '1')
+            store._delete('test', '0')
+            self.assertEqual(os.listdir(folder), [])
+
+    def test_delete_dependents(self):
+        """test that deleting a version file only opens the files of the versions referring to it
+        """
+        import h5py
+        from unittest import mock
+        data = np.arange(24, dtype=float).reshape([12, 2])
+        store = NumpyHDFStorage('test_numpy_hdf5', True)
+        for i in range(5):
+            store.add('test', 'other' + str(i), {'x': data})
+        store.add('test', '0', {'x': data[0:2]})
+        store.append('test', '0', '1', {'x': data[2:4]})
+        self.assertEqual(store._get_dependents('test', '0'), ['1'])
+        self.assertEqual(store._get_dependents('test', '1'), [])
+        opened = []
+        class LoggingFile(h5py.File):
+            def __init__(self, name, *args, **kwargs):
+                opened.append(os.path.basename(str(name)))
+                super(LoggingFile, self).__init__(name, *args, **kwargs)
+        with mock.patch.object(h5py, 'File', LoggingFile):
+            store._delete('test', '0')
+        self.assertFalse([x for x in opened if 'other' in x])
+        self.assertEqual(store.get_chain_depth('test', '1'), 0)
+        self.assertTrue(np.array_equal(store.get('test', '1')['x'], data[0:4]))
+
+    def test_repack(self):
+        """test reclaiming the space of deleted versions
+        """
+        store = NumpyHDFStorage('test_numpy_hdf5')
+        store.add('test', '0', {'x': np.zeros([1000, 10])})
+        store.append('test', '0', '1', {'x': np.ones([1000, 10])})
+        store.add('test', '2', {'x': np.ones([1000, 10])})
+        size = os.path.getsize('test_numpy_hdf5/test.hdf5')
+        store._delete('test', '1')
+        store._delete('test', '2')
+        self.assertGreater(store.repack(), 0)
+        self.assertLess(os.path.getsize('test_numpy_hdf5/test.hdf5'), size)
+        self.assertTrue(np.array_equal(store.get('test', '0')['x'], np.zeros([1000, 10])))
+        store.append('test', '0', '3', {'x': np.ones([2, 10])})
+        self.assertEqual(store.get('test', '3', 999)['x'].shape, (3, 10))
+
+
+from pailab.ml_repo.numpy_handler_npy import NumpyNpyStorage
+class NumpyNpyStorageTest(unittest.TestCase):
+    def setUp(self):
+        shutil.rmtree('test_numpy_npy', ignore_errors=True)
+        self.store = NumpyNpyStorage('test_numpy_npy')
+
+    def tearDown(self):
+        shutil.rmtree('test_numpy_npy', ignore_errors=True)
+
+    def test_add_append(self):
+        data = np.arange(24, dtype=float).reshape([12, 2])
+        self.store.add('sub/test', '1', {'x': data[0:5], 'y': data[0:5, 0], 'z': None})
+        self.store.append('sub/test', '1', '2', {'x': data[5:8], 'y': data[5:8, 0]})
+        self.store.append('sub/test', '2', '3', {'x': data[8:12], 'y': data[8:12, 0]})
+        self.assertTrue(self.store.object_exists('sub/test', '3'))
+        self.assertIsNone(self.store.get('sub/test', '1')['z'])
+        for version, n_rows in [('1', 5), ('2', 8), ('3', 12)]:
+            for from_index, to_index in [(0, None), (2, None), (1, 4), (4, 6), (3, 3), (-3, None), (-5, -1)]:
+                result = self.store.get('sub/test', version, from_index, to_index)
+                self.assertTrue(np.array_equal(result['x'], data[0:n_rows][from_index:to_index]))
+                self.assertTrue(np.array_equal(result['y'], data[0:n_rows, 0][from_index:to_index]))
+            for columns in [[1], [1, 0], []]:
+                result = self.store.get('sub/test', version, 1, 7, columns={'x': columns})
+                self.assertEqual(list(result.keys()), ['x'])
+                self.assertTrue(np.array_equal(result['x'], data[0:n_rows][1:7, columns]))
+        # rows within one segment are memory mapped and read-only
+        result = self.store.get('sub/test', '3', 5, 8)['x']
+        self.assertIsInstance(result.base, np.memmap)
+        with self.assertRaises(ValueError):
+            result[0, 0] = 1.0
+
+    def test_delete(self):
+        data = np.arange(24, dtype=float).reshape([12, 2])
+        self.store.add('test', '1', {'x': data[0:5]})
+        self.store.append('test', '1', '2', {'x': data[5:8]})
+        self.store._delete('test', '1')
+        self.assertFalse(self.store.object_exists('test', '1'))
+        self.assertTrue(np.array_equal(self.store.get('test', '2')['x'], data[0:8]))
+        self.store._delete('test', '2')
+        self.assertFalse(os.path.exists('test_numpy_npy/test'))
+
+    def test_max_segments(self):
+        store = NumpyNpyStorage('test_numpy_npy', max_open_segments=2, max_segments=3)
+        data = np.arange(200, dtype=float).reshape([100, 2])
+        store.add('test', '0', {'x': data[0:1]})
+        for i in range(1, 100):
+            store.append('test', str(i-1), str(i), {'x': data[i:i+1]})
+            self.assertLessEqual(len(store._get_manifest('test', str(i))['x']['segments']), 3)
+        for i in range(100):
+            self.assertTrue(np.array_equal(store.get('test', str(i))['x'], data[0:i+1]))
+            self.assertTrue(np.array_equal(store.get('test', str(i), i // 2, i // 2 + 3)['x'], data[0:i+1][i // 2:i // 2 + 3]))
+            self.assertLessEqual(len(store._segments), 2)
+        for i in range(100):
+            store._delete('test', str(i))
+        self.assertFalse(os.path.exists('test_numpy_npy/test'))
+
+    def test_manifest_changed(self):
+        """Test if manifests changed or deleted by another store (e.g. in another process) are read again
+        """
+        data = np.arange(24, dtype=float).reshape([12, 2])
+        self.store.add('test', '1', {'x': data[0:5]})
+        self.store.append('test', '1', '2', {'x': data[5:8]})
+        self.assertEqual(self.store.get('test', '1')['x'].shape, (5, 2))
+        other = NumpyNpyStorage('test_numpy_npy')
+        other._write_manifest('test', '1', other._get_manifest('test', '2'))
+        self.assertTrue(np.array_equal(self.store.get('test', '1')['x'], data[0:8]))
+        other._delete('test', '1')
+        with self.assertRaises(Exception):
+            self.store.get('test', '1')
+        self.assertTrue(np.array_equal(self.store.get('test', '2')['x'], data[0:8]))
+
+    def test_add_chunked(self):
+        data = np.arange(24, dtype=float).reshape([12, 2])
+        self.store.add_chunked('test', '1', ({'x': data[i:i+5], 'y': data[i:i+5, 0].astype(int), 'z': None} for i in range(0, 12, 5)))
+        # one segment per array
+        self.assertEqual(sorted(os.listdir('test_numpy_npy/test')), ['1.json', '1_x.npy', '1_y.npy'])
+        result = self.store.get('test', '1')
+        self.assertTrue(np.array_equal(result['x'], data))
+        self.assertTrue(np.array_equal(result['y'], data[:, 0]))
+        self.assertIsNone(result['z'])
+        self.assertTrue(np.array_equal(np.load('test_numpy_npy/test/1_x.npy'), data))
+        with self.assertRaises(Exception):
+            self.store.add_chunked('test', '2', [{'x': data[0:2]}, {'x': data[0:2, 0]}])
+        self.assertFalse(os.path.exists('test_numpy_npy/test/2_x.npy'))
+        self.store._delete('test', '1')
+        self.assertFalse(os.path.exists('test_numpy_npy/test'))
+
+    def test_repo(self):
+        repository = MLRepo(user='unittestuser', config={'user': 'unittestuser', 'workspace': None,
+                                                         'repo_store': {'type': 'memory_handler', 'config': {}},
+                                                         'numpy_store': {'type': 'npy_handler', 'config': {'folder': 'test_numpy_npy'}},
+                                                         'job_runner': {'type': 'simple', 'config': {}}})
+        raw_data = RawData(np.arange(20, dtype=float).reshape([10, 2]), ['x0', 'x1'], repo_info={RepoInfoKey.NAME: 'raw'})
+        repository.add(raw_data)
+        raw_data = repository.get('raw', full_object=True, columns=['x1'])
+        self.assertTrue(np.array_equal(raw_data.x_data, np.arange(20, dtype=float).reshape([10, 2])[:, [1]]))
+
 
 from pailab.tools.tests import RegressionTestDefinition
 class RegressionTestTest(unittest.TestCase):